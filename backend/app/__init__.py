@@ -2,7 +2,9 @@
 
 from flask import Flask, send_from_directory
 from flask_jwt_extended import JWTManager 
-from app.config.database import connect_db
+from app.config.database import check_db_health
+from app.config.indexes import ensure_indexes
+import os
 from app.middleware.auth import auth_required
 from app.routes.route_auth import auth_routes
 from app.routes.route_dashboard import dashboard_routes 
@@ -13,6 +15,15 @@
 from app.routes.route_estoque import estoque_routes
 from app.routes.route_motorista import motorista_routes
 from app.routes.route_rota import rota_routes
+from app.routes.route_exportacao import exportacao_routes
+from app.routes.route_eventos import eventos_routes
+from app.routes.route_catalogo import catalogo_routes
+from app.routes.route_relatorios import relatorios_routes
+from app.controllers.entities.controller_rota import fila_rotas
+from app.services.estatisticas import estatisticas
+from app.services.expiracao import varredura_expiracao
+from app.services.tempo_real import canal_tempo_real
+from app.utils.serializacao import ProvedorJSON
 
 def create_app():
     """Factory function para criar a aplicação Flask"""
@@ -23,6 +34,29 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = 'jwt-secret-string'
     
     jwt = JWTManager(app)
+
+    # jsonify com suporte a ObjectId/datetime (e orjson, se instalado)
+    app.json = ProvedorJSON(app)
+
+    # Cliente MongoDB compartilhado: o ping é feito uma única vez aqui,
+    # e não mais a cada chamada dos models.
+    try:
+        check_db_health()
+        if os.getenv('DB_ENSURE_INDEXES', '1') == '1':
+            ensure_indexes()
+    except Exception:
+        print("⚠️  MongoDB indisponível na inicialização. As requisições tentarão reconectar.")
+
+    # Serviços em segundo plano: sobem mesmo sem o MongoDB e tratam os próprios
+    # erros de conexão, tentando de novo a cada ciclo
+    # Workers da fila de rotas (também retomam jobs pendentes de outras execuções)
+    fila_rotas.iniciar()
+    # Recalcula periodicamente os contadores do dashboard
+    estatisticas.iniciar_reconciliacao_periodica()
+    # Marca periodicamente as doações vencidas como 'expirada'
+    varredura_expiracao.iniciar()
+    # Fonte dos eventos em tempo real (change stream ou barramento em memória)
+    canal_tempo_real.iniciar()
     
     # Blueprints
     app.register_blueprint(auth_routes, url_prefix='/api')  
@@ -34,6 +68,10 @@ def create_app():
     app.register_blueprint(estoque_routes, url_prefix='/api')
     app.register_blueprint(motorista_routes, url_prefix='/api')
     app.register_blueprint(rota_routes, url_prefix='/api')
+    app.register_blueprint(exportacao_routes, url_prefix='/api')
+    app.register_blueprint(eventos_routes, url_prefix='/api')
+    app.register_blueprint(catalogo_routes, url_prefix='/api')
+    app.register_blueprint(relatorios_routes, url_prefix='/api')
     
     # Rota principal
     @app.route("/")
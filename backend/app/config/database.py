@@ -2,37 +2,151 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
+import threading
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), '.env'))
 
 DB_URI = os.getenv('DB_URI')
+DB_NAME = os.getenv('DB_NAME', 'doacoesDB')
 
-def connect_db():
+# Parâmetros do pool de conexões (um pool por processo)
+DB_MAX_POOL_SIZE = int(os.getenv('DB_MAX_POOL_SIZE', 50))
+DB_MIN_POOL_SIZE = int(os.getenv('DB_MIN_POOL_SIZE', 0))
+DB_MAX_IDLE_TIME_MS = int(os.getenv('DB_MAX_IDLE_TIME_MS', 60000))
+DB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('DB_SERVER_SELECTION_TIMEOUT_MS', 5000))
+DB_CONNECT_TIMEOUT_MS = int(os.getenv('DB_CONNECT_TIMEOUT_MS', 5000))
+DB_SOCKET_TIMEOUT_MS = int(os.getenv('DB_SOCKET_TIMEOUT_MS', 20000))
+
+# Transações multi-documento: 'auto' detecta replica set/mongos; '0' desliga
+DB_TRANSACOES = os.getenv('DB_TRANSACOES', 'auto').lower()
+
+# Registro de clientes por URI. Cada processo tem o seu: um MongoClient
+# herdado via fork não pode ser reutilizado com segurança no processo filho.
+_clients = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _clients, _clients_pid, _clients_lock
+    _clients = {}
+    _clients_pid = os.getpid()
+    _clients_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(uri=None):
+    """
+    Retorna o MongoClient compartilhado do processo, criando-o na primeira chamada.
+    O MongoClient já é thread-safe e mantém seu próprio pool de conexões.
+    """
+    uri = uri or DB_URI
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(uri)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri,
+                maxPoolSize=DB_MAX_POOL_SIZE,
+                minPoolSize=DB_MIN_POOL_SIZE,
+                maxIdleTimeMS=DB_MAX_IDLE_TIME_MS,
+                serverSelectionTimeoutMS=DB_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=DB_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=DB_SOCKET_TIMEOUT_MS,
+                connect=False
+            )
+            _clients[uri] = client
+    return client
+
+
+def get_db(name=None):
+    """Retorna o banco da aplicação usando o cliente compartilhado (sem ping)."""
+    return get_client()[name or DB_NAME]
+
+
+_suporta_transacoes = {}
+
+
+def suporta_transacoes():
+    """
+    True se o servidor aceita transações (replica set ou mongos). Um servidor
+    standalone não aceita. Consultado uma vez por processo; com o servidor
+    inacessível responde False sem guardar a resposta, e consulta de novo depois.
+    """
+    if DB_TRANSACOES in ('0', 'false', 'nao'):
+        return False
+    pid = os.getpid()
+    if pid not in _suporta_transacoes:
+        try:
+            hello = get_client().admin.command('hello')
+            _suporta_transacoes[pid] = bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+        except Exception:
+            return False
+    return _suporta_transacoes[pid]
+
+
+def executar_em_transacao(funcao):
+    """
+    Executa `funcao(session)` numa transação, repetindo em erros transitórios
+    (with_transaction). Em servidor standalone chama `funcao(None)`: as escritas
+    são aplicadas uma a uma e quem chama deve desfazer o que for preciso se falhar.
+    """
+    if not suporta_transacoes():
+        return funcao(None)
+    with get_client().start_session() as session:
+        return session.with_transaction(funcao)
+
+
+def check_db_health():
+    """
+    Faz o ping no servidor. Deve ser chamado uma única vez na inicialização,
+    e não a cada requisição.
+    """
     try:
-        client = MongoClient(DB_URI, serverSelectionTimeoutMS=5000) 
-        
-        client.admin.command('ping') 
-        
-        db = client['doacoesDB']
-        
+        get_client().admin.command('ping')
         print(f"Conexao com o MongoDB estabelecida com sucesso!")
-        return db
+        return True
     except Exception as e:
         print(f"Erro de autenticação/conexão ao conectar ao MongoDB: {str(e)}")
         raise
 
 
+def close_db():
+    """Fecha todos os clientes do processo atual (usado no encerramento)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def connect_db():
+    """
+    Mantido por compatibilidade com scripts antigos (ex: popular_banco.py).
+    Verifica a conexão e retorna o banco do cliente compartilhado.
+    """
+    check_db_health()
+    return get_db()
+
+
 if __name__ == "__main__":
-    db_doacoes = connect_db() 
-    
+    db_doacoes = connect_db()
+
     try:
         # A coleção 'doacoesDB' dentro da database 'doacoesDB'
-        test_collection = db_doacoes['teste_db'] 
-        
+        test_collection = db_doacoes['teste_db']
+
         test_collection.insert_one({"status": "DB 'doacoesDB' ativada. Teste de escrita bem-sucedido."})
         print("Documento de teste inserido com sucesso. O banco de dados está ativo.")
-        
 
-        test_collection.delete_one({"status": "DB 'teste' criado e ativado."}) 
+
+        test_collection.delete_one({"status": "DB 'teste' criado e ativado."})
     except Exception as e:
-        print(f"Erro ao inserir documento de teste (Verifique a permissão de escrita): {e}")
\ No newline at end of file
+        print(f"Erro ao inserir documento de teste (Verifique a permissão de escrita): {e}")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Criação idempotente dos índices declarados nos models (atributo INDEXES).
+
+Uso pela linha de comando (a partir da pasta backend):
+    python -m app.config.indexes           # cria os índices que faltam
+    python -m app.config.indexes --check   # apenas lista os que faltam
+"""
+import sys
+from pymongo.errors import OperationFailure
+from app.config.database import get_db
+
+
+def indexed_models():
+    """Models (e serviços com coleção própria) que declaram COLLECTION e INDEXES."""
+    from app.models.entities.model_usuarioUnificado import Usuario
+    from app.models.entities.model_doacao import Doacao
+    from app.models.entities.model_rota import Rota
+    from app.models.entities.model_estoque import Estoque
+    from app.services.cache_rotas import CacheRotas
+    from app.models.entities.model_planoRota import PlanoRota
+    from app.services.fila_rotas import FilaRotas
+    from app.services.eventos import Eventos
+    from app.models.entities.model_movimentoEstoque import MovimentoEstoque, ResumoDiarioEstoque
+    from app.models.entities.model_resumoDoacao import ResumoDoacoes
+    return [Usuario, Doacao, ResumoDoacoes, Rota, Estoque, MovimentoEstoque, ResumoDiarioEstoque, PlanoRota,
+            CacheRotas, FilaRotas, Eventos]
+
+
+def missing_indexes(db=None):
+    """Retorna a lista de (colecao, nome_indice) declarados e ainda não criados."""
+    db = db if db is not None else get_db()
+    faltando = []
+    for model in indexed_models():
+        existentes = db[model.COLLECTION].index_information()
+        for index in model.INDEXES:
+            nome = index.document['name']
+            if nome not in existentes:
+                faltando.append((model.COLLECTION, nome))
+    return faltando
+
+
+def ensure_indexes(db=None):
+    """
+    Cria os índices que faltam, um a um, para que uma falha (ex: emails
+    duplicados impedindo o índice único) não bloqueie os demais. Um índice
+    antigo com as mesmas chaves e outro nome (ex: que passou a ser único) é
+    substituído; se o novo não puder ser criado, o antigo é recriado.
+    Retorna (criados, erros).
+    """
+    db = db if db is not None else get_db()
+    faltando = set(missing_indexes(db))
+    criados, erros = [], []
+
+    for model in indexed_models():
+        for index in model.INDEXES:
+            nome = index.document['name']
+            if (model.COLLECTION, nome) not in faltando:
+                continue
+            colecao = db[model.COLLECTION]
+            chaves = list(index.document['key'].items())
+            antigos = {n: info for n, info in colecao.index_information().items()
+                       if n != '_id_' and list(info['key']) == chaves}
+            try:
+                for antigo in antigos:
+                    colecao.drop_index(antigo)
+                colecao.create_indexes([index])
+                criados.append((model.COLLECTION, nome))
+            except OperationFailure as e:
+                erros.append((model.COLLECTION, nome, str(e)))
+                for antigo, info in antigos.items():
+                    opcoes = {k: v for k, v in info.items() if k not in ('key', 'v', 'ns')}
+                    colecao.create_index(info['key'], name=antigo, **opcoes)
+
+    for colecao, nome in criados:
+        print(f"📇 Índice criado: {colecao}.{nome}")
+    for colecao, nome, erro in erros:
+        print(f"❌ Falha ao criar índice {colecao}.{nome}: {erro}")
+    return criados, erros
+
+
+if __name__ == "__main__":
+    if '--check' in sys.argv:
+        faltando = missing_indexes()
+        if not faltando:
+            print("✅ Todos os índices declarados existem.")
+        for colecao, nome in faltando:
+            print(f"⚠️  Índice ausente: {colecao}.{nome}")
+        sys.exit(1 if faltando else 0)
+
+    criados, erros = ensure_indexes()
+    print(f"Índices criados: {len(criados)} | Falhas: {len(erros)}")
+    sys.exit(1 if erros else 0)
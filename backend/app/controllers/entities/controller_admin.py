@@ -1,5 +1,6 @@
 from app.models.entities.model_usuarioUnificado import Admin, RoleEnum
 from pydantic import ValidationError
+from app.utils.serializacao import documento_para_json, padroes_do_model
 
 def create_admin(data):
     try:
@@ -21,8 +22,9 @@ def create_admin(data):
 
 def get_all_admins():
     try:
-        admins = Admin.find_all_by_role(RoleEnum.ADMIN)
-        return [a.dict(exclude={'senha'}) for a in admins], None
+        padroes = padroes_do_model(Admin, excluir={'senha'})
+        admins = Admin.find_docs_by_role(RoleEnum.ADMIN)
+        return [documento_para_json(d, padroes) for d in admins], None
     except Exception as e:
         return None, str(e)
 
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 from app.models.entities.model_usuarioUnificado import Usuario
+from app.services.senhas import verificador_senhas, precisa_rehash, SenhaPoolOcupado
 from flask_jwt_extended import create_access_token
 from datetime import timedelta
 import traceback
-from enum import Enum
 
 def login(data):
     """
@@ -16,34 +16,42 @@ def login(data):
         if not email or not senha:
             return None, "Email e senha são obrigatórios.", 400
 
-        # Busca o usuário
-        usuario = Usuario.find_by_email(email)
+        # Projeção mínima (id, role, nome, hash), com cache por email
+        usuario = Usuario.find_login_by_email(email)
 
         if not usuario:
             return None, "Usuário não encontrado.", 404
 
-        if not usuario.check_password(senha):
+        # Verificação do hash fora da thread da requisição (pool de processos)
+        try:
+            senha_ok = verificador_senhas.verificar(usuario['senha'], senha)
+        except SenhaPoolOcupado as e:
+            return None, str(e), 503
+
+        if not senha_ok:
             return None, "Credenciais inválidas.", 401
-        
-        # --- CORREÇÃO AQUI ---
-        # Verifica se 'role' é um Enum ou string pura
-        user_role = usuario.role
-        if isinstance(user_role, Enum):
-            role_value = user_role.value
-        else:
-            role_value = str(user_role)
-        # ---------------------
+
+        # Hash gravado com parâmetros antigos: regrava com os atuais
+        if precisa_rehash(usuario['senha']):
+            try:
+                novo_hash = verificador_senhas.gerar_hash(senha)
+                Usuario.atualizar_hash_senha(usuario['_id'], usuario['senha'], novo_hash)
+            except Exception as e:
+                print(f"⚠️  Falha ao atualizar o hash da senha: {e}")
+
+        # A projeção vem direto do Mongo: role já é a string gravada
+        role_value = str(usuario['role'])
 
         # Cria o token JWT
         expires = timedelta(hours=8) 
         
         additional_claims = {
             "role": role_value, 
-            "nome": usuario.nome
+            "nome": usuario['nome']
         }
         
         access_token = create_access_token(
-            identity=str(usuario.id),
+            identity=str(usuario['_id']),
             additional_claims=additional_claims,
             expires_delta=expires
         )
@@ -51,7 +59,7 @@ def login(data):
         return {
             "access_token": access_token, 
             "role": role_value, 
-            "id": str(usuario.id)
+            "id": str(usuario['_id'])
         }, None, 200
 
     except Exception as e:
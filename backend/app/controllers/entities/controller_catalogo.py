@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+from app.config.database import executar_em_transacao
+from app.controllers.entities.controller_exportacao import parse_data
+from app.models.entities.model_doacao import Doacao
+from app.models.entities.model_estoque import Estoque
+from app.models.entities.model_movimentoEstoque import MovimentoEstoque
+from app.services.catalogo import catalogo
+
+# Formato do período no $dateToString (semana ISO: 2026-W07)
+FORMATOS_PERIODO = {'dia': '%Y-%m-%d', 'semana': '%G-W%V', 'mes': '%Y-%m'}
+DIAS_TOTAIS_PADRAO = 90
+LOTE_NORMALIZACAO = 1000
+
+
+def listar_alimentos():
+    """Alimentos do catálogo canônico."""
+    try:
+        return [alimento._asdict() for alimento in catalogo.alimentos()], None
+    except Exception as e:
+        return None, str(e)
+
+
+def normalizar_item(args):
+    """Prévia de como um alimento digitado será gravado (?alimento=...&quantidade=...&unidade=...)."""
+    if not args.get('alimento'):
+        return None, "Parâmetro 'alimento' é obrigatório."
+    try:
+        item = catalogo.normalizar(args['alimento'], args.get('quantidade') or 1, args.get('unidade') or 'un')
+    except ValueError:
+        return None, "Parâmetro 'quantidade' inválido."
+    return item._asdict(), None
+
+
+def totais_por_alimento(args):
+    """
+    Quantidade doada por alimento do catálogo e período, já convertida para a
+    unidade base (kg, l ou un). Parâmetros: ?de=&ate=&granularidade=dia|semana|mes&status=a,b
+    (padrão: últimos 90 dias, por semana).
+    """
+    granularidade = args.get('granularidade') or 'semana'
+    if granularidade not in FORMATOS_PERIODO:
+        return None, "Parâmetro 'granularidade' inválido. Use dia, semana ou mes."
+    try:
+        ate = parse_data(args['ate'], 'ate', fim_do_dia=True) if args.get('ate') else datetime.now()
+        de = parse_data(args['de'], 'de') if args.get('de') else ate - timedelta(days=DIAS_TOTAIS_PADRAO)
+    except ValueError as e:
+        return None, str(e)
+    status = [s.strip() for s in (args.get('status') or '').split(',') if s.strip()]
+
+    try:
+        grupos = Doacao.totais_por_alimento(de, ate, FORMATOS_PERIODO[granularidade], status)
+        itens = []
+        for grupo in grupos:
+            chave = grupo['_id']
+            alimento = catalogo.por_id(chave['alimento_id'])
+            itens.append({
+                "periodo": chave['periodo'],
+                "alimento_id": chave['alimento_id'],
+                "alimento": alimento.nome if alimento else None,
+                "unidade": chave['unidade'],
+                "quantidade": round(grupo['quantidade'], 3),
+                "kg": round(catalogo.kg_equivalente(chave['alimento_id'], grupo['quantidade'], chave['unidade']) or 0, 3),
+                "doacoes": grupo['doacoes'],
+            })
+        return {"de": de, "ate": ate, "granularidade": granularidade, "itens": itens}, None
+    except Exception as e:
+        return None, str(e)
+
+
+def normalizar_registros_existentes():
+    """
+    Aplica o catálogo ao que foi gravado antes dele:
+    - doações sem alimento_id recebem alimento_id/quantidade_base/unidade_base;
+    - itens de estoque passam para a chave canônica; quando ela já existe, as
+      quantidades são somadas e os movimentos do livro passam para o item que fica.
+    Retorna um resumo.
+    """
+    doacoes = 0
+    atualizacoes = {}
+    for doc in Doacao.find_cursor({"alimento_id": {"$exists": False}}, batch_size=LOTE_NORMALIZACAO):
+        try:
+            item = catalogo.normalizar(doc.get('alimento'), doc.get('quantidade') or 0, doc.get('unidade'))
+        except ValueError:
+            continue
+        atualizacoes[str(doc['_id'])] = {"alimento_id": item.alimento_id, "quantidade_base": item.quantidade,
+                                         "unidade_base": item.unidade}
+        if len(atualizacoes) >= LOTE_NORMALIZACAO:
+            doacoes += Doacao.set_many(atualizacoes)
+            atualizacoes = {}
+    doacoes += Doacao.set_many(atualizacoes)
+
+    itens_atualizados = itens_mesclados = 0
+    for doc in list(Estoque.find_cursor({"alimento_id": {"$exists": False}})):
+        item = catalogo.normalizar(doc['alimento'], doc['quantidade'], doc['unidade'])
+        if (item.alimento, item.unidade) == (doc['alimento'], doc['unidade']):
+            Estoque.update(str(doc['_id']), {"alimento_id": item.alimento_id})
+            itens_atualizados += 1
+            continue
+
+        def aplicar(session, doc=doc, item=item):
+            destino = Estoque.upsert_quantity(doc['receptor_id'], item.alimento, item.unidade, item.quantidade,
+                                              doc.get('local'), item.alimento_id, session=session)
+            MovimentoEstoque.reassign_item([str(doc['_id'])], str(destino['_id']), session=session)
+            Estoque.delete(str(doc['_id']), session=session)
+
+        executar_em_transacao(aplicar)
+        itens_mesclados += 1
+
+    return {"doacoes": doacoes, "estoque_atualizados": itens_atualizados, "estoque_mesclados": itens_mesclados}
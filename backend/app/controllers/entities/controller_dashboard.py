@@ -1,34 +1,38 @@
 # -*- coding: utf-8 -*-
 
-from app.config.database import connect_db
 from app.models.entities.model_usuarioUnificado import RoleEnum
-from app.models.entities.model_rota import StatusRotaEnum 
-import pymongo
+from app.models.entities.model_rota import StatusRotaEnum
+from app.services.estatisticas import estatisticas
 
 def get_dashboard_stats():
     """
-    Busca estatísticas-chave da aplicação diretamente do DB para eficiência.
+    Estatísticas do dashboard a partir dos contadores incrementais
+    (um único documento, cacheado em memória), sem varrer as coleções.
     """
     try:
-        db = connect_db()
-        
-        total_doacoes = db.doacoes.count_documents({})
-        
-        total_motoristas = db.usuarios.count_documents(
-            {"role": RoleEnum.MOTORISTA.value}
-        )
-        
-        rotas_pendentes = db.rotas.count_documents(
-            {"status": StatusRotaEnum.PENDENTE.value}
-        )
-        
+        doc = estatisticas.obter()
+        doacoes = doc.get("doacoes", {})
+        rotas = doc.get("rotas", {})
+        usuarios = doc.get("usuarios", {})
+
         stats = {
-            "doacoes": total_doacoes,
-            "motoristas": total_motoristas,
-            "rotas_pendentes": rotas_pendentes
+            "doacoes": doacoes.get("total", 0),
+            "motoristas": usuarios.get("por_role", {}).get(RoleEnum.MOTORISTA.value, 0),
+            "rotas_pendentes": rotas.get("por_status", {}).get(StatusRotaEnum.PENDENTE.value, 0),
+            "doacoes_por_status": {k: v for k, v in doacoes.get("por_status", {}).items() if v},
+            "rotas_por_status": {k: v for k, v in rotas.get("por_status", {}).items() if v},
+            "kg_por_receptor": {k: round(v, 3) for k, v in doc.get("kg_por_receptor", {}).items() if v},
+            "atualizado_em": doc.get("atualizado_em").isoformat() if doc.get("atualizado_em") else None
         }
-        
+
         return stats, None
 
     except Exception as e:
-        return None, f"Erro ao buscar estatísticas: {str(e)}"
\ No newline at end of file
+        return None, f"Erro ao buscar estatísticas: {str(e)}"
+
+def reconciliar_stats():
+    try:
+        estatisticas.reconciliar()
+        return get_dashboard_stats()
+    except Exception as e:
+        return None, f"Erro ao reconciliar estatísticas: {str(e)}"
@@ -1,21 +1,80 @@
 # -*- coding: utf-8 -*-
-from app.models.entities.model_doacao import Doacao
+from app.models.entities.model_doacao import Doacao, limite_validade
+from app.controllers.entities.controller_rota import fila_rotas
+from app.services.expiracao import varredura_expiracao
+from app.services.eventos import eventos
+from app.services.catalogo import catalogo
+from app.services.recomendacoes import cache_motor, caracteristicas_receptor, RAIO_PADRAO_KM
+from app.models.entities.model_usuarioUnificado import Usuario
 from pydantic import ValidationError
 from flask_jwt_extended import get_jwt_identity
 import traceback
 from datetime import datetime
+from bson import ObjectId
+from app.utils.pagination import parse_limit, parse_fields, encode_cursor, decode_cursor
+from app.utils.serializacao import documento_para_json, padroes_do_model
+from app.utils.concorrencia import condicao_versao
+import os
+
+# Importação em lote (POST /doacoes/bulk)
+DOACAO_BULK_CHUNK = int(os.getenv('DOACAO_BULK_CHUNK', 500))
+DOACAO_BULK_MAX_ITENS = int(os.getenv('DOACAO_BULK_MAX_ITENS', 10000))
+
+# Esconde das listagens as doações vencidas (mesmo antes da varredura marcá-las)
+DOACAO_OCULTAR_EXPIRADAS = os.getenv('DOACAO_OCULTAR_EXPIRADAS', '1').lower() not in ('0', 'false', 'nao')
+
+# Recomendações (GET /doacoes/recomendadas)
+RECOMENDACAO_K_PADRAO = 20
+RECOMENDACAO_K_MAXIMO = 100
+RECOMENDACAO_RAIO_MAXIMO_KM = 200.0
+
+# Campos que podem ser pedidos em 'fields=' na listagem paginada
+CAMPOS_DOACAO = {'_id', 'doador_id', 'alimento', 'quantidade', 'unidade', 'validade',
+                 'status', 'data_criacao', 'receptor_id', 'motorista_id', 'versao',
+                 'alimento_id', 'quantidade_base', 'unidade_base', 'data_recebimento'}
+
+# Campos opcionais ausentes no documento saem como no model_dump (ex.: receptor_id: null)
+PADROES_DOACAO = padroes_do_model(Doacao)
+
+def _preparar_doacao(data, id_doador):
+    """Aplica os campos controlados pelo servidor e valida com o model."""
+    data['doador_id'] = id_doador
+    data['status'] = 'pendente'
+    data['receptor_id'] = None
+
+    if 'validade' in data and isinstance(data['validade'], str):
+        data['validade'] = datetime.strptime(data['validade'], '%Y-%m-%d')
+
+    doacao = Doacao(**data)
+    _aplicar_catalogo(doacao)
+    return doacao
+
+def _aplicar_catalogo(doacao):
+    """Preenche alimento_id/quantidade_base/unidade_base a partir do texto digitado."""
+    item = catalogo.normalizar(doacao.alimento, doacao.quantidade, doacao.unidade)
+    doacao.alimento_id = item.alimento_id
+    doacao.quantidade_base = item.quantidade
+    doacao.unidade_base = item.unidade
+
+def _dados_evento(doc):
+    """Campos da doação que vão nos eventos em tempo real (doacao.pendente, doacao.aceita)."""
+    return {
+        "doacao_id": str(doc["_id"]),
+        "doacao_status": doc.get("status"),
+        "doador_id": doc.get("doador_id"),
+        "receptor_id": doc.get("receptor_id"),
+        "motorista_id": doc.get("motorista_id"),
+        "alimento": doc.get("alimento"),
+        "quantidade": doc.get("quantidade"),
+        "unidade": doc.get("unidade"),
+        "validade": doc.get("validade"),
+    }
 
 def create_doacao(data, id_doador):
     try:
-        data['doador_id'] = id_doador
-        data['status'] = 'pendente'
-        data['receptor_id'] = None
-        
-        if 'validade' in data and isinstance(data['validade'], str):
-            data['validade'] = datetime.strptime(data['validade'], '%Y-%m-%d')
-
-        nova_doacao = Doacao(**data)
+        nova_doacao = _preparar_doacao(data, id_doador)
         nova_doacao.save()
+        eventos.emitir("doacao.pendente", _dados_evento(nova_doacao.model_dump(by_alias=True)))
         # Correção V2: mode='json' converte datas e IDs para string automaticamente
         return nova_doacao.model_dump(mode='json'), None
     except ValidationError as e:
@@ -24,70 +83,196 @@ def create_doacao(data, id_doador):
         traceback.print_exc()
         return None, str(e)
 
-def get_all_doacoes(claims, status=None):
-    try:
-        query = {}
-        role = claims.get('role')
-        user_id = claims.get('sub') 
-
-        if role == 'doador':
-            if status == 'finalizadas':
-                # Histórico: O que já foi entregue
-                query = {
-                    'doador_id': user_id,
-                    'status': {'$in': ['recebida', 'concluida']} # Status finais
-                }
-            else:
-                # Padrão: O que está ativo (pendente, aceita, a caminho)
-                query = {
-                    'doador_id': user_id,
-                    'status': {'$nin': ['recebida', 'concluida']} # Exclui finalizadas da lista principal
-                }
-
-        elif role == 'receptor':
-            if status == 'finalizadas':
-                # Histórico: O que já recebeu
-                query = {
-                    'receptor_id': user_id,
-                    'status': {'$in': ['recebida', 'concluida']}
-                }
+def _mensagem_validacao(e: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" if err['loc'] else err['msg']
+        for err in e.errors()
+    )
+
+def importar_doacoes(itens, id_doador):
+    """
+    Importa doações em lote. `itens` é um iterável de (linha, dados, erro) vindo do
+    leitor incremental do corpo. Cada linha é validada pelo model; as válidas são
+    gravadas em lotes de DOACAO_BULK_CHUNK com insert_many não ordenado.
+    Retorna o relatório com os ids inseridos e os erros por linha.
+    """
+    relatorio = {"recebidos": 0, "inseridos": 0, "ids": [], "erros": []}
+    lote, linhas_lote = [], []
+
+    def gravar_lote():
+        ids, erros = Doacao.insert_many(lote)
+        for i, linha in enumerate(linhas_lote):
+            if i in ids:
+                relatorio["ids"].append(ids[i])
             else:
-                # Padrão: Pendentes (geral) ou Aceitas por ele (mas não entregues)
-                query['$or'] = [
-                    {'status': 'pendente'},
-                    {'receptor_id': user_id, 'status': {'$nin': ['recebida', 'concluida']}}
-                ]
+                relatorio["erros"].append({"linha": linha, "erro": erros.get(i, "Erro ao inserir.")})
+        relatorio["inseridos"] += len(ids)
+        eventos.emitir_lote("doacao.pendente", [_dados_evento(lote[i]) for i in ids])
+        lote.clear()
+        linhas_lote.clear()
+
+    try:
+        for linha, dados, erro in itens:
+            if relatorio["recebidos"] >= DOACAO_BULK_MAX_ITENS:
+                relatorio["erros"].append({
+                    "linha": linha,
+                    "erro": f"Limite de {DOACAO_BULK_MAX_ITENS} itens por requisição excedido; o restante não foi processado."
+                })
+                break
+            relatorio["recebidos"] += 1
+
+            if erro:
+                relatorio["erros"].append({"linha": linha, "erro": erro})
+                continue
+            if not isinstance(dados, dict):
+                relatorio["erros"].append({"linha": linha, "erro": "Cada item deve ser um objeto JSON."})
+                continue
+            try:
+                lote.append(_preparar_doacao(dados, id_doador).to_mongo())
+                linhas_lote.append(linha)
+            except ValidationError as e:
+                relatorio["erros"].append({"linha": linha, "erro": _mensagem_validacao(e)})
+                continue
+            except ValueError as e:
+                relatorio["erros"].append({"linha": linha, "erro": str(e)})
+                continue
 
-        elif role == 'motorista':
+            if len(lote) >= DOACAO_BULK_CHUNK:
+                gravar_lote()
+
+        if lote:
+            gravar_lote()
+        relatorio["erros"].sort(key=lambda e: e["linha"])
+        return relatorio, None
+    except Exception as e:
+        traceback.print_exc()
+        # Os lotes já gravados continuam no relatório
+        relatorio["erro"] = f"Importação interrompida: {str(e)}"
+        return relatorio, relatorio["erro"]
+
+def _montar_query_doacoes(claims, status=None, ocultar_expiradas=None):
+    """
+    Monta o filtro da listagem de acordo com o papel do usuário logado.
+    Com `ocultar_expiradas` (padrão: DOACAO_OCULTAR_EXPIRADAS) as doações vencidas ficam
+    de fora, a menos que o status pedido seja justamente 'expirada' ou 'finalizadas'.
+    """
+    query = {}
+    role = claims.get('role')
+    user_id = claims.get('sub') 
+
+    if role == 'doador':
+        if status == 'finalizadas':
+            # Histórico: O que já foi entregue
+            query = {
+                'doador_id': user_id,
+                'status': {'$in': ['recebida', 'concluida']} # Status finais
+            }
+        else:
+            # Padrão: O que está ativo (pendente, aceita, a caminho)
+            query = {
+                'doador_id': user_id,
+                'status': {'$nin': ['recebida', 'concluida']} # Exclui finalizadas da lista principal
+            }
+
+    elif role == 'receptor':
+        if status == 'finalizadas':
+            # Histórico: O que já recebeu
+            query = {
+                'receptor_id': user_id,
+                'status': {'$in': ['recebida', 'concluida']}
+            }
+        else:
+            # Padrão: Pendentes (geral) ou Aceitas por ele (mas não entregues)
             query['$or'] = [
-                {'status': 'aceita'}, 
-                {'motorista_id': user_id}
+                {'status': 'pendente'},
+                {'receptor_id': user_id, 'status': {'$nin': ['recebida', 'concluida']}}
             ]
-        
-        # Se vier status específico na URL (exceto o 'finalizadas' que tratamos acima)
-        if status and status != 'finalizadas':
-            query['status'] = status
 
-        doacoes = Doacao.find_all(query)
-        return [d.model_dump(mode='json') for d in doacoes], None
+    elif role == 'motorista':
+        query['$or'] = [
+            {'status': 'aceita'}, 
+            {'motorista_id': user_id}
+        ]
+    
+    # Se vier status específico na URL (exceto o 'finalizadas' que tratamos acima)
+    if status and status != 'finalizadas':
+        query['status'] = status
+
+    if ocultar_expiradas is None:
+        ocultar_expiradas = DOACAO_OCULTAR_EXPIRADAS
+    if ocultar_expiradas and status not in ('expirada', 'finalizadas'):
+        filtro = Doacao.filtro_nao_expiradas()
+        query = {'$and': [query, filtro]} if query else filtro
+    return query
+
+def get_all_doacoes(claims, status=None, limit=None, cursor=None, fields=None, ocultar_expiradas=None):
+    """
+    Lista as doações visíveis para o usuário.
+    Sem 'limit'/'cursor' retorna a lista completa (formato antigo); com eles, retorna
+    uma página {"itens": [...], "next_cursor": ...} ordenada da mais recente para a mais antiga.
+    """
+    try:
+        query = _montar_query_doacoes(claims, status, ocultar_expiradas)
+
+        if limit is None and cursor is None and fields is None:
+            doacoes = Doacao.find_docs(query)
+            return [documento_para_json(d, PADROES_DOACAO) for d in doacoes], None
+
+        limite = parse_limit(limit)
+        after = decode_cursor(cursor) if cursor else None
+        projecao = parse_fields(fields, CAMPOS_DOACAO, obrigatorios=('_id', 'data_criacao'))
+
+        docs, tem_mais = Doacao.find_page(query, limite, after=after, projection=projecao)
+
+        # Projeção: só os campos pedidos; sem projeção, mesmas chaves do model
+        padroes = None if projecao else PADROES_DOACAO
+        itens = [documento_para_json(d, padroes) for d in docs]
+
+        next_cursor = None
+        if tem_mais and docs:
+            ultimo = docs[-1]
+            next_cursor = encode_cursor(ultimo['data_criacao'], ultimo['_id'])
+
+        return {"itens": itens, "next_cursor": next_cursor}, None
+    except ValueError as e:
+        return None, str(e)
     except Exception as e:
         print(f"Erro busca: {e}")
         traceback.print_exc()
         return None, str(e)
 
-def aceitar_doacao(id_doacao, id_receptor):
+def aceitar_doacao(id_doacao, id_receptor, versao=None):
+    """
+    Aceite atômico: a doação só muda se ainda estiver pendente e válida (e na
+    `versao` informada, se houver). Entre aceites simultâneos apenas um vence;
+    os demais recebem 409.
+    Retorna (resposta, erro, status_code).
+    """
     try:
-        doacao = Doacao.find_by_id(id_doacao)
-        if not doacao: return None, "Doação não encontrada."
-        if doacao.status != 'pendente': return None, "Não está mais disponível."
-            
-        dados = {"status": "aceita", "receptor_id": id_receptor}
-        
-        if Doacao.update(id_doacao, dados):
-            return {"mensagem": "Doação aceita! Aguardando motorista."}, None
-        return None, "Erro ao atualizar."
+        agora = datetime.now()
+        condicao = {"status": "pendente", "validade": {"$gte": limite_validade(agora)}}
+        if versao is not None: condicao["versao"] = condicao_versao(versao)
+
+        depois = Doacao.update_condicional(id_doacao, condicao, {"status": "aceita", "receptor_id": id_receptor})
+        if depois is None:
+            # Caminho do perdedor: uma leitura só para explicar o motivo
+            doacao = Doacao.find_by_id(id_doacao)
+            if not doacao: return None, "Doação não encontrada.", 404
+            if doacao.status != 'pendente': return None, "Não está mais disponível.", 409
+            if doacao.validade < limite_validade(agora): return None, "Doação vencida.", 409
+            return None, f"A doação foi alterada por outra requisição (versão atual: {doacao.versao}).", 409
+
+        eventos.emitir("doacao.aceita", _dados_evento(depois))
+
+        # Pré-calcula a rota para o motorista já encontrá-la pronta
+        try:
+            fila_rotas.enfileirar(id_doacao)
+        except Exception as e:
+            print(f"⚠️  Não foi possível enfileirar a rota da doação {id_doacao}: {e}")
+        return {"mensagem": "Doação aceita! Aguardando motorista.", "versao": depois["versao"]}, None, 200
     except Exception as e:
-        return None, str(e)
+        traceback.print_exc()
+        return None, str(e), 500
 
 def get_doacao(id):
     try:
@@ -99,6 +284,17 @@ def get_doacao(id):
         return None, str(e)
 
 def update_doacao(id, data):
+    if {'alimento', 'quantidade', 'unidade'} & data.keys():
+        # Recalcula os campos do catálogo com os valores novos
+        atual = Doacao.find_by_id(id)
+        if not atual: return None, "Erro"
+        try:
+            atualizada = Doacao(**{**atual.model_dump(by_alias=True), **data})
+        except ValidationError as e:
+            return None, _mensagem_validacao(e)
+        _aplicar_catalogo(atualizada)
+        data.update(alimento_id=atualizada.alimento_id, quantidade_base=atualizada.quantidade_base,
+                    unidade_base=atualizada.unidade_base)
     if Doacao.update(id, data): return {"mensagem": "Atualizado"}, None
     return None, "Erro"
 
@@ -107,4 +303,48 @@ def delete_doacao(id):
     return None, "Erro"
 
 def atribuir_motorista(id, data):
-    return None, "Não implementado ainda"
\ No newline at end of file
+    return None, "Não implementado ainda"
+
+def expirar_doacoes():
+    """Executa a varredura de validade na hora (admin)."""
+    try:
+        return varredura_expiracao.executar(), None
+    except Exception as e:
+        traceback.print_exc()
+        return None, str(e)
+
+def recomendar_doacoes(id_receptor, k=None, raio_km=None):
+    """
+    Doações pendentes mais adequadas para o receptor, da maior para a menor nota.
+    Cada item traz a doação com 'nota' (0 a 1) e 'distancia_km'.
+    """
+    try:
+        try:
+            k = int(k) if k not in (None, '') else RECOMENDACAO_K_PADRAO
+            raio_km = float(raio_km) if raio_km not in (None, '') else RAIO_PADRAO_KM
+        except ValueError:
+            return None, "Parâmetros 'k'/'raio_km' inválidos."
+        if not 1 <= k <= RECOMENDACAO_K_MAXIMO or not 0 < raio_km <= RECOMENDACAO_RAIO_MAXIMO_KM:
+            return None, f"Parâmetros inválidos: 1 <= k <= {RECOMENDACAO_K_MAXIMO} e 0 < raio_km <= {RECOMENDACAO_RAIO_MAXIMO_KM:g}."
+
+        receptores = Usuario.find_docs_by_ids([id_receptor])
+        if not receptores: return None, "Receptor não encontrado."
+        caracteristicas = caracteristicas_receptor(receptores[0])
+        if caracteristicas is None: return None, "CEP do receptor não reconhecido."
+
+        lat, lon, beneficiarios, armazenamento = caracteristicas
+        # O motor é reaproveitado por alguns segundos: pede uma folga e descarta as
+        # doações que deixaram de estar pendentes nesse meio tempo
+        ranking = cache_motor.obter().recomendar(lat, lon, beneficiarios, armazenamento, k * 2, raio_km)
+        docs = {str(d['_id']): d for d in Doacao.find_docs(
+            {"_id": {"$in": [ObjectId(i) for i, _, _ in ranking]}, "status": "pendente"})}
+
+        itens = []
+        for id_doacao, nota, distancia in ranking:
+            if id_doacao in docs:
+                itens.append({**documento_para_json(docs[id_doacao], PADROES_DOACAO), "nota": nota, "distancia_km": distancia})
+                if len(itens) == k: break
+        return {"itens": itens, "k": k, "raio_km": raio_km}, None
+    except Exception as e:
+        traceback.print_exc()
+        return None, str(e)
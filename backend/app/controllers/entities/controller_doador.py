@@ -1,5 +1,6 @@
 from app.models.entities.model_usuarioUnificado import Doador, RoleEnum
 from pydantic import ValidationError
+from app.utils.serializacao import documento_para_json, padroes_do_model
 
 def create_doador(data):
     try:
@@ -19,10 +20,11 @@ def create_doador(data):
     except Exception as e:
         return None, str(e)
 
-def get_all_doador():
+def get_all_doadores():
     try:
-        doador = Doador.find_all_by_role(RoleEnum.DOADOR)
-        return [a.dict(exclude={'senha'}) for a in doador], None
+        padroes = padroes_do_model(Doador, excluir={'senha'})
+        doador = Doador.find_docs_by_role(RoleEnum.DOADOR)
+        return [documento_para_json(d, padroes) for d in doador], None
     except Exception as e:
         return None, str(e)
 
@@ -1,53 +1,156 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from bson import ObjectId
 from app.models.entities.model_estoque import Estoque
+from app.models.entities.model_movimentoEstoque import (
+    MovimentoEstoque, ResumoDiarioEstoque, TipoMovimentoEnum, dia_de
+)
+from app.config.database import executar_em_transacao
+from app.services.catalogo import catalogo
+from app.controllers.entities.controller_exportacao import parse_data
 from pydantic import ValidationError
+from app.utils.pagination import parse_limit, encode_cursor, decode_cursor
+from app.utils.serializacao import documento_para_json, padroes_do_model
 
-def adicionar_item_ao_estoque(data):
+PADROES_ESTOQUE = padroes_do_model(Estoque)
+PADROES_MOVIMENTO = padroes_do_model(MovimentoEstoque)
+
+ESTOQUE_BAIXAS_MAX = int(os.getenv('ESTOQUE_BAIXAS_MAX', 200))
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+DIAS_RELATORIO_PADRAO = 365
+
+
+def _movimento(item: dict, tipo: TipoMovimentoEnum, quantidade: float, saldo: float,
+               origem: dict = None, usuario_id: str = None):
+    """Movimento do livro para o item (documento de 'estoque') com o delta e o saldo resultante."""
+    return {
+        "item_id": str(item["_id"]),
+        "receptor_id": item["receptor_id"],
+        "alimento": item["alimento"],
+        "unidade": item["unidade"],
+        "alimento_id": item.get("alimento_id"),
+        "tipo": tipo.value,
+        "quantidade": quantidade,
+        "saldo": saldo,
+        "usuario_id": usuario_id,
+        **(origem or {}),
+    }
+
+
+def _gravar_no_livro(movimentos: list, session, desfazer):
     """
-    Função inteligente: Se o item já existe para o receptor, incrementa a quantidade.
-    Senão, cria um novo item no estoque.
-    Esta função será chamada pela controller de doação.
+    Grava os movimentos no livro. Sem transação (servidor standalone), se a gravação
+    falhar chama `desfazer()` para reverter o saldo já alterado e propaga o erro:
+    como gravar_lote também apaga os movimentos que chegou a inserir, saldo, livro
+    e resumo diário continuam de acordo e uma nova tentativa não conta nada duas vezes.
     """
     try:
-        item_existente = Estoque.find_one_by_details(
-            receptor_id=data['receptor_id'],
-            alimento=data['alimento'],
-            unidade=data['unidade']
-        )
-
-        if item_existente:
-            Estoque.increment_quantity(item_existente.id, data['quantidade'])
-            return {"mensagem": f"Estoque do item '{data['alimento']}' atualizado."}, None
-        else:
-            novo_item = Estoque(**data)
-            novo_item.save()
-            return novo_item.dict(), None
+        MovimentoEstoque.gravar_lote(movimentos, session=session)
+    except Exception:
+        if session is None:
+            desfazer()
+        raise
+
+
+def _em_transacao(funcao, session):
+    """Usa a transação do chamador, se houver; senão abre uma (quando o servidor suporta)."""
+    return funcao(session) if session is not None else executar_em_transacao(funcao)
+
 
+def adicionar_item_ao_estoque(data, session=None, origem=None, usuario_id=None):
+    """
+    Entrada no estoque: soma a quantidade no item (receptor, alimento, unidade),
+    criando-o se ainda não existir, com um único upsert atômico. Retorna o item atualizado.
+    Alimento, unidade e quantidade passam antes pelo catálogo canônico ("Saco de
+    Arroz 5kg" x 2 sacos -> Arroz, 10 kg), para que o mesmo alimento caia sempre no mesmo item.
+    Esta função será chamada pela controller de doação (e pela conclusão de rotas,
+    dentro da transação recebida em `session`).
+
+    O saldo e o movimento de entrada (com `origem`: doacao_id/rota_id) são gravados
+    na mesma transação.
+    """
+    try:
+        item = catalogo.normalizar(data['alimento'], data['quantidade'], data['unidade'])
+    except (KeyError, TypeError, ValueError):
+        return None, "Dados inválidos. Informe alimento, quantidade numérica e unidade."
+    try:
+        entrada = Estoque(**{**data, "alimento": item.alimento, "quantidade": item.quantidade,
+                             "unidade": item.unidade, "alimento_id": item.alimento_id})
     except ValidationError as e:
         return None, e.errors()
+    except TypeError:
+        return None, "Dados inválidos."
+
+    def aplicar(session):
+        item = Estoque.upsert_quantity(entrada.receptor_id, entrada.alimento, entrada.unidade,
+                                       entrada.quantidade, entrada.local, entrada.alimento_id, session=session)
+        _gravar_no_livro([_movimento(
+            item, TipoMovimentoEnum.ENTRADA, entrada.quantidade, item['quantidade'], origem, usuario_id
+        )], session, lambda: Estoque.increment_quantity(item['_id'], -entrada.quantidade))
+        return documento_para_json(item, PADROES_ESTOQUE, excluir=('lotes_baixa',))
+
+    try:
+        return _em_transacao(aplicar, session), None
     except Exception as e:
         return None, str(e)
 
 
+def mesclar_itens_duplicados():
+    """
+    Consolida itens repetidos de um mesmo (receptor, alimento, unidade), criados
+    antes do upsert atômico: o item mais antigo fica com a soma das quantidades, os
+    movimentos do livro passam a apontar para ele e os demais são removidos.
+    Depois disso o índice único pode ser criado. Retorna um resumo.
+    """
+    grupos = Estoque.find_duplicates()
+    removidos = 0
+    for grupo in grupos:
+        ids = sorted(grupo["ids"])
+        manter, remover = ids[0], ids[1:]
+
+        def aplicar(session):
+            Estoque.merge_into(manter, remover, session=session)
+            MovimentoEstoque.reassign_item([str(i) for i in remover], str(manter), session=session)
+
+        executar_em_transacao(aplicar)
+        removidos += len(remover)
+    return {"grupos": len(grupos), "itens_removidos": removidos}
+
+
 def listar_estoque_por_receptor(receptor_id):
     """Retorna todos os itens de estoque de um receptor específico."""
     try:
-        itens = Estoque.find_by_receptor_id(receptor_id)
-        return [item.dict() for item in itens], None
+        itens = Estoque.find_docs_by_receptor_id(receptor_id)
+        return [documento_para_json(item, PADROES_ESTOQUE, excluir=('lotes_baixa',)) for item in itens], None
     except Exception as e:
         return None, str(e)
 
 
-def ajustar_quantidade_item(item_id, data):
-    """Permite um ajuste manual da quantidade de um item no estoque."""
+def ajustar_quantidade_item(item_id, data, usuario_id=None):
+    """Permite um ajuste manual da quantidade de um item no estoque (registrado como 'ajuste' no livro)."""
     try:
         quantidade = float(data['quantidade'])
         if quantidade < 0:
             return None, "Quantidade não pode ser negativa."
-        
-        if Estoque.update(item_id, {"quantidade": quantidade}):
+
+        def aplicar(session):
+            anterior = Estoque.set_quantity(item_id, quantidade, session=session)
+            if anterior is None:
+                return False
+            diferenca = quantidade - float(anterior['quantidade'])
+            if diferenca:
+                # Desfaz com $inc (e não voltando ao valor anterior) para não apagar outra escrita concorrente
+                _gravar_no_livro([_movimento(
+                    anterior, TipoMovimentoEnum.AJUSTE, diferenca, quantidade, usuario_id=usuario_id
+                )], session, lambda: Estoque.increment_quantity(item_id, -diferenca))
+            return True
+
+        if executar_em_transacao(aplicar):
             return {"mensagem": "Quantidade ajustada com sucesso."}, None
         else:
-            return None, "Item de estoque não encontrado ou quantidade inalterada."
+            return None, "Item de estoque não encontrado."
     except (ValueError, KeyError):
         return None, "Dados inválidos. Forneça uma 'quantidade' numérica."
     except Exception as e:
@@ -77,9 +180,18 @@ def dar_baixa_estoque(item_id: str, data: dict, id_usuario_logado: str, claims:
         if quantidade_saida <= 0:
             return None, "Quantidade de saída deve ser um valor positivo."
 
-        success, error = Estoque.decrement_quantity(item_id, quantidade_saida)
-        
-        if not success:
+        def aplicar(session):
+            atualizado, error = Estoque.decrement_quantity(item_id, quantidade_saida, session=session)
+            if error:
+                return error
+            _gravar_no_livro([_movimento(
+                atualizado, TipoMovimentoEnum.SAIDA, -quantidade_saida, atualizado['quantidade'],
+                usuario_id=id_usuario_logado
+            )], session, lambda: Estoque.increment_quantity(item_id, quantidade_saida))
+            return None
+
+        error = executar_em_transacao(aplicar)
+        if error:
             return None, error
 
         return {"mensagem": "Baixa no estoque registrada com sucesso."}, None
@@ -87,4 +199,230 @@ def dar_baixa_estoque(item_id: str, data: dict, id_usuario_logado: str, claims:
     except (ValueError, KeyError):
         return None, "Dados inválidos. Forneça uma 'quantidade' numérica."
     except Exception as e:
-        return None, str(e)
\ No newline at end of file
+        return None, str(e)
+
+
+class _LoteRecusado(Exception):
+    """Alguma baixa do lote falhou no modo tudo_ou_nada: desfaz a transação."""
+
+
+def _ler_baixas(data):
+    """
+    Valida a lista de baixas. Retorna ({item_id: quantidade}, resultados_invalidos, erro).
+    Baixas repetidas do mesmo item são somadas.
+    """
+    itens = data.get('itens') if isinstance(data, dict) else data
+    if not isinstance(itens, list) or not itens:
+        return None, None, "Envie 'itens': uma lista de {item_id, quantidade}."
+    if len(itens) > ESTOQUE_BAIXAS_MAX:
+        return None, None, f"No máximo {ESTOQUE_BAIXAS_MAX} itens por requisição."
+
+    baixas, invalidos = {}, []
+    for item in itens:
+        item_id = item.get('item_id') if isinstance(item, dict) else None
+        try:
+            quantidade = float(item['quantidade'])
+        except (TypeError, ValueError, KeyError):
+            quantidade = None
+        if not item_id or not ObjectId.is_valid(str(item_id)):
+            invalidos.append({"item_id": item_id, "status": "invalido", "erro": "item_id inválido."})
+        elif quantidade is None or quantidade <= 0:
+            invalidos.append({"item_id": item_id, "status": "invalido",
+                              "erro": "Quantidade de saída deve ser um valor positivo."})
+        else:
+            baixas[str(item_id)] = baixas.get(str(item_id), 0.0) + quantidade
+    return baixas, invalidos, None
+
+
+def dar_baixa_em_lote(receptor_id: str, data, id_usuario_logado: str):
+    """
+    Várias saídas do estoque do receptor de uma vez (ex.: itens usados numa refeição).
+
+    Todas as baixas vão num único bulk_write de $inc condicionais (só aplica se o
+    item é do receptor e tem saldo), seguido de uma leitura dos itens para montar o
+    resultado de cada um; os movimentos de saída vão para o livro num único lote.
+
+    Com 'tudo_ou_nada': true, qualquer falha desfaz o lote inteiro (aborta a
+    transação; em servidor standalone, reverte as baixas já aplicadas).
+
+    Retorna (resposta, erro, status_code). Cada item do resultado tem status
+    'ok', 'insuficiente', 'nao_encontrado', 'invalido' ou 'revertido'.
+    """
+    baixas, invalidos, error = _ler_baixas(data)
+    if error:
+        return None, error, 400
+    tudo_ou_nada = bool(data.get('tudo_ou_nada')) if isinstance(data, dict) else False
+    if tudo_ou_nada and invalidos:
+        return {"erro": "Nenhuma baixa aplicada: há itens inválidos.", "resultados": invalidos}, None, 422
+
+    lote = str(ObjectId())
+    resultados = {}
+
+    def aplicar(session):
+        resultados.clear()
+        docs = Estoque.decrement_many(receptor_id, baixas, lote, session=session) if baixas else {}
+        aplicadas, movimentos = {}, []
+        for item_id, quantidade in baixas.items():
+            doc = docs.get(item_id)
+            if doc is None:
+                resultados[item_id] = {"item_id": item_id, "quantidade": quantidade, "status": "nao_encontrado",
+                                       "erro": "Item não encontrado no estoque deste receptor."}
+            elif lote in doc.get('lotes_baixa', []):
+                aplicadas[item_id] = quantidade
+                resultados[item_id] = {"item_id": item_id, "quantidade": quantidade, "status": "ok",
+                                       "saldo": doc['quantidade']}
+                movimentos.append(_movimento(doc, TipoMovimentoEnum.SAIDA, -quantidade, doc['quantidade'],
+                                             usuario_id=id_usuario_logado))
+            else:
+                resultados[item_id] = {"item_id": item_id, "quantidade": quantidade, "status": "insuficiente",
+                                       "erro": f"Estoque insuficiente. Disponível: {doc['quantidade']}."}
+
+        if tudo_ou_nada and len(aplicadas) < len(baixas):
+            if session is not None:
+                raise _LoteRecusado()
+            if aplicadas:
+                Estoque.revert_decrements(aplicadas, lote)
+            return
+        _gravar_no_livro(movimentos, session, lambda: Estoque.revert_decrements(aplicadas, lote))
+
+    try:
+        executar_em_transacao(aplicar)
+        recusado = tudo_ou_nada and any(r["status"] != "ok" for r in resultados.values())
+    except _LoteRecusado:
+        recusado = True
+    except Exception as e:
+        return None, str(e), 500
+
+    if recusado:
+        for r in resultados.values():
+            if r["status"] == "ok":
+                r.update(status="revertido", saldo=None)
+    lista = invalidos + list(resultados.values())
+    aplicadas = sum(1 for r in lista if r["status"] == "ok")
+    resposta = {
+        "aplicadas": aplicadas,
+        "falhas": len(lista) - aplicadas,
+        "resultados": lista,
+    }
+    if recusado:
+        resposta["erro"] = "Nenhuma baixa aplicada: há itens sem saldo suficiente ou não encontrados."
+        return resposta, None, 409
+    return resposta, None, 200
+
+
+def listar_movimentos(receptor_id, args):
+    """
+    Histórico de movimentações do receptor, do mais recente para o mais antigo,
+    paginado por cursor. Filtros opcionais: alimento, tipo (entrada, saida, ajuste).
+    """
+    try:
+        limite = parse_limit(args.get('limit'))
+        after = decode_cursor(args['cursor']) if args.get('cursor') else None
+        query = {"receptor_id": receptor_id}
+        if args.get('alimento'):
+            query["alimento"] = args['alimento']
+        if args.get('tipo'):
+            if args['tipo'] not in [t.value for t in TipoMovimentoEnum]:
+                return None, "Parâmetro 'tipo' inválido. Use entrada, saida ou ajuste."
+            query["tipo"] = args['tipo']
+    except ValueError as e:
+        return None, str(e)
+
+    try:
+        docs, tem_mais = MovimentoEstoque.find_page(query, limite, after)
+        itens = [documento_para_json(doc, PADROES_MOVIMENTO) for doc in docs]
+        next_cursor = encode_cursor(docs[-1]['data'], docs[-1]['_id']) if tem_mais else None
+        return {"itens": itens, "next_cursor": next_cursor}, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _inicio_periodo(dia: datetime, granularidade: str) -> datetime:
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def relatorio_consumo(receptor_id, args):
+    """
+    Entradas, saídas e ajustes por período (dia, semana ou mês) de cada alimento do
+    receptor, com o saldo ao fim de cada período, o consumo médio diário e quantos
+    dias o saldo atual dura nesse ritmo. Lê só os resumos diários (no máximo 366 por
+    item em um ano), nunca o livro inteiro.
+
+    Parâmetros: ?de=AAAA-MM-DD&ate=AAAA-MM-DD&granularidade=dia|semana|mes&alimento=...
+    (padrão: últimos 365 dias, por mês).
+    """
+    granularidade = args.get('granularidade') or 'mes'
+    if granularidade not in GRANULARIDADES:
+        return None, "Parâmetro 'granularidade' inválido. Use dia, semana ou mes."
+    try:
+        ate = parse_data(args['ate'], 'ate', fim_do_dia=True) if args.get('ate') else datetime.now()
+        de = parse_data(args['de'], 'de') if args.get('de') else dia_de(ate) - timedelta(days=DIAS_RELATORIO_PADRAO)
+    except ValueError as e:
+        return None, str(e)
+    if de >= ate:
+        return None, "O parâmetro 'de' deve ser anterior a 'ate'."
+
+    try:
+        alimento = args.get('alimento')
+        saldos = {
+            (item['alimento'], item['unidade']): float(item['quantidade'])
+            for item in Estoque.find_docs_by_receptor_id(receptor_id)
+            if not alimento or item['alimento'] == alimento
+        }
+
+        periodos = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+        posteriores = defaultdict(float)  # variação líquida depois de 'ate'
+        for resumo in ResumoDiarioEstoque.find_periodo(receptor_id, de, alimento):
+            chave = (resumo['alimento'], resumo['unidade'])
+            if resumo['dia'] >= ate:
+                posteriores[chave] += resumo.get('entradas', 0) - resumo.get('saidas', 0) + resumo.get('ajustes', 0)
+                continue
+            totais = periodos[chave][_inicio_periodo(resumo['dia'], granularidade)]
+            for campo in ('entradas', 'saidas', 'ajustes'):
+                totais[campo] += resumo.get(campo, 0)
+
+        dias = max((ate - de).total_seconds() / 86400, 1)
+        itens = []
+        for chave in sorted(set(saldos) | set(periodos)):
+            # Saldo ao fim de cada período: parte do saldo atual e desconta o que veio depois
+            saldo = saldos.get(chave, 0.0) - posteriores[chave]
+            serie = []
+            for inicio in sorted(periodos[chave], reverse=True):
+                totais = periodos[chave][inicio]
+                serie.append({
+                    "inicio": inicio,
+                    "entradas": round(totais['entradas'], 3),
+                    "saidas": round(totais['saidas'], 3),
+                    "ajustes": round(totais['ajustes'], 3),
+                    "saldo_final": round(saldo, 3),
+                })
+                saldo -= totais['entradas'] - totais['saidas'] + totais['ajustes']
+            serie.reverse()
+
+            total_saidas = sum(p['saidas'] for p in serie)
+            consumo_diario = total_saidas / dias
+            saldo_atual = saldos.get(chave, 0.0)
+            itens.append({
+                "alimento": chave[0],
+                "unidade": chave[1],
+                "saldo_atual": round(saldo_atual, 3),
+                "total_entradas": round(sum(p['entradas'] for p in serie), 3),
+                "total_saidas": round(total_saidas, 3),
+                "consumo_medio_diario": round(consumo_diario, 3),
+                "dias_de_cobertura": round(saldo_atual / consumo_diario, 1) if consumo_diario else None,
+                "periodos": serie,
+            })
+
+        return {
+            "receptor_id": receptor_id,
+            "de": de,
+            "ate": ate,
+            "granularidade": granularidade,
+            "itens": itens,
+        }, None
+    except Exception as e:
+        return None, str(e)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import os
+from app.services.tempo_real import canal_tempo_real
+from app.utils.serializacao import dumps_bytes
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 5000))
+
+
+def _quadro_sse(evento: dict) -> bytes:
+    """Um evento no formato text/event-stream (id, event, data)."""
+    partes = []
+    if evento.get("_id") is not None:
+        partes.append(f"id: {evento['_id']}\n".encode('utf-8'))
+    partes.append(f"event: {evento.get('tipo', 'message')}\n".encode('utf-8'))
+    partes.append(b"data: " + dumps_bytes(evento) + b"\n\n")
+    return b"".join(partes)
+
+
+def stream_eventos(principal, heartbeat=SSE_HEARTBEAT_SECONDS):
+    """
+    Gerador do stream SSE do usuário: eventos visíveis para a role dele e, sem
+    eventos por `heartbeat` segundos, um comentário para manter a conexão aberta
+    (e detectar clientes que já foram embora).
+    """
+    assinatura = canal_tempo_real.conectar(principal)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode('utf-8')
+        while True:
+            evento = assinatura.proximo(timeout=heartbeat)
+            yield b": ping\n\n" if evento is None else _quadro_sse(evento)
+    finally:
+        canal_tempo_real.desconectar(assinatura)
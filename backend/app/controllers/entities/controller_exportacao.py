@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação de coleções em NDJSON ou CSV, lida direto de um cursor do Mongo.
+
+Os geradores abaixo emitem o arquivo em blocos de `batch_size` documentos, então
+a memória usada não depende do total de linhas exportadas.
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+from app.models.entities.model_doacao import Doacao
+from app.models.entities.model_rota import Rota
+from app.models.entities.model_estoque import Estoque
+from app.models.entities.model_movimentoEstoque import MovimentoEstoque
+from app.utils.serializacao import documento_para_json, dumps_bytes
+
+BATCH_SIZE_PADRAO = 1000
+BATCH_SIZE_MAXIMO = 10000
+
+# Por coleção: model, campo de data usado em de/ate e colunas do CSV
+# (caminhos com '.' acessam sub-documentos)
+EXPORTACOES = {
+    'doacoes': {
+        'model': Doacao,
+        'campo_data': 'data_criacao',
+        'colunas': ['id', 'doador_id', 'receptor_id', 'motorista_id', 'alimento', 'quantidade',
+                    'unidade', 'validade', 'status', 'data_criacao'],
+    },
+    'rotas': {
+        'model': Rota,
+        'campo_data': 'data_criacao',
+        'colunas': ['id', 'doacao_id', 'motorista_id', 'status', 'endereco_origem.cep', 'endereco_destino.cep',
+                    'distancia_km', 'duracao_min', 'provedor', 'distancia_texto', 'duracao_texto',
+                    'data_criacao', 'data_conclusao'],
+    },
+    'estoque': {
+        'model': Estoque,
+        'campo_data': 'data_atualizacao',
+        'colunas': ['id', 'receptor_id', 'alimento', 'quantidade', 'unidade', 'local', 'data_atualizacao'],
+    },
+    'movimentos_estoque': {
+        'model': MovimentoEstoque,
+        'campo_data': 'data',
+        'colunas': ['id', 'item_id', 'receptor_id', 'alimento', 'unidade', 'tipo', 'quantidade', 'saldo',
+                    'doacao_id', 'rota_id', 'usuario_id', 'data'],
+    },
+}
+
+
+def parse_data(valor, nome, fim_do_dia=False):
+    """Aceita 'AAAA-MM-DD' ou data/hora ISO. Datas sem hora em 'ate' incluem o dia inteiro."""
+    try:
+        if len(valor) == 10:
+            data = datetime.strptime(valor, '%Y-%m-%d')
+            return data + timedelta(days=1) if fim_do_dia else data
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"Parâmetro '{nome}' inválido. Use AAAA-MM-DD.")
+
+
+def preparar_exportacao(colecao, args):
+    """
+    Valida os parâmetros e abre o cursor.
+    Retorna ((cursor, colunas, batch_size), None) ou (None, erro).
+    """
+    config = EXPORTACOES.get(colecao)
+    if not config:
+        return None, f"Coleção '{colecao}' não pode ser exportada."
+
+    try:
+        query = {}
+        campo_data = config['campo_data']
+        if args.get('de'):
+            query.setdefault(campo_data, {})['$gte'] = parse_data(args['de'], 'de')
+        if args.get('ate'):
+            query.setdefault(campo_data, {})['$lt'] = parse_data(args['ate'], 'ate', fim_do_dia=True)
+
+        if args.get('status'):
+            status = [s.strip() for s in args['status'].split(',') if s.strip()]
+            query['status'] = status[0] if len(status) == 1 else {'$in': status}
+        if args.get('receptor_id'):
+            query['receptor_id'] = args['receptor_id']
+    except ValueError as e:
+        return None, str(e)
+
+    try:
+        batch_size = int(args.get('batch_size') or BATCH_SIZE_PADRAO)
+    except ValueError:
+        batch_size = 0
+    if batch_size < 1:
+        return None, "Parâmetro 'batch_size' inválido."
+    batch_size = min(batch_size, BATCH_SIZE_MAXIMO)
+
+    cursor = config['model'].find_cursor(query, batch_size=batch_size)
+    return (cursor, config['colunas'], batch_size), None
+
+
+def _valor(doc, caminho):
+    valor = doc
+    for parte in caminho.split('.'):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def _celula(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, (dict, list)):
+        return dumps_bytes(valor).decode('utf-8')
+    return str(valor)
+
+
+def gerar_ndjson(cursor, batch_size):
+    """Um documento JSON por linha, emitido em blocos de `batch_size` linhas."""
+    try:
+        bloco = []
+        for doc in cursor:
+            bloco.append(dumps_bytes(documento_para_json(doc), ordenar=False))
+            if len(bloco) >= batch_size:
+                yield b'\n'.join(bloco) + b'\n'
+                bloco = []
+        if bloco:
+            yield b'\n'.join(bloco) + b'\n'
+    finally:
+        # Cliente desconectou no meio ou terminou: libera o cursor no servidor
+        cursor.close()
+
+
+def gerar_csv(cursor, colunas, batch_size):
+    """CSV com cabeçalho, emitido em blocos de `batch_size` linhas."""
+    try:
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(colunas)
+        linhas = 0
+        for doc in cursor:
+            doc = documento_para_json(doc)
+            escritor.writerow([_celula(_valor(doc, c)) for c in colunas])
+            linhas += 1
+            if linhas >= batch_size:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+                linhas = 0
+        yield buffer.getvalue().encode('utf-8')
+    finally:
+        cursor.close()
@@ -2,6 +2,7 @@
 
 from app.models.entities.model_usuarioUnificado import Motorista, RoleEnum
 from pydantic import ValidationError
+from app.utils.serializacao import documento_para_json, padroes_do_model
 
 def create_motorista(data):
     """Cria um novo motorista usando o modelo unificado."""
@@ -26,8 +27,9 @@ def create_motorista(data):
 def get_all_motoristas():
     """Busca todos os motoristas do banco."""
     try:
-        motoristas = Motorista.find_all_by_role(RoleEnum.MOTORISTA)
-        return [m.dict(exclude={'senha'}) for m in motoristas], None
+        padroes = padroes_do_model(Motorista, excluir={'senha'})
+        motoristas = Motorista.find_docs_by_role(RoleEnum.MOTORISTA)
+        return [documento_para_json(d, padroes) for d in motoristas], None
     except Exception as e:
         return None, str(e)
 
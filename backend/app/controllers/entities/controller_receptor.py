@@ -2,6 +2,17 @@
 
 from app.models.entities.model_usuarioUnificado import Receptor, RoleEnum
 from pydantic import ValidationError
+from app.models.entities.model_usuarioUnificado import Usuario
+from app.services.geo import ponto_geojson, coordenadas_do_usuario
+from app.utils.serializacao import documento_para_json, padroes_do_model
+
+RAIO_PROXIMOS_PADRAO_KM = 10.0
+RAIO_PROXIMOS_MAXIMO_KM = 200.0
+LIMITE_PROXIMOS_MAXIMO = 100
+
+# Dados de contato exibidos na busca por proximidade
+CAMPOS_PROXIMOS = {"nome": 1, "telefones": 1, "endereco": 1, "horario_disponibilidade": 1,
+                   "numero_beneficiarios": 1, "tipo_armazenamento": 1, "localizacao": 1, "distancia_km": 1}
 
 def create_receptor(data):
     try:
@@ -21,10 +32,11 @@ def create_receptor(data):
     except Exception as e:
         return None, str(e)
 
-def get_all_receptor():
+def get_all_receptores():
     try:
-        receptor = Receptor.find_all_by_role(RoleEnum.RECEPTOR)
-        return [a.dict(exclude={'senha'}) for a in receptor], None
+        padroes = padroes_do_model(Receptor, excluir={'senha'})
+        receptor = Receptor.find_docs_by_role(RoleEnum.RECEPTOR)
+        return [documento_para_json(d, padroes) for d in receptor], None
     except Exception as e:
         return None, str(e)
 
@@ -52,4 +64,36 @@ def delete_receptor(id):
             return {"mensagem": "Receptor deletado com sucesso."}, None
         return None, "Receptor não encontrado."
     except Exception as e:
-        return None, str(e)
\ No newline at end of file
+        return None, str(e)
+
+def get_receptores_proximos(id_usuario, args):
+    """
+    Receptores a até 'raio_km' (padrão 10) de um ponto: ?lat=&lon=, ?cep= ou, sem
+    nenhum deles, o endereço do próprio usuário logado.
+    """
+    try:
+        try:
+            raio_km = float(args.get('raio_km') or RAIO_PROXIMOS_PADRAO_KM)
+            limite = int(args.get('limite') or 20)
+        except ValueError:
+            return None, "Parâmetros 'raio_km'/'limite' inválidos."
+        if not 0 < raio_km <= RAIO_PROXIMOS_MAXIMO_KM or not 1 <= limite <= LIMITE_PROXIMOS_MAXIMO:
+            return None, f"Parâmetros inválidos: 0 < raio_km <= {RAIO_PROXIMOS_MAXIMO_KM:g} e 1 <= limite <= {LIMITE_PROXIMOS_MAXIMO}."
+
+        if args.get('lat') and args.get('lon'):
+            try: ponto = (float(args['lat']), float(args['lon']))
+            except ValueError: return None, "Parâmetros 'lat'/'lon' inválidos."
+        elif args.get('cep'):
+            ponto = ponto_geojson(args['cep'])
+            if ponto is None: return None, "CEP não reconhecido."
+        else:
+            usuarios = Usuario.find_docs_by_ids([id_usuario], {"localizacao": 1, "endereco.cep": 1})
+            ponto = coordenadas_do_usuario(usuarios[0]) if usuarios else None
+            if ponto is None: return None, "Informe 'lat'/'lon' ou 'cep': usuário sem endereço reconhecido."
+
+        receptores = Receptor.find_near(ponto, raio_km, limite, projection=CAMPOS_PROXIMOS)
+        for r in receptores:
+            r['distancia_km'] = round(r['distancia_km'], 3)
+        return [documento_para_json(r) for r in receptores], None
+    except Exception as e:
+        return None, str(e)
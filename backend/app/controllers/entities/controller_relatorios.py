@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import os
+import traceback
+from collections import defaultdict
+from datetime import datetime, timedelta
+from app.controllers.entities.controller_exportacao import parse_data
+from app.models.entities.model_resumoDoacao import ResumoDoacoes, ENTIDADES, GRANULARIDADES
+
+# Período padrão (dias até 'ate') e tamanho médio do balde, por granularidade
+DIAS_PADRAO = {'dia': 31, 'semana': 182, 'mes': 730}
+DIAS_POR_PERIODO = {'dia': 1, 'semana': 7, 'mes': 28}
+RELATORIOS_MAX_PERIODOS = int(os.getenv('RELATORIOS_MAX_PERIODOS', 400))
+
+
+def relatorio_doacoes(entidade, entidade_id, args):
+    """
+    Doações entregues ao longo do tempo para um doador ou receptor, lidas dos
+    resumos pré-agregados (um documento por período). Cada período traz o número
+    de doações, a quantidade por unidade, o peso aproximado em kg e quantos
+    receptores (ou doadores) distintos participaram; 'totais' soma o intervalo.
+    Períodos sem entregas não aparecem.
+
+    Parâmetros: ?de=AAAA-MM-DD&ate=AAAA-MM-DD&granularidade=dia|semana|mes
+    (padrão: por mês, últimos 2 anos).
+    """
+    if entidade not in ENTIDADES:
+        return None, "Parâmetro 'entidade' inválido. Use doador ou receptor."
+    if not entidade_id:
+        return None, "Parâmetro 'id' é obrigatório."
+    granularidade = args.get('granularidade') or 'mes'
+    if granularidade not in GRANULARIDADES:
+        return None, "Parâmetro 'granularidade' inválido. Use dia, semana ou mes."
+    try:
+        ate = parse_data(args['ate'], 'ate', fim_do_dia=True) if args.get('ate') else datetime.now()
+        de = parse_data(args['de'], 'de') if args.get('de') else ate - timedelta(days=DIAS_PADRAO[granularidade])
+    except ValueError as e:
+        return None, str(e)
+    if de >= ate:
+        return None, "O parâmetro 'de' deve ser anterior a 'ate'."
+    if (ate - de).days / DIAS_POR_PERIODO[granularidade] > RELATORIOS_MAX_PERIODOS:
+        return None, f"Intervalo longo demais para a granularidade '{granularidade}' (máximo de {RELATORIOS_MAX_PERIODOS} períodos)."
+
+    campo_parceiros = ENTIDADES[entidade][2]
+    try:
+        periodos = []
+        quantidade_total = defaultdict(float)
+        parceiros_total = set()
+        doacoes_total, kg_total = 0, 0.0
+        for balde in ResumoDoacoes.find_periodos(entidade, entidade_id, granularidade, de, ate):
+            parceiros = balde.get(campo_parceiros, [])
+            periodos.append({
+                "periodo": balde["periodo"],
+                "inicio": balde["inicio"],
+                "doacoes": balde.get("doacoes", 0),
+                "quantidade": {u: round(q, 3) for u, q in balde.get("quantidade", {}).items()},
+                "kg": round(balde.get("kg", 0), 3),
+                campo_parceiros: len(parceiros),
+            })
+            doacoes_total += balde.get("doacoes", 0)
+            kg_total += balde.get("kg", 0)
+            for unidade, quantidade in balde.get("quantidade", {}).items():
+                quantidade_total[unidade] += quantidade
+            parceiros_total.update(parceiros)
+
+        return {
+            "entidade": entidade,
+            "id": entidade_id,
+            "granularidade": granularidade,
+            "de": de,
+            "ate": ate,
+            "periodos": periodos,
+            "totais": {
+                "doacoes": int(doacoes_total),
+                "quantidade": {u: round(q, 3) for u, q in quantidade_total.items()},
+                "kg": round(kg_total, 3),
+                campo_parceiros: len(parceiros_total),
+            },
+        }, None
+    except Exception as e:
+        traceback.print_exc()
+        return None, str(e)
+
+
+def reconstruir_resumos():
+    """Refaz os resumos de doações a partir das doações entregues."""
+    return ResumoDoacoes.reconstruir()
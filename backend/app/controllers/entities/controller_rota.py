@@ -1,11 +1,26 @@
 # -*- coding: utf-8 -*-
-import os
-import requests
 import traceback
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from app.models.entities.model_doacao import Doacao
-from app.models.entities.model_usuarioUnificado import Doador, Receptor, RoleEnum, Motorista
+from app.models.entities.model_usuarioUnificado import Usuario, Doador, Receptor, RoleEnum, Motorista
 from app.models.entities.model_rota import Rota, StatusRotaEnum
+from app.models.entities.model_planoRota import PlanoRota, ParadaRota
+from app.services.cache_rotas import cache_rotas
+from app.services.geo import resolver_cep
+from app.services.provedores_rota import calcular_trajeto, duracao_estimada_min
+from app.services.fila_rotas import FilaRotas, job_para_json
+from app.services.planejador_rotas import planejar
+from app.services.ciclo_rota import transicionar_rota
+from app.exceptions.custom_exceptions import RotaDoBemException
+from app.utils.serializacao import documento_para_json, padroes_do_model
 from datetime import datetime
+import os
+
+ROUTE_PLAN_MAX_PEDIDOS = int(os.getenv('ROUTE_PLAN_MAX_PEDIDOS', 10))
+
+PADROES_ROTA = padroes_do_model(Rota)
+PADROES_PLANO = padroes_do_model(PlanoRota)
 
 def obter_enderecos_por_doacao(doacao_id):
     try:
@@ -43,88 +58,220 @@ def calcular_e_salvar_rota(doacao_id):
             "google_maps_link": f"https://www.google.com/maps/dir/?api=1&origin={enderecos['origem']['cep']}&destination={enderecos['destino']['cep']}"
         }
 
-        # ... (código anterior da função) ...
-
-        # Tenta API Real se tiver chave
-        API_KEY = os.getenv('API_KEY')
-        if API_KEY:
-            print(f"🔄 Tentando conectar Google Maps com chave: {API_KEY[:5]}...") # Mostra inicio da chave
-            try:
-                origem = f"{enderecos['origem']['cep']}"
-                destino = f"{enderecos['destino']['cep']}"
-                url = f"https://maps.googleapis.com/maps/api/directions/json?origin={origem}&destination={destino}&key={API_KEY}&language=pt-BR"
-                
-                resp = requests.get(url, timeout=5)
-                print(f"📡 Status HTTP Google: {resp.status_code}") # 200 = Conectou
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    print(f"📦 Resposta Google: {data['status']}") # OK, REQUEST_DENIED, etc.
-                    
-                    if data['status'] == 'OK':
-                        leg = data['routes'][0]['legs'][0]
-                        dados_rota['distancia_texto'] = leg['distance']['text']
-                        dados_rota['duracao_texto'] = leg['duration']['text']
-                        dados_rota['resumo_rota'] = data['routes'][0]['summary']
-                        dados_rota['google_maps_link'] = f"https://www.google.com/maps/dir/?api=1&origin={origem}&destination={destino}"
-                        print("✅ Rota calculada com sucesso pela API!")
-                    else:
-                        # AQUI VAI APARECER O MOTIVO DO ERRO
-                        print(f"❌ Erro na API do Google: {data.get('error_message', 'Sem mensagem')}")
-                else:
-                    print(f"❌ Erro de Conexão: {resp.text}")
-
-            except Exception as api_err:
-                print(f"❌ Exceção ao conectar Google: {api_err}")
+        # Provedores de rota conforme ROUTE_PROVIDER (services/provedores_rota.py).
+        # Os valores simulados acima só ficam se nenhum provedor resolver os CEPs.
+        resultado = calcular_trajeto(enderecos['origem']['cep'], enderecos['destino']['cep'])
+        if resultado:
+            dados_rota.update(resultado)
 
         nova_rota = Rota(**dados_rota)
-        nova_rota.save()
+        try:
+            nova_rota.save()
+        except DuplicateKeyError:
+            # Outro worker (ou o pré-cálculo) gravou a rota desta doação primeiro
+            return Rota.find_by_doacao_id(doacao_id).model_dump(mode='json'), None
         return nova_rota.model_dump(mode='json'), None
     except Exception as e:
         traceback.print_exc()
         return None, f"Erro interno ao calcular rota: {str(e)}"
 
-def atribuir_motorista_rota(rota_id, motorista_id):
+# Fila de cálculo em segundo plano: os workers executam calcular_e_salvar_rota
+fila_rotas = FilaRotas(processar=calcular_e_salvar_rota)
+
+def solicitar_calculo_rota(doacao_id):
+    """
+    Retorna a rota se ela já existir (200). Caso contrário, enfileira o cálculo
+    e retorna o job (202), para que a requisição não fique presa na API externa.
+    """
     try:
-        if not motorista_id:
-            return None, "ID do motorista não identificado."
-
-        rota = Rota.find_by_id(rota_id)
-        if not rota: return None, "Rota não encontrada"
-        
-        # Atualiza Rota
-        Rota.update(rota_id, {"motorista_id": motorista_id, "status": StatusRotaEnum.EM_ANDAMENTO.value})
-        # Atualiza Doação
-        Doacao.update(rota.doacao_id, {"status": "a caminho", "motorista_id": motorista_id})
-        
-        return {"mensagem": "Corrida aceita com sucesso! Boa entrega."}, None
+        rota_existente = Rota.find_by_doacao_id(doacao_id)
+        if rota_existente: return rota_existente.model_dump(mode='json'), None, 200
+
+        if not Doacao.find_by_id(doacao_id): return None, "Doação não encontrada.", 404
+
+        job = fila_rotas.enfileirar(doacao_id)
+        return job_para_json(job), None, 202
     except Exception as e:
         traceback.print_exc()
-        return None, f"Erro ao aceitar corrida: {str(e)}"
+        return None, f"Erro ao enfileirar cálculo de rota: {str(e)}", 500
 
-def marcar_rota_status(rota_id, novo_status):
+def precalcular_rotas_pendentes():
+    """
+    Enfileira o cálculo de rota de todas as doações 'aceita' que ainda não têm rota.
+    A concorrência fica limitada pelo número de workers da fila.
+    """
     try:
-        rota = Rota.find_by_id(rota_id)
-        if not rota: return None, "Rota não encontrada"
+        aceitas = Doacao.find_ids({"status": "aceita"})
+        com_rota = Rota.doacao_ids_com_rota(aceitas)
+        faltando = [d for d in aceitas if d not in com_rota]
 
-        Rota.update(rota_id, {"status": novo_status})
-        
-        if novo_status == StatusRotaEnum.CONCLUIDA.value:
-            Doacao.update(rota.doacao_id, {"status": "recebida"}) 
-        elif novo_status == StatusRotaEnum.CANCELADA.value:
-            Doacao.update(rota.doacao_id, {"status": "aceita", "motorista_id": None}) 
+        jobs = [fila_rotas.enfileirar(doacao_id) for doacao_id in faltando]
+        return {
+            "doacoes_sem_rota": len(faltando),
+            "jobs": [str(j["_id"]) for j in jobs]
+        }, None
+    except Exception as e:
+        traceback.print_exc()
+        return None, f"Erro ao pré-calcular rotas: {str(e)}"
 
-        return {"mensagem": f"Status atualizado para {novo_status}."}, None
+def get_job_rota(job_id):
+    try:
+        job = fila_rotas.buscar(job_id)
+        if not job: return None, "Job não encontrado."
+        return job_para_json(job), None
+    except Exception as e:
+        return None, str(e)
+
+def planejar_rotas(data):
+    """
+    Agrupa as doações aceitas (ainda sem motorista) em rotas com várias paradas,
+    uma por motorista disponível, minimizando a distância total.
+
+    Doações que já estão em um plano ativo ficam de fora (em 'ignoradas'); com
+    substituir=true, os planos ainda pendentes que as contêm são cancelados e as
+    doações replanejadas. Nenhum motorista recebe mais que max_pedidos_por_motorista:
+    o excedente também volta em 'ignoradas'.
+
+    Campos opcionais do corpo: doacao_ids, motorista_ids, max_pedidos_por_motorista,
+    substituir (padrão false) e salvar (padrão true; false só simula).
+    """
+    try:
+        data = data or {}
+        max_pedidos = int(data.get('max_pedidos_por_motorista', ROUTE_PLAN_MAX_PEDIDOS))
+        if max_pedidos < 1: return None, "max_pedidos_por_motorista deve ser maior que zero.", 400
+
+        query = {"status": "aceita", "motorista_id": None}
+        if data.get('doacao_ids'):
+            query["_id"] = {"$in": [ObjectId(i) for i in data['doacao_ids'] if ObjectId.is_valid(i)]}
+        doacoes = Doacao.find_all(query)
+
+        ignoradas = []
+        salvar, substituir = data.get('salvar', True), data.get('substituir', False)
+        em_planos = PlanoRota.find_ativos_por_doacao([d.id for d in doacoes]) if doacoes else {}
+        substituiveis = {d: p for d, p in em_planos.items() if substituir and p['status'] == StatusRotaEnum.PENDENTE.value}
+        for d in doacoes:
+            if d.id in em_planos and d.id not in substituiveis:
+                ignoradas.append({"doacao_id": d.id, "motivo": f"Já está no plano ativo {em_planos[d.id]['_id']}."})
+        doacoes = [d for d in doacoes if d.id not in em_planos or d.id in substituiveis]
+
+        motoristas = [
+            m for m in Usuario.find_all_by_role(RoleEnum.MOTORISTA)
+            if m.status == 'disponivel'
+        ]
+        if data.get('motorista_ids'):
+            permitidos = set(data['motorista_ids'])
+            motoristas = [m for m in motoristas if m.id in permitidos]
+
+        if not doacoes: return {"planos": [], "ignoradas": ignoradas, "resumo": None}, None, 200
+        if not motoristas: return None, "Nenhum motorista disponível.", 409
+
+        # Endereços de todos os doadores/receptores numa única consulta
+        usuarios = Usuario.find_by_ids({d.doador_id for d in doacoes} | {d.receptor_id for d in doacoes})
+
+        pedidos, coletas, entregas = [], [], []
+        for d in doacoes:
+            doador, receptor = usuarios.get(d.doador_id), usuarios.get(d.receptor_id)
+            origem = resolver_cep(doador.endereco.cep) if doador else None
+            destino = resolver_cep(receptor.endereco.cep) if receptor else None
+            if not origem or not destino:
+                ignoradas.append({"doacao_id": d.id, "motivo": "Endereço de coleta ou entrega não localizado."})
+                continue
+            pedidos.append((d, doador.endereco, receptor.endereco))
+            coletas.append(origem[:2])
+            entregas.append(destino[:2])
+
+        rotas, sem_motorista = planejar(coletas, entregas, len(motoristas), max_pedidos)
+        for p in sem_motorista:
+            ignoradas.append({"doacao_id": pedidos[p][0].id, "motivo": "Sem motorista com capacidade disponível."})
+
+        if salvar and substituiveis:
+            PlanoRota.cancelar_pendentes(list({str(p['_id']) for p in substituiveis.values()}))
+
+        planos = []
+        for motorista, rota in zip(motoristas, rotas):
+            paradas = []
+            for ordem, ((p, tipo), km) in enumerate(zip(rota['sequencia'], rota['trechos_km']), start=1):
+                doacao, end_coleta, end_entrega = pedidos[p]
+                paradas.append(ParadaRota(
+                    ordem=ordem, tipo=tipo, doacao_id=doacao.id,
+                    endereco=end_coleta if tipo == 'coleta' else end_entrega,
+                    distancia_km=round(km, 3)
+                ))
+            trechos = rota['trechos_km'][1:]
+            plano = PlanoRota(
+                motorista_id=motorista.id,
+                doacao_ids=[pedidos[p][0].id for p in rota['pedidos']],
+                paradas=paradas,
+                distancia_total_km=round(rota['distancia_km'], 3),
+                distancia_base_km=round(rota['distancia_base_km'], 3),
+                duracao_estimada_min=round(float(duracao_estimada_min(trechos).sum()), 1) if trechos else 0.0
+            )
+            if salvar:
+                plano.save()
+            planos.append(plano.model_dump(mode='json'))
+
+        total = sum(p['distancia_total_km'] for p in planos)
+        base = sum(p['distancia_base_km'] for p in planos)
+        resumo = {
+            "doacoes": sum(len(p["doacao_ids"]) for p in planos),
+            "motoristas": len(planos),
+            "distancia_total_km": round(total, 3),
+            "distancia_base_km": round(base, 3),
+            "economia_km": round(base - total, 3),
+            "economia_percentual": round((base - total) / base * 100, 1) if base else 0.0
+        }
+        return {"planos": planos, "ignoradas": ignoradas, "resumo": resumo}, None, 200
+    except (TypeError, ValueError) as e:
+        return None, f"Parâmetros inválidos: {str(e)}", 400
+    except Exception as e:
+        traceback.print_exc()
+        return None, f"Erro ao planejar rotas: {str(e)}", 500
+
+def get_planos_rota(motorista_id=None, status=None):
+    try:
+        query = {}
+        if motorista_id: query['motorista_id'] = motorista_id
+        if status: query['status'] = status
+        return [documento_para_json(p, PADROES_PLANO) for p in PlanoRota.find_docs(query)], None
+    except Exception as e:
+        return None, str(e)
+
+def atribuir_motorista_rota(rota_id, motorista_id, versao=None):
+    """
+    Atribuição atômica: a rota só muda se ainda estiver pendente e livre (ou já
+    reservada para este motorista) e, se informada, na `versao` lida pelo cliente.
+    Retorna (resposta, erro, status_code); quem perde a corrida recebe 409.
+    """
+    try:
+        evento = transicionar_rota(rota_id, StatusRotaEnum.EM_ANDAMENTO.value, motorista_id=motorista_id, versao=versao)
+        return {"mensagem": "Corrida aceita com sucesso! Boa entrega.", "versao": evento["versao"]}, None, 200
+    except RotaDoBemException as e:
+        return None, e.message, e.status_code
+    except Exception as e:
+        traceback.print_exc()
+        return None, f"Erro ao aceitar corrida: {str(e)}", 500
+
+def marcar_rota_status(rota_id, novo_status, versao=None):
+    """
+    Muda o status da rota pela máquina de estados (services/ciclo_rota.py), com
+    a doação (e o estoque do receptor, na conclusão) na mesma transação.
+    Retorna (resposta, erro, status_code).
+    """
+    try:
+        evento = transicionar_rota(rota_id, novo_status, versao=versao)
+        return {"mensagem": f"Status atualizado para {novo_status}.", "versao": evento["versao"]}, None, 200
+    except RotaDoBemException as e:
+        return None, e.message, e.status_code
     except Exception as e:
         traceback.print_exc()
-        return None, f"Erro ao atualizar status: {str(e)}"
+        return None, f"Erro ao atualizar status: {str(e)}", 500
 
 def get_todas_rotas(status=None):
     try:
         query = {}
         if status: query['status'] = status
-        rotas = Rota.find_all(query)
-        return [r.model_dump(mode='json') for r in rotas], None
+        rotas = Rota.find_docs(query)
+        return [documento_para_json(r, PADROES_ROTA) for r in rotas], None
     except Exception as e:
         return None, str(e)
 
@@ -134,4 +281,10 @@ def get_rota_por_id(id):
         if r: return r.model_dump(mode='json'), None
         return None, "Não encontrada"
     except Exception as e:
-        return None, str(e)
\ No newline at end of file
+        return None, str(e)
+
+def get_cache_stats():
+    try:
+        return cache_rotas.stats(), None
+    except Exception as e:
+        return None, str(e)
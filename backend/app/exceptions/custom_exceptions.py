@@ -30,6 +30,11 @@ class ForbiddenError(RotaDoBemException):
     def __init__(self, message="Acesso negado"):
         super().__init__(message, 403)
 
+class ConflictError(RotaDoBemException):
+    """Estado do recurso mudou (ex.: outra requisição chegou antes)"""
+    def __init__(self, message="Conflito com o estado atual do recurso"):
+        super().__init__(message, 409)
+
 class DatabaseError(RotaDoBemException):
     """Erro de banco de dados"""
     def __init__(self, message="Erro de banco de dados"):
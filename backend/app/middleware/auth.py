@@ -1,45 +1,175 @@
 # -*- coding: utf-8 -*-
-from flask import jsonify
+"""
+Camada única de autorização.
+
+O token é verificado no máximo uma vez por requisição: o resultado vira um
+`Principal` (id, role, nome) guardado em `g.principal`, que os decorators e as
+políticas de blueprint apenas consultam. Tokens já verificados ficam num cache em
+memória até expirarem, então requisições seguintes com o mesmo token não refazem
+a decodificação/assinatura do JWT.
+
+`get_jwt()`/`get_jwt_identity()` continuam funcionando nas rotas: o cache também
+preenche o contexto do flask_jwt_extended.
+
+Rotas declaradas em `token_na_query` (ex.: o stream SSE, já que o EventSource do
+navegador não envia cabeçalhos) aceitam também `?token=<jwt>`.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from flask import jsonify, g, request
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, decode_token, get_unverified_jwt_headers
 from flask_jwt_extended.exceptions import NoAuthorizationError, InvalidHeaderError
 from jwt.exceptions import ExpiredSignatureError
 
+AUTH_TOKEN_CACHE_MAX_ITEMS = int(os.getenv('AUTH_TOKEN_CACHE_MAX_ITEMS', 10000))
+
+
+class Principal(NamedTuple):
+    """Usuário autenticado da requisição atual."""
+    id: str
+    role: Optional[str]
+    nome: Optional[str]
+
+
+class CacheTokens:
+    """LRU de tokens verificados, cada um válido até o seu 'exp'."""
+
+    def __init__(self, max_itens=AUTH_TOKEN_CACHE_MAX_ITEMS):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # token -> (exp, header, claims, principal)
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            item = self._itens.get(token)
+            if item is None:
+                return None
+            if item[0] is not None and item[0] <= time.time():
+                del self._itens[token]
+                return None
+            self._itens.move_to_end(token)
+            return item
+
+    def set(self, token, header, claims, principal):
+        with self._lock:
+            self._itens[token] = (claims.get('exp'), header, claims, principal)
+            self._itens.move_to_end(token)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+cache_tokens = CacheTokens()
+
+
+def _token_da_requisicao():
+    cabecalho = request.headers.get('Authorization', '')
+    return cabecalho if cabecalho.startswith('Bearer ') else None
+
+
+def _token_da_query():
+    token = request.args.get('token')
+    return f"Bearer {token}" if token else None
+
+
+def _verificar_token_da_query(token):
+    """Mesma verificação do verify_jwt_in_request, para o token vindo da query string."""
+    jwt = token[len('Bearer '):]
+    claims = decode_token(jwt)
+    if claims.get('type') != 'access':
+        raise InvalidHeaderError("Apenas tokens de acesso são aceitos.")
+    return get_unverified_jwt_headers(jwt), claims
+
+
+def carregar_principal(permitir_query=False):
+    """
+    Autentica a requisição (uma única vez) e retorna o Principal.
+    Lança as exceções do flask_jwt_extended/PyJWT se o token for inválido.
+    """
+    principal = g.get('principal')
+    if principal is not None:
+        return principal
+
+    token = _token_da_requisicao()
+    da_query = token is None and permitir_query and _token_da_query() is not None
+    if da_query:
+        token = _token_da_query()
+    item = cache_tokens.get(token) if token else None
+    if item is not None:
+        _, header, claims, principal = item
+        # Mesmo estado que verify_jwt_in_request deixaria no contexto
+        g._jwt_extended_jwt_user = {"loaded_user": None}
+        g._jwt_extended_jwt_header = header
+        g._jwt_extended_jwt = claims
+        g._jwt_extended_jwt_location = 'headers'
+    else:
+        resultado = _verificar_token_da_query(token) if da_query else verify_jwt_in_request()
+        if resultado is None:
+            raise NoAuthorizationError("Token não verificado para este método.")
+        header, claims = resultado
+        principal = Principal(id=str(claims.get('sub')), role=claims.get('role'), nome=claims.get('nome'))
+        if token:
+            cache_tokens.set(token, header, claims, principal)
+
+    g.principal = principal
+    return principal
+
+
+def principal_atual() -> Principal:
+    """Principal da requisição (requer auth_required ou uma política no blueprint)."""
+    return carregar_principal()
+
+
+def _autenticar(permitir_query=False):
+    """Retorna None se autenticado, ou a resposta 401."""
+    try:
+        carregar_principal(permitir_query)
+    except (NoAuthorizationError, InvalidHeaderError) as e:
+        return jsonify({
+            "error": "Cabecalho de autorizacao ausente ou invalido.",
+            "details": str(e)
+        }), 401
+    except ExpiredSignatureError as e:
+        return jsonify({
+            "error": "Token de acesso expirado.",
+            "details": str(e)
+        }), 401
+    except Exception as e:
+        return jsonify({
+            "error": "Nao foi possivel validar o token de acesso.",
+            "details": str(e)
+        }), 401
+    return None
+
+
+def _autorizar(roles):
+    """Retorna None se o principal tem uma das roles, ou a resposta 403."""
+    if g.principal.role not in roles:
+        if len(roles) == 1:
+            return jsonify({"error": f"Acesso restrito. Requer permissao de '{roles[0]}'."}), 403
+        return jsonify({"error": "Acesso restrito. Permissao insuficiente."}), 403
+    return None
+
+
 # Decorator para verificar se o usuario esta logado
 def auth_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        try:
-            verify_jwt_in_request()
-        except (NoAuthorizationError, InvalidHeaderError) as e:
-            return jsonify({
-                "error": "Cabecalho de autorizacao ausente ou invalido.",
-                "details": str(e)
-            }), 401
-        except ExpiredSignatureError as e:
-            return jsonify({
-                "error": "Token de acesso expirado.",
-                "details": str(e)
-            }), 401
-        except Exception as e:
-            return jsonify({
-                "error": "Nao foi possivel validar o token de acesso.",
-                "details": str(e)
-            }), 401
+        erro = _autenticar()
+        if erro: return erro
         return f(*args, **kwargs)
     return decorated_function
 
 # Decorator para verificar se o usuario tem a permissao (role) necessaria
 def role_required(required_role):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            claims = get_jwt()
-            if claims.get("role") != required_role:
-                return jsonify({"error": f"Acesso restrito. Requer permissao de '{required_role}'."}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
+    return roles_required([required_role])
 
 
 def roles_required(required_roles):
@@ -47,13 +177,48 @@ def roles_required(required_roles):
     Decorator que verifica se o usuario tem uma das roles necessarias.
     Recebe uma lista de roles permitidas.
     """
+    roles = list(required_roles)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            claims = get_jwt()
-            user_role = claims.get("role")
-            if user_role not in required_roles:
-                return jsonify({"error": "Acesso restrito. Permissao insuficiente."}), 403
+            erro = _autenticar() or _autorizar(roles)
+            if erro: return erro
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def aplicar_politica(blueprint, roles=None, publicas=(), por_endpoint=None, token_na_query=()):
+    """
+    Política declarativa para todas as rotas de um blueprint:
+
+        aplicar_politica(admin_routes, roles=['admin'])
+        aplicar_politica(doador_routes, publicas=['create'])
+
+    - roles: roles aceitas por padrão (None = qualquer usuário autenticado)
+    - publicas: nomes das funções de rota que não exigem token
+    - por_endpoint: {nome_da_funcao: [roles]} sobrescreve `roles` na rota
+    - token_na_query: nomes das funções de rota que aceitam o token em `?token=`
+
+    A verificação roda em `before_request`, antes da função da rota; os decorators
+    empilhados na rota reaproveitam o Principal já carregado.
+    """
+    padrao = list(roles) if roles else None
+    especificas = {nome: list(r) for nome, r in (por_endpoint or {}).items()}
+    publicas = set(publicas)
+    token_na_query = set(token_na_query)
+
+    @blueprint.before_request
+    def _verificar_politica():
+        funcao = (request.endpoint or '').rsplit('.', 1)[-1]
+        if request.method == 'OPTIONS' or funcao in publicas:
+            return None
+        erro = _autenticar(funcao in token_na_query)
+        if erro: return erro
+        exigidas = especificas.get(funcao, padrao)
+        if exigidas:
+            return _autorizar(exigidas)
+        return None
+
+    return blueprint
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from app.config.database import connect_db
+from app.config.database import get_db
 from pydantic import Field
 from bson import ObjectId
 
@@ -16,7 +16,7 @@ class Config:
         json_encoders = {ObjectId: str}
 
     def save(self):
-        db = connect_db()
+        db = get_db()
         data = self.dict(by_alias=True, exclude_none=True)
         result = db.admins.insert_one(data)
         self.id = str(result.inserted_id)
@@ -24,7 +24,7 @@ def save(self):
 
     @classmethod
     def find_by_id(cls, id: str):
-        db = connect_db()
+        db = get_db()
         data = db.admins.find_one({"_id": ObjectId(id)})
         if data:
             return cls(**data)
@@ -32,7 +32,7 @@ def find_by_id(cls, id: str):
 
     @classmethod
     def find_all(cls):
-        db = connect_db()
+        db = get_db()
         admins = list(db.admins.find())
         for a in admins:
             a['_id'] = str(a['_id'])
@@ -40,13 +40,13 @@ def find_all(cls):
     
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         result = db.admins.update_one({"_id": ObjectId(id)}, {"$set": data})
         return result.modified_count > 0
     
     @classmethod
     def delete(cls, id: str):
-        db = connect_db()
+        db = get_db()
         result = db.admins.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
 
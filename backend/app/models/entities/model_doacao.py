@@ -1,13 +1,26 @@
 # -*- coding: utf-8 -*-
 from pydantic import BaseModel, validator, Field, BeforeValidator, ConfigDict
-from typing import Optional, Annotated
+from typing import Optional, Annotated, ClassVar, List
 from datetime import date, datetime, time
-from app.config.database import connect_db
+from app.config.database import get_db
 from bson import ObjectId
+from app.utils.pagination import keyset_filter
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from app.services.estatisticas import estatisticas, CAMPOS_RELEVANTES
 
 # Helper para aceitar ObjectId como string
 PyObjectId = Annotated[str, BeforeValidator(str)]
 
+def limite_validade(agora: datetime = None) -> datetime:
+    """
+    A validade é gravada como meia-noite do último dia válido e vale até o fim desse
+    dia: estão vencidas as doações com validade anterior ao início de hoje.
+    """
+    agora = agora or datetime.now()
+    return datetime.combine(agora.date(), time.min)
+
+
 class Doacao(BaseModel):
     id: Optional[PyObjectId] = Field(None, alias='_id')
     doador_id: str
@@ -19,6 +32,28 @@ class Doacao(BaseModel):
     data_criacao: datetime = Field(default_factory=datetime.now)
     receptor_id: Optional[str] = None
     motorista_id: Optional[str] = None
+    data_expiracao: Optional[datetime] = None  # preenchida pela varredura de vencidas
+    data_recebimento: Optional[datetime] = None  # preenchida na conclusão da rota
+    # Catálogo canônico (services/catalogo.py), preenchidos na gravação
+    alimento_id: Optional[int] = None
+    quantidade_base: Optional[float] = None  # quantidade em unidade_base
+    unidade_base: Optional[str] = None       # 'kg', 'l', 'un' ou a unidade digitada
+    versao: int = 0  # incrementada a cada escrita (concorrência otimista)
+
+    # Índices das consultas de listagem (get_all_doacoes) e do dashboard
+    COLLECTION: ClassVar[str] = 'doacoes'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("doador_id", ASCENDING), ("status", ASCENDING)], name="doador_status"),
+        IndexModel([("receptor_id", ASCENDING), ("status", ASCENDING)], name="receptor_status"),
+        IndexModel([("motorista_id", ASCENDING)], name="motorista"),
+        IndexModel([("status", ASCENDING), ("data_criacao", DESCENDING)], name="status_data_criacao"),
+        IndexModel([("data_criacao", DESCENDING), ("_id", DESCENDING)], name="data_criacao_id"),
+        IndexModel([("status", ASCENDING), ("validade", ASCENDING)], name="status_validade"),  # varredura de vencidas
+        IndexModel([("alimento_id", ASCENDING), ("data_criacao", ASCENDING)], name="alimento_data_criacao"),
+    ]
+
+    # Status em que a doação ainda não saiu do doador e pode vencer
+    STATUS_EXPIRAVEIS: ClassVar[tuple] = ('pendente', 'aceita')
 
     # Configuração Pydantic V2
     model_config = ConfigDict(
@@ -40,43 +75,208 @@ def validar_status(cls, v):
 
     # --- DB METHODS ---
     def save(self):
-        db = connect_db()
+        db = get_db()
+        data = self.to_mongo()
+
+        if self.id:
+             data.pop('versao', None)
+             antes = db.doacoes.find_one_and_update({"_id": ObjectId(self.id)}, {"$set": data, "$inc": {"versao": 1}})
+             if antes:
+                 self.versao = antes.get('versao', 0) + 1
+                 estatisticas.registrar_mudanca('doacoes', antes, {**antes, **data})
+        else:
+             result = db.doacoes.insert_one(data)
+             self.id = str(result.inserted_id)
+             estatisticas.registrar_mudanca('doacoes', None, data)
+        return self
+
+    def to_mongo(self):
+        """Documento no formato do Mongo (sem _id nulo e com a validade em datetime)."""
         data = self.model_dump(by_alias=True, exclude_none=True)
-        
         if data.get('_id') is None: data.pop('_id', None)
 
         # Converter data para datetime para o Mongo aceitar
         if isinstance(data.get('validade'), date) and not isinstance(data.get('validade'), datetime):
              data['validade'] = datetime.combine(data['validade'], time.min)
+        return data
 
-        if self.id:
-             db.doacoes.update_one({"_id": ObjectId(self.id)}, {"$set": data})
-        else:
-             result = db.doacoes.insert_one(data)
-             self.id = str(result.inserted_id)
-        return self
+    @classmethod
+    def insert_many(cls, docs: list):
+        """
+        Insere um lote sem ordem (o servidor continua após falhas individuais).
+        Retorna ({indice_no_lote: id}, {indice_no_lote: mensagem_de_erro}).
+        """
+        db = get_db()
+        if not docs: return {}, {}
+        erros = {}
+        try:
+            db.doacoes.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            erros = {err['index']: err.get('errmsg', 'Erro ao inserir.') for err in e.details.get('writeErrors', [])}
+
+        # insert_many preenche o _id de cada documento antes de enviar
+        ids = {i: str(doc['_id']) for i, doc in enumerate(docs) if i not in erros}
+        estatisticas.registrar_insercoes('doacoes', [docs[i] for i in ids])
+        return ids, erros
+
+    @classmethod
+    def set_many(cls, atualizacoes: dict):
+        """$set de campos que não entram nas estatísticas em várias doações ({id: campos}) com um bulk_write."""
+        if not atualizacoes: return 0
+        db = get_db()
+        result = db.doacoes.bulk_write([
+            UpdateOne({"_id": ObjectId(id)}, {"$set": campos}) for id, campos in atualizacoes.items()
+        ], ordered=False)
+        return result.modified_count
+
+    @classmethod
+    def totais_por_alimento(cls, de: datetime, ate: datetime, formato_periodo: str, status: list = None):
+        """
+        Soma de quantidade_base por (alimento_id, unidade_base, período), usando o
+        índice alimento_data_criacao. `formato_periodo` é o formato do $dateToString
+        (ex.: '%G-W%V' para semanas ISO).
+        """
+        db = get_db()
+        filtro = {"alimento_id": {"$ne": None}, "data_criacao": {"$gte": de, "$lt": ate}}
+        if status:
+            filtro["status"] = {"$in": status}
+        return list(db.doacoes.aggregate([
+            {"$match": filtro},
+            {"$group": {
+                "_id": {
+                    "alimento_id": "$alimento_id",
+                    "unidade": "$unidade_base",
+                    "periodo": {"$dateToString": {"format": formato_periodo, "date": "$data_criacao"}},
+                },
+                "quantidade": {"$sum": "$quantidade_base"},
+                "doacoes": {"$sum": 1},
+            }},
+            {"$sort": {"_id.periodo": 1, "_id.alimento_id": 1}},
+        ], allowDiskUse=True))
+
+    @classmethod
+    def find_cursor(cls, query: dict, batch_size: int = 1000):
+        """Cursor em ordem de _id, para exportações (os documentos não ficam todos em memória)."""
+        db = get_db()
+        return db.doacoes.find(query, batch_size=batch_size).sort("_id", ASCENDING)
 
     @classmethod
     def find_by_id(cls, id: str):
         try: obj_id = ObjectId(id)
         except: return None
-        db = connect_db()
+        db = get_db()
         data = db.doacoes.find_one({"_id": obj_id})
         if not data: return None
         return cls(**data) 
 
     @classmethod
     def find_all(cls, query: dict = {}):
-        db = connect_db()
+        db = get_db()
         doacoes = list(db.doacoes.find(query)) 
         return [cls(**d) for d in doacoes]
+
+    @classmethod
+    def find_docs(cls, query: dict = {}, projection: dict = None):
+        """Documentos brutos (sem validação Pydantic), para as listagens."""
+        db = get_db()
+        return list(db.doacoes.find(query, projection))
+
+    @classmethod
+    def find_ids(cls, query: dict):
+        """Apenas os ids (str) das doações que atendem ao filtro."""
+        db = get_db()
+        return [str(d['_id']) for d in db.doacoes.find(query, {'_id': 1})]
+
+    @classmethod
+    def find_page(cls, query: dict, limit: int, after: tuple = None, projection: dict = None):
+        """
+        Página ordenada por (data_criacao, _id) decrescente, sem instanciar os models.
+        `after` é a tupla (data_criacao, _id) do último item da página anterior.
+        Retorna (documentos, tem_mais).
+        """
+        db = get_db()
+        if after:
+            query = {'$and': [query, keyset_filter('data_criacao', *after)]}
+        cursor = db.doacoes.find(query, projection) \
+            .sort([('data_criacao', DESCENDING), ('_id', DESCENDING)]) \
+            .limit(limit + 1)
+        docs = list(cursor)
+        return docs[:limit], len(docs) > limit
     
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
-        return db.doacoes.update_one({"_id": ObjectId(id)}, {"$set": data}).modified_count > 0
+        db = get_db()
+        data.pop('versao', None)
+        if not CAMPOS_RELEVANTES['doacoes'] & data.keys():
+            return db.doacoes.update_one({"_id": ObjectId(id)}, {"$set": data, "$inc": {"versao": 1}}).modified_count > 0
+
+        # Estado anterior lido atomicamente com a escrita, para os contadores do dashboard
+        antes = db.doacoes.find_one_and_update({"_id": ObjectId(id)}, {"$set": data, "$inc": {"versao": 1}})
+        if not antes: return False
+        estatisticas.registrar_mudanca('doacoes', antes, {**antes, **data})
+        return any(antes.get(k) != v for k, v in data.items())
+
+    @classmethod
+    def update_condicional(cls, id: str, condicao: dict, data: dict, session=None, mudancas: list = None):
+        """
+        Aplica `data` só se o documento ainda atender a `condicao` (ex.: status e
+        versão lidos antes), numa única operação atômica. Retorna o documento
+        atualizado, ou None se não existir ou se a condição não valer mais.
+        Com `mudancas`, a mudança para as estatísticas é acumulada na lista em vez
+        de aplicada (ver services/ciclo_rota.py).
+        """
+        try: obj_id = ObjectId(id)
+        except Exception: return None
+        db = get_db()
+        data = {k: v for k, v in data.items() if k not in ('_id', 'id', 'versao')}
+        antes = db.doacoes.find_one_and_update({**condicao, "_id": obj_id}, {"$set": data, "$inc": {"versao": 1}},
+                                               session=session)
+        if antes is None: return None
+        depois = {**antes, **data, "versao": antes.get("versao", 0) + 1}
+        if mudancas is not None:
+            # Dentro de transação: as estatísticas só são aplicadas após o commit
+            mudancas.append(('doacoes', antes, depois))
+        else:
+            estatisticas.registrar_mudanca('doacoes', antes, depois)
+        return depois
+
+    @classmethod
+    def expirar_vencidas(cls, agora: datetime = None):
+        """
+        Marca como 'expirada' as doações expiráveis vencidas (validade anterior a hoje,
+        ver limite_validade).
+        Um update_many por status, para os contadores do dashboard ficarem exatos.
+        Retorna {status_anterior: quantidade}.
+        """
+        db = get_db()
+        agora = agora or datetime.now()
+        por_status = {}
+        for status in cls.STATUS_EXPIRAVEIS:
+            result = db.doacoes.update_many(
+                {"status": status, "validade": {"$lt": limite_validade(agora)}},
+                {"$set": {"status": "expirada", "data_expiracao": agora}, "$inc": {"versao": 1}}
+            )
+            if result.modified_count:
+                por_status[status] = result.modified_count
+                estatisticas.registrar_contagem({
+                    f"doacoes.por_status.{status}": -result.modified_count,
+                    "doacoes.por_status.expirada": result.modified_count,
+                })
+        return por_status
+
+    @classmethod
+    def filtro_nao_expiradas(cls, agora: datetime = None):
+        """Filtro que esconde as expiradas e as vencidas que a varredura ainda não marcou."""
+        agora = agora or datetime.now()
+        return {
+            "status": {"$ne": "expirada"},
+            "$nor": [{"status": {"$in": list(cls.STATUS_EXPIRAVEIS)}, "validade": {"$lt": limite_validade(agora)}}]
+        }
 
     @classmethod
     def delete(cls, id: str):
-        db = connect_db()
-        return db.doacoes.delete_one({"_id": ObjectId(id)}).deleted_count > 0
\ No newline at end of file
+        db = get_db()
+        antes = db.doacoes.find_one_and_delete({"_id": ObjectId(id)})
+        if not antes: return False
+        estatisticas.registrar_mudanca('doacoes', antes, None)
+        return True
\ No newline at end of file
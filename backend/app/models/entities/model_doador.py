@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, List
-from app.config.database import connect_db
+from app.config.database import get_db
 import re
 from enum import Enum
 from pydantic import Field
@@ -83,7 +83,7 @@ def validar_telefones(cls, v):
         return v
 
     def save(self):
-        db = connect_db()
+        db = get_db()
         data = self.dict(by_alias=True, exclude_none=True)
         result = db.doadores.insert_one(data)
         self.id = str(result.inserted_id)
@@ -91,7 +91,7 @@ def save(self):
 
     @classmethod
     def find_by_id(cls, id: str):
-        db = connect_db()
+        db = get_db()
         data = db.doadores.find_one({"_id": ObjectId(id)})
         if data:
             return cls(**data)
@@ -99,7 +99,7 @@ def find_by_id(cls, id: str):
 
     @classmethod
     def find_all(cls):
-        db = connect_db()
+        db = get_db()
         doadores = list(db.doadores.find())
         for d in doadores:
             d['_id'] = str(d['_id'])
@@ -107,13 +107,13 @@ def find_all(cls):
     
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         result = db.doadores.update_one({"_id": ObjectId(id)}, {"$set": data})
         return result.modified_count > 0
     
     @classmethod
     def delete(cls, id: str):
-        db = connect_db()
+        db = get_db()
         result = db.doadores.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
 
@@ -1,8 +1,13 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Optional, ClassVar, List
 from datetime import datetime
-from app.config.database import connect_db
+from app.config.database import get_db
 from bson import ObjectId
+from pymongo import IndexModel, UpdateOne, ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Quantos lotes de baixa recentes ficam marcados em cada item (ver decrement_many)
+LOTES_BAIXA_MAX = 10
 
 class Estoque(BaseModel):
     id: Optional[ObjectId] = Field(None, alias='_id')
@@ -11,8 +16,20 @@ class Estoque(BaseModel):
     quantidade: float
     unidade: str 
     local: Optional[str] = None # Onde está armazenado (ex: 'geladeira 1', 'prateleira A')
+    alimento_id: Optional[int] = None  # id no catálogo canônico (services/catalogo.py)
     data_atualizacao: datetime = Field(default_factory=datetime.now)
 
+    # Um único item por (receptor, alimento, unidade); o prefixo receptor_id
+    # também atende find_by_receptor_id.
+    COLLECTION: ClassVar[str] = 'estoque'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel(
+            [("receptor_id", ASCENDING), ("alimento", ASCENDING), ("unidade", ASCENDING)],
+            unique=True, name="receptor_alimento_unidade_unico"
+        ),
+        IndexModel([("receptor_id", ASCENDING), ("alimento_id", ASCENDING)], name="receptor_alimento_id"),
+    ]
+
     class Config:
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
@@ -25,34 +42,46 @@ def quantidade_nao_negativa(cls, v):
 
     # --- Métodos do BD
 
-    def save(self):
-        db = connect_db()
+    def save(self, session=None):
+        db = get_db()
         data = self.dict(by_alias=True, exclude_none=True)
-        result = db.estoque.insert_one(data)
+        result = db.estoque.insert_one(data, session=session)
         self.id = result.inserted_id
         return self
 
     @classmethod
     def find_by_receptor_id(cls, receptor_id: str):
-        db = connect_db()
+        db = get_db()
         itens = list(db.estoque.find({"receptor_id": receptor_id}))
         return [cls(**item) for item in itens]
 
     @classmethod
-    def find_one_by_details(cls, receptor_id: str, alimento: str, unidade: str):
-        db = connect_db()
+    def find_docs_by_receptor_id(cls, receptor_id: str):
+        """Documentos brutos (sem validação Pydantic), para as listagens."""
+        db = get_db()
+        return list(db.estoque.find({"receptor_id": receptor_id}))
+
+    @classmethod
+    def find_one_by_details(cls, receptor_id: str, alimento: str, unidade: str, session=None):
+        db = get_db()
         data = db.estoque.find_one({
             "receptor_id": receptor_id,
             "alimento": alimento,
             "unidade": unidade
-        })
+        }, session=session)
         if data:
             return cls(**data)
         return None
         
+    @classmethod
+    def find_cursor(cls, query: dict, batch_size: int = 1000):
+        """Cursor em ordem de _id, para exportações (os documentos não ficam todos em memória)."""
+        db = get_db()
+        return db.estoque.find(query, batch_size=batch_size).sort("_id", ASCENDING)
+
     @classmethod
     def find_by_id(cls, id: str):
-        db = connect_db()
+        db = get_db()
         data = db.estoque.find_one({"_id": ObjectId(id)})
         if data:
             return cls(**data)
@@ -60,30 +89,100 @@ def find_by_id(cls, id: str):
 
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         # Atualiza a data quando uma alteração for feita
         data['data_atualizacao'] = datetime.now()
         result = db.estoque.update_one({"_id": ObjectId(id)}, {"$set": data})
         return result.modified_count > 0
 
     @classmethod
-    def increment_quantity(cls, id: str, quantidade: float):
-        db = connect_db()
-        result = db.estoque.update_one(
+    def increment_quantity(cls, id: str, quantidade: float, session=None):
+        """Soma `quantidade` ao saldo. Retorna o documento já atualizado (None se não existe)."""
+        db = get_db()
+        return db.estoque.find_one_and_update(
             {"_id": ObjectId(id)},
             {
                 "$inc": {"quantidade": quantidade},
                 "$set": {"data_atualizacao": datetime.now()}
-            }
+            },
+            return_document=ReturnDocument.AFTER,
+            session=session
         )
-        return result.modified_count > 0
 
     @classmethod
-    def decrement_quantity(cls, id: str, quantidade_saida: float):
-      
-        db = connect_db()
+    def upsert_quantity(cls, receptor_id: str, alimento: str, unidade: str, quantidade: float,
+                        local: str = None, alimento_id: int = None, session=None):
+        """
+        Entrada atômica no item (receptor_id, alimento, unidade): soma `quantidade`,
+        criando o item se ainda não existir, numa única escrita. O índice único
+        garante um item por chave mesmo com entregas simultâneas.
+        Retorna o documento já atualizado.
+        """
+        db = get_db()
+        update = {
+            "$inc": {"quantidade": quantidade},
+            "$set": {"data_atualizacao": datetime.now()},
+        }
+        na_criacao = {"local": local, "alimento_id": alimento_id}
+        if any(v is not None for v in na_criacao.values()):
+            update["$setOnInsert"] = {k: v for k, v in na_criacao.items() if v is not None}
+        filtro = {"receptor_id": receptor_id, "alimento": alimento, "unidade": unidade}
+        try:
+            return db.estoque.find_one_and_update(filtro, update, upsert=True,
+                                                  return_document=ReturnDocument.AFTER, session=session)
+        except DuplicateKeyError:
+            # Dois upserts simultâneos tentaram inserir: o item agora existe, basta somar
+            return db.estoque.find_one_and_update(filtro, update, return_document=ReturnDocument.AFTER,
+                                                  session=session)
+
+    @classmethod
+    def find_duplicates(cls):
+        """Grupos (receptor_id, alimento, unidade) com mais de um item: [{_id: chave, ids: [...]}]."""
+        db = get_db()
+        return list(db.estoque.aggregate([
+            {"$group": {
+                "_id": {"receptor_id": "$receptor_id", "alimento": "$alimento", "unidade": "$unidade"},
+                "ids": {"$push": "$_id"},
+                "n": {"$sum": 1},
+            }},
+            {"$match": {"n": {"$gt": 1}}},
+        ], allowDiskUse=True))
+
+    @classmethod
+    def merge_into(cls, manter, remover: list, session=None):
+        """Soma as quantidades dos itens `remover` no item `manter` e remove os primeiros."""
+        db = get_db()
+        duplicados = list(db.estoque.find({"_id": {"$in": remover}}, {"quantidade": 1, "local": 1}, session=session))
+        local = next((d["local"] for d in duplicados if d.get("local")), None)
+        update = {
+            "$inc": {"quantidade": sum(float(d.get("quantidade") or 0) for d in duplicados)},
+            "$set": {"data_atualizacao": datetime.now()},
+        }
+        db.estoque.update_one({"_id": manter}, update, session=session)
+        if local:
+            db.estoque.update_one({"_id": manter, "local": None}, {"$set": {"local": local}}, session=session)
+        db.estoque.delete_many({"_id": {"$in": [d["_id"] for d in duplicados]}}, session=session)
+
+    @classmethod
+    def set_quantity(cls, id: str, quantidade: float, session=None):
+        """Define o saldo. Retorna o documento como estava antes (None se não existe)."""
+        db = get_db()
+        return db.estoque.find_one_and_update(
+            {"_id": ObjectId(id)},
+            {"$set": {"quantidade": quantidade, "data_atualizacao": datetime.now()}},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+
+    @classmethod
+    def decrement_quantity(cls, id: str, quantidade_saida: float, session=None):
+        """
+        Baixa condicional (só se houver saldo). Retorna (documento_atualizado, None)
+        ou (None, mensagem_de_erro).
+        """
+        db = get_db()
     
-        result = db.estoque.update_one(
+        item = db.estoque.find_one_and_update(
             {
                 "_id": ObjectId(id),
                 "quantidade": {"$gte": quantidade_saida}
@@ -91,22 +190,66 @@ def decrement_quantity(cls, id: str, quantidade_saida: float):
             {
                 "$inc": {"quantidade": -quantidade_saida},
                 "$set": {"data_atualizacao": datetime.now()}
-            }
+            },
+            return_document=ReturnDocument.AFTER,
+            session=session
         )
 
-        if result.modified_count > 0:
-            return True, None 
+        if item is not None:
+            return item, None
 
-        item = db.estoque.find_one({"_id": ObjectId(id)})
+        item = db.estoque.find_one({"_id": ObjectId(id)}, session=session)
         if not item:
-            return False, "Item não encontrado."
+            return None, "Item não encontrado."
         if item['quantidade'] < quantidade_saida:
-            return False, f"Estoque insuficiente. Disponível: {item['quantidade']}."
+            return None, f"Estoque insuficiente. Disponível: {item['quantidade']}."
         
-        return False, "Não foi possível registrar a baixa no estoque."  
+        return None, "Não foi possível registrar a baixa no estoque."  
+
+    @classmethod
+    def decrement_many(cls, receptor_id: str, baixas: dict, lote: str, session=None):
+        """
+        Baixas condicionais ({item_id: quantidade}) de vários itens do receptor com um
+        único bulk_write. Cada baixa aplicada marca o item com `lote` (campo
+        lotes_baixa, com os LOTES_BAIXA_MAX mais recentes), e uma única leitura depois
+        mostra quais foram aplicadas.
+        Retorna {item_id: documento atual} dos itens do receptor encontrados.
+        """
+        db = get_db()
+        agora = datetime.now()
+        db.estoque.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(id), "receptor_id": receptor_id, "quantidade": {"$gte": quantidade}},
+                {
+                    "$inc": {"quantidade": -quantidade},
+                    "$set": {"data_atualizacao": agora},
+                    "$push": {"lotes_baixa": {"$each": [lote], "$slice": -LOTES_BAIXA_MAX}}
+                }
+            )
+            for id, quantidade in baixas.items()
+        ], ordered=False, session=session)
+
+        docs = db.estoque.find(
+            {"_id": {"$in": [ObjectId(id) for id in baixas]}, "receptor_id": receptor_id},
+            session=session
+        )
+        return {str(doc['_id']): doc for doc in docs}
+
+    @classmethod
+    def revert_decrements(cls, baixas: dict, lote: str, session=None):
+        """Desfaz as baixas do `lote` nos itens informados ({item_id: quantidade})."""
+        db = get_db()
+        agora = datetime.now()
+        db.estoque.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(id), "lotes_baixa": lote},
+                {"$inc": {"quantidade": quantidade}, "$set": {"data_atualizacao": agora}, "$pull": {"lotes_baixa": lote}}
+            )
+            for id, quantidade in baixas.items()
+        ], ordered=False, session=session)
 
     @classmethod
-    def delete(cls, id: str):
-        db = connect_db()
-        result = db.estoque.delete_one({"_id": ObjectId(id)})
+    def delete(cls, id: str, session=None):
+        db = get_db()
+        result = db.estoque.delete_one({"_id": ObjectId(id)}, session=session)
         return result.deleted_count > 0
\ No newline at end of file
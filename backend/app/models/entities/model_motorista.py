@@ -1,7 +1,7 @@
 # models/model_motorista.py
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional
-from app.config.database import connect_db
+from app.config.database import get_db
 from bson import ObjectId
 import re
 
@@ -34,7 +34,7 @@ def validar_telefone(cls, v):
     
     # --- Métodos do BD
     def save(self):
-        db = connect_db()
+        db = get_db()
         data = self.dict(by_alias=True, exclude_none=True)
         result = db.motoristas.insert_one(data)
         self.id = result.inserted_id
@@ -42,13 +42,13 @@ def save(self):
 
     @classmethod
     def find_all(cls):
-        db = connect_db()
+        db = get_db()
         motoristas = list(db.motoristas.find())
         return [cls(**m) for m in motoristas]
 
     @classmethod
     def find_by_id(cls, id: str):
-        db = connect_db()
+        db = get_db()
         data = db.motoristas.find_one({"_id": ObjectId(id)})
         if data:
             return cls(**data)
@@ -56,12 +56,12 @@ def find_by_id(cls, id: str):
 
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         result = db.motoristas.update_one({"_id": ObjectId(id)}, {"$set": data})
         return result.modified_count > 0
 
     @classmethod
     def delete(cls, id: str):
-        db = connect_db()
+        db = get_db()
         result = db.motoristas.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
\ No newline at end of file
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Livro de movimentações do estoque (somente inserção).
+
+Cada mudança de quantidade de um item de estoque gera um movimento com o delta
+(positivo ou negativo), o saldo resultante e a origem (doação/rota ou usuário).
+O saldo atual continua materializado no próprio documento de 'estoque', e cada
+movimento também soma no resumo diário (ResumoDiarioEstoque) do item, de onde
+saem os relatórios de consumo sem varrer o livro.
+"""
+from pydantic import BaseModel, Field, BeforeValidator, ConfigDict
+from typing import Optional, Annotated, ClassVar, List
+from datetime import datetime
+from enum import Enum
+from collections import defaultdict
+from app.config.database import get_db
+from bson import ObjectId
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.utils.pagination import keyset_filter
+
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+
+class TipoMovimentoEnum(str, Enum):
+    ENTRADA = "entrada"
+    SAIDA = "saida"
+    AJUSTE = "ajuste"
+
+
+def dia_de(data: datetime) -> datetime:
+    return data.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class MovimentoEstoque(BaseModel):
+    id: Optional[PyObjectId] = Field(None, alias='_id')
+    item_id: str
+    receptor_id: str
+    alimento: str
+    unidade: str
+    alimento_id: Optional[int] = None
+    tipo: TipoMovimentoEnum
+    quantidade: float  # delta aplicado ao saldo (negativo nas saídas)
+    saldo: float       # saldo do item depois do movimento
+    doacao_id: Optional[str] = None
+    rota_id: Optional[str] = None
+    usuario_id: Optional[str] = None
+    data: datetime = Field(default_factory=datetime.now)
+
+    COLLECTION: ClassVar[str] = 'movimentos_estoque'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("receptor_id", ASCENDING), ("data", DESCENDING)], name="receptor_data"),
+        IndexModel([("receptor_id", ASCENDING), ("alimento", ASCENDING), ("data", DESCENDING)],
+                   name="receptor_alimento_data"),
+        IndexModel([("item_id", ASCENDING), ("data", DESCENDING)], name="item_data"),
+        IndexModel([("data", ASCENDING)], name="data"),  # exportação por período
+    ]
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+        use_enum_values=True
+    )
+
+    # --- Métodos do BD
+
+    @classmethod
+    def gravar_lote(cls, movimentos: list, session=None):
+        """
+        Grava os movimentos com um único insert_many e soma cada um no resumo
+        diário do item (uma escrita por item/dia). `movimentos` são dicts com os
+        campos do model; os inseridos recebem o '_id'. Sem transação, se algo
+        falhar os movimentos inseridos são apagados: o livro nunca fica com
+        movimento fora do resumo, e quem chama só precisa desfazer o saldo.
+        """
+        if not movimentos:
+            return []
+        docs = [cls(**m).model_dump(by_alias=True, exclude_none=True) for m in movimentos]
+        colecao = get_db()[cls.COLLECTION]
+        try:
+            colecao.insert_many(docs, ordered=True, session=session)
+            ResumoDiarioEstoque.acumular(docs, session=session)
+        except Exception:
+            if session is None:
+                # insert_many já preencheu o '_id' de todos; os não inseridos só não casam
+                colecao.delete_many({"_id": {"$in": [d["_id"] for d in docs if "_id" in d]}})
+            raise
+        return docs
+
+    @classmethod
+    def reassign_item(cls, de: list, para: str, session=None):
+        """Aponta os movimentos dos itens `de` para o item `para` (itens mesclados)."""
+        get_db()[cls.COLLECTION].update_many({"item_id": {"$in": de}}, {"$set": {"item_id": para}}, session=session)
+
+    @classmethod
+    def find_page(cls, query: dict, limit: int, after: tuple = None):
+        """Página ordenada por (data, _id) decrescente. Retorna (documentos, tem_mais)."""
+        if after:
+            query = {'$and': [query, keyset_filter('data', *after)]}
+        cursor = get_db()[cls.COLLECTION].find(query) \
+            .sort([('data', DESCENDING), ('_id', DESCENDING)]) \
+            .limit(limit + 1)
+        docs = list(cursor)
+        return docs[:limit], len(docs) > limit
+
+    @classmethod
+    def find_cursor(cls, query: dict, batch_size: int = 1000):
+        """Cursor em ordem de _id, para exportações."""
+        return get_db()[cls.COLLECTION].find(query, batch_size=batch_size).sort("_id", ASCENDING)
+
+
+class ResumoDiarioEstoque:
+    """
+    Totais por (receptor, alimento, unidade, dia): entradas, saídas (positivas),
+    ajustes (com sinal) e número de movimentos. Um ano de um item são no máximo
+    366 documentos.
+    """
+    COLLECTION: ClassVar[str] = 'estoque_resumo_diario'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("receptor_id", ASCENDING), ("alimento", ASCENDING), ("unidade", ASCENDING), ("dia", ASCENDING)],
+                   unique=True, name="receptor_alimento_unidade_dia_unico"),
+        IndexModel([("receptor_id", ASCENDING), ("dia", ASCENDING)], name="receptor_dia"),
+    ]
+
+    CAMPO_POR_TIPO: ClassVar[dict] = {
+        TipoMovimentoEnum.ENTRADA.value: "entradas",
+        TipoMovimentoEnum.SAIDA.value: "saidas",
+        TipoMovimentoEnum.AJUSTE.value: "ajustes",
+    }
+
+    @classmethod
+    def acumular(cls, movimentos: list, session=None):
+        totais = defaultdict(lambda: defaultdict(float))
+        alimento_ids = {}
+        for m in movimentos:
+            chave = (m["receptor_id"], m["alimento"], m["unidade"], dia_de(m["data"]))
+            if m.get("alimento_id") is not None:
+                alimento_ids[chave] = m["alimento_id"]
+            campo = cls.CAMPO_POR_TIPO[m["tipo"]]
+            # Saídas somam como valor positivo; ajustes mantêm o sinal
+            totais[chave][campo] += -m["quantidade"] if campo == "saidas" else m["quantidade"]
+            totais[chave]["movimentos"] += 1
+
+        operacoes = []
+        for chave, valores in totais.items():
+            receptor_id, alimento, unidade, dia = chave
+            update = {"$inc": dict(valores)}
+            if chave in alimento_ids:
+                update["$setOnInsert"] = {"alimento_id": alimento_ids[chave]}
+            operacoes.append(({"receptor_id": receptor_id, "alimento": alimento, "unidade": unidade, "dia": dia}, update))
+        colecao = get_db()[cls.COLLECTION]
+        if len(operacoes) == 1:
+            # Caso comum (um movimento): evita o custo do bulk_write
+            try:
+                colecao.update_one(*operacoes[0], upsert=True, session=session)
+            except DuplicateKeyError:
+                # Primeiro movimento do dia em duas requisições: o resumo agora existe, basta somar
+                colecao.update_one(*operacoes[0], upsert=True, session=session)
+            return
+        bulk = [UpdateOne(filtro, update, upsert=True) for filtro, update in operacoes]
+        try:
+            colecao.bulk_write(bulk, ordered=False, session=session)
+        except BulkWriteError as e:
+            # Idem no lote: repete só as operações que perderam a inserção (as demais já valeram)
+            erros = e.details.get("writeErrors", [])
+            if not erros or any(erro.get("code") != 11000 for erro in erros):
+                raise
+            colecao.bulk_write([bulk[erro["index"]] for erro in erros], ordered=False, session=session)
+
+    @classmethod
+    def find_periodo(cls, receptor_id: str, de: datetime, alimento: str = None):
+        """Resumos do receptor a partir do dia de `de` (inclusive), em ordem de dia."""
+        query = {"receptor_id": receptor_id, "dia": {"$gte": dia_de(de)}}
+        if alimento:
+            query["alimento"] = alimento
+        return list(get_db()[cls.COLLECTION].find(query, {"_id": 0}).sort("dia", ASCENDING))
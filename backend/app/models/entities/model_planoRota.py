@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from pydantic import BaseModel, Field, BeforeValidator, ConfigDict
+from typing import Optional, Annotated, ClassVar, List
+from datetime import datetime
+from app.config.database import get_db
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from app.models.entities.model_usuarioUnificado import Endereco
+from app.models.entities.model_rota import StatusRotaEnum
+
+STATUS_ATIVOS = [StatusRotaEnum.PENDENTE.value, StatusRotaEnum.EM_ANDAMENTO.value]
+
+# Helper para Pydantic V2 aceitar ObjectId
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+class ParadaRota(BaseModel):
+    ordem: int
+    tipo: str  # 'coleta' (no doador) ou 'entrega' (no receptor)
+    doacao_id: str
+    endereco: Endereco
+    distancia_km: float  # desde a parada anterior
+
+class PlanoRota(BaseModel):
+    """Rota com várias paradas de coleta/entrega para um único motorista."""
+    id: Optional[PyObjectId] = Field(None, alias='_id')
+    motorista_id: Optional[str] = None
+    status: StatusRotaEnum = StatusRotaEnum.PENDENTE
+    doacao_ids: List[str]
+    paradas: List[ParadaRota]
+
+    distancia_total_km: float
+    distancia_base_km: float  # soma das viagens individuais coleta -> entrega
+    duracao_estimada_min: float
+
+    data_criacao: datetime = Field(default_factory=datetime.now)
+
+    COLLECTION: ClassVar[str] = 'planos_rota'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("motorista_id", ASCENDING), ("status", ASCENDING)], name="motorista_status"),
+        IndexModel([("doacao_ids", ASCENDING)], name="doacoes"),
+        IndexModel([("data_criacao", DESCENDING)], name="data_criacao"),
+    ]
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+        use_enum_values=True
+    )
+
+    # --- Métodos do BD ---
+
+    def save(self):
+        db = get_db()
+        data = self.model_dump(by_alias=True, exclude_none=True)
+        if data.get('_id') is None:
+            data.pop('_id', None)
+
+        if self.id:
+            db.planos_rota.update_one({"_id": ObjectId(self.id)}, {"$set": data})
+        else:
+            result = db.planos_rota.insert_one(data)
+            self.id = str(result.inserted_id)
+        return self
+
+    @classmethod
+    def find_by_id(cls, id: str):
+        try: obj_id = ObjectId(id)
+        except: return None
+        db = get_db()
+        data = db.planos_rota.find_one({"_id": obj_id})
+        if data: return cls(**data)
+        return None
+
+    @classmethod
+    def find_all(cls, query: dict = {}):
+        db = get_db()
+        planos = db.planos_rota.find(query).sort("data_criacao", DESCENDING)
+        return [cls(**p) for p in planos]
+
+    @classmethod
+    def find_docs(cls, query: dict = {}):
+        """Documentos brutos (sem validação Pydantic), para as listagens."""
+        db = get_db()
+        return list(db.planos_rota.find(query).sort("data_criacao", DESCENDING))
+
+    @classmethod
+    def find_ativos_por_doacao(cls, doacao_ids: list):
+        """{doacao_id: plano} dos planos pendentes ou em andamento que contêm as doações."""
+        ids = set(doacao_ids)
+        db = get_db()
+        planos = db.planos_rota.find({"doacao_ids": {"$in": list(ids)}, "status": {"$in": STATUS_ATIVOS}},
+                                     {"doacao_ids": 1, "status": 1})
+        return {d: plano for plano in planos for d in plano["doacao_ids"] if d in ids}
+
+    @classmethod
+    def cancelar_pendentes(cls, ids: list):
+        """Cancela os planos ainda pendentes (os em andamento não mudam). Retorna quantos mudaram."""
+        db = get_db()
+        result = db.planos_rota.update_many(
+            {"_id": {"$in": [ObjectId(i) for i in ids]}, "status": StatusRotaEnum.PENDENTE.value},
+            {"$set": {"status": StatusRotaEnum.CANCELADA.value}})
+        return result.modified_count
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, List
-from app.config.database import connect_db
+from app.config.database import get_db
 import re
 from pydantic import Field
 from bson import ObjectId
@@ -74,7 +74,7 @@ def validar_beneficiarios(cls, v):
         return v
 
     def save(self):
-        db = connect_db()
+        db = get_db()
         data = self.dict(by_alias=True, exclude_none=True)
         result = db.receptores.insert_one(data)
         self.id = str(result.inserted_id)
@@ -82,13 +82,13 @@ def save(self):
     
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         result = db.receptores.update_one({"_id": ObjectId(id)}, {"$set": data})
         return result.modified_count > 0
 
     @classmethod
     def find_by_id(cls, id: str):
-        db = connect_db()
+        db = get_db()
         data = db.receptores.find_one({"_id": ObjectId(id)})
         if data:
             return cls(**data)
@@ -96,7 +96,7 @@ def find_by_id(cls, id: str):
 
     @classmethod
     def find_all(cls):
-        db = connect_db()
+        db = get_db()
         receptores = list(db.receptores.find())
         for r in receptores:
             r['_id'] = str(r['_id'])
@@ -104,13 +104,13 @@ def find_all(cls):
     
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         result = db.receptores.update_one({"_id": ObjectId(id)}, {"$set": data})
         return result.modified_count > 0
     
     @classmethod
     def delete(cls, id: str):
-        db = connect_db()
+        db = get_db()
         result = db.receptores.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
 
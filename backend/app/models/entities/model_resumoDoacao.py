@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Resumos (rollups) das doações entregues, por doador e por receptor.
+
+Cada doação recebida soma nos baldes de dia, semana ISO e mês da entrega, tanto
+do doador quanto do receptor (seis documentos, um bulk_write). Cada balde guarda:
+
+    doacoes      número de doações entregues
+    quantidade   {unidade: total} na unidade base do catálogo (kg, l, un...)
+    kg           peso aproximado (services/catalogo.py, kg_equivalente)
+    receptores   ids distintos dos receptores (nos baldes do doador)
+    doadores     ids distintos dos doadores (nos baldes do receptor)
+
+Os relatórios leem só os baldes: vários anos de um doador por mês são algumas
+dezenas de documentos. `reconstruir` refaz tudo a partir das doações.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import ClassVar, List
+from pymongo import IndexModel, UpdateOne, ASCENDING
+from pymongo.errors import BulkWriteError
+from app.config.database import get_db
+from app.services.catalogo import catalogo
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+
+# Entidade do balde -> (campo com o id dela na doação, campo da contraparte, lista de distintos)
+ENTIDADES = {
+    'doador': ('doador_id', 'receptor_id', 'receptores'),
+    'receptor': ('receptor_id', 'doador_id', 'doadores'),
+}
+
+STATUS_ENTREGUES = ('recebida', 'concluida')
+
+
+def inicio_periodo(data: datetime, granularidade: str) -> datetime:
+    """Início do dia, da semana ISO (segunda-feira) ou do mês de `data`."""
+    dia = data.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def rotulo_periodo(inicio: datetime, granularidade: str) -> str:
+    """'2026-10-18', '2026-W42' ou '2026-10'."""
+    if granularidade == 'semana':
+        ano, semana, _ = inicio.isocalendar()
+        return f"{ano}-W{semana:02d}"
+    if granularidade == 'mes':
+        return inicio.strftime('%Y-%m')
+    return inicio.strftime('%Y-%m-%d')
+
+
+def _chave_unidade(unidade) -> str:
+    # A unidade vira nome de campo: sem '.' nem '$' no início
+    return str(unidade or 'un').replace('.', '_').lstrip('$') or 'un'
+
+
+class ResumoDoacoes:
+    COLLECTION: ClassVar[str] = 'doacoes_resumo'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("entidade", ASCENDING), ("entidade_id", ASCENDING), ("granularidade", ASCENDING),
+                    ("inicio", ASCENDING)], unique=True, name="entidade_granularidade_inicio_unico"),
+    ]
+
+    @classmethod
+    def acumular(cls, entregas: list, session=None):
+        """
+        Soma as doações nos baldes. `entregas` é uma lista de (doacao, data_da_entrega);
+        as doações do mesmo balde viram um único $inc.
+        """
+        incrementos = defaultdict(lambda: defaultdict(int))
+        parceiros = defaultdict(set)
+        for doacao, data in entregas:
+            alimento_id, quantidade, unidade = catalogo.base_da_doacao(doacao)
+            kg = catalogo.kg_equivalente(alimento_id, quantidade, unidade)
+
+            for entidade, (campo_id, campo_parceiro, _) in ENTIDADES.items():
+                entidade_id = doacao.get(campo_id)
+                if not entidade_id:
+                    continue
+                for granularidade in GRANULARIDADES:
+                    chave = (entidade, entidade_id, granularidade, inicio_periodo(data, granularidade))
+                    inc = incrementos[chave]
+                    inc["doacoes"] += 1
+                    inc[f"quantidade.{_chave_unidade(unidade)}"] += quantidade
+                    if kg is not None:
+                        inc["kg"] += kg
+                    if doacao.get(campo_parceiro):
+                        parceiros[chave].add(doacao[campo_parceiro])
+
+        operacoes = []
+        for chave, inc in incrementos.items():
+            entidade, entidade_id, granularidade, inicio = chave
+            update = {
+                "$inc": dict(inc),
+                "$set": {"atualizado_em": datetime.now()},
+                "$setOnInsert": {"periodo": rotulo_periodo(inicio, granularidade)},
+            }
+            if parceiros[chave]:
+                update["$addToSet"] = {ENTIDADES[entidade][2]: {"$each": sorted(parceiros[chave])}}
+            filtro = {"entidade": entidade, "entidade_id": entidade_id, "granularidade": granularidade, "inicio": inicio}
+            operacoes.append(UpdateOne(filtro, update, upsert=True))
+        if not operacoes:
+            return 0
+        colecao = get_db()[cls.COLLECTION]
+        try:
+            colecao.bulk_write(operacoes, ordered=False, session=session)
+        except BulkWriteError as e:
+            # Conclusões simultâneas tentaram criar o mesmo balde: ele agora existe, basta
+            # repetir as operações que perderam a inserção (as demais já foram aplicadas)
+            erros = e.details.get("writeErrors", [])
+            if not erros or any(erro.get("code") != 11000 for erro in erros):
+                raise
+            colecao.bulk_write([operacoes[erro["index"]] for erro in erros], ordered=False, session=session)
+        return len(operacoes)
+
+    @classmethod
+    def registrar_entrega(cls, doacao: dict):
+        """
+        Soma uma doação recém-entregue (chamado depois do commit da conclusão da rota).
+        Nunca propaga erro: a entrega já foi gravada e `reconstruir` corrige os baldes.
+        """
+        try:
+            cls.acumular([(doacao, doacao.get('data_recebimento') or datetime.now())])
+        except Exception as e:
+            print(f"⚠️  Falha ao atualizar os resumos de doações ({doacao.get('_id')}): {e}")
+
+    @classmethod
+    def find_periodos(cls, entidade: str, entidade_id: str, granularidade: str, de: datetime, ate: datetime):
+        """Baldes da entidade cujo início está em [início do período de `de`, `ate`), em ordem."""
+        return list(get_db()[cls.COLLECTION].find({
+            "entidade": entidade,
+            "entidade_id": entidade_id,
+            "granularidade": granularidade,
+            "inicio": {"$gte": inicio_periodo(de, granularidade), "$lt": ate},
+        }, {"_id": 0}).sort("inicio", ASCENDING))
+
+    @classmethod
+    def reconstruir(cls, lote: int = 1000):
+        """
+        Apaga e refaz todos os baldes a partir das doações entregues. A data da
+        entrega é data_recebimento; nas doações antigas, a conclusão da rota (ou,
+        sem rota, a data de criação). Entregas concluídas durante a reconstrução
+        podem ficar de fora: rode com o sistema parado ou repita em seguida.
+        Retorna {"doacoes": n, "baldes": n}.
+        """
+        db = get_db()
+        conclusoes = {r["doacao_id"]: r["data_conclusao"] for r in db.rotas.find(
+            {"status": "concluida", "data_conclusao": {"$ne": None}}, {"doacao_id": 1, "data_conclusao": 1})}
+
+        db[cls.COLLECTION].delete_many({})
+        total, entregas = 0, []
+        projecao = {"doador_id": 1, "receptor_id": 1, "alimento": 1, "quantidade": 1, "unidade": 1, "alimento_id": 1,
+                    "quantidade_base": 1, "unidade_base": 1, "data_recebimento": 1, "data_criacao": 1}
+        for doacao in db.doacoes.find({"status": {"$in": list(STATUS_ENTREGUES)}}, projecao, batch_size=lote):
+            data = doacao.get("data_recebimento") or conclusoes.get(str(doacao["_id"])) or doacao.get("data_criacao")
+            entregas.append((doacao, data))
+            if len(entregas) >= lote:
+                cls.acumular(entregas)
+                total += len(entregas)
+                entregas = []
+        if entregas:
+            cls.acumular(entregas)
+            total += len(entregas)
+        return {"doacoes": total, "baldes": db[cls.COLLECTION].count_documents({})}
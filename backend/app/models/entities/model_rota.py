@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from pydantic import BaseModel, Field, BeforeValidator, ConfigDict
-from typing import Optional, Annotated
+from typing import Optional, Annotated, ClassVar, List
 from datetime import datetime
 from enum import Enum
-from app.config.database import connect_db
+from app.config.database import get_db
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING
 from app.models.entities.model_usuarioUnificado import Endereco
+from app.services.estatisticas import estatisticas, CAMPOS_RELEVANTES
 
 # Helper para Pydantic V2 aceitar ObjectId
 PyObjectId = Annotated[str, BeforeValidator(str)]
@@ -32,10 +34,23 @@ class Rota(BaseModel):
     duracao_texto: str
     resumo_rota: str
     google_maps_link: str
+    distancia_km: Optional[float] = None
+    duracao_min: Optional[float] = None
+    provedor: Optional[str] = None  # 'google', 'local' ou None (simulado)
 
     # Datas
     data_criacao: datetime = Field(default_factory=datetime.now)
     data_conclusao: Optional[datetime] = None
+    versao: int = 0  # incrementada a cada escrita (concorrência otimista)
+
+    COLLECTION: ClassVar[str] = 'rotas'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        # Uma rota por doação: workers e pré-cálculo simultâneos não gravam duas
+        IndexModel([("doacao_id", ASCENDING)], unique=True, name="doacao_unico"),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("motorista_id", ASCENDING)], name="motorista"),
+        IndexModel([("data_criacao", ASCENDING)], name="data_criacao"),  # exportação por período
+    ]
 
     # Configuração Pydantic V2
     model_config = ConfigDict(
@@ -48,7 +63,7 @@ class Rota(BaseModel):
     # --- Métodos do BD ---
 
     def save(self):
-        db = connect_db()
+        db = get_db()
         # mode='json' ajuda a converter sub-modelos (Endereço) corretamente
         data = self.model_dump(by_alias=True, exclude_none=True)
         
@@ -56,49 +71,104 @@ def save(self):
             data.pop('_id', None)
         
         if self.id:
-            db.rotas.update_one({"_id": ObjectId(self.id)}, {"$set": data})
+            data.pop('versao', None)
+            antes = db.rotas.find_one_and_update({"_id": ObjectId(self.id)}, {"$set": data, "$inc": {"versao": 1}})
+            if antes:
+                self.versao = antes.get('versao', 0) + 1
+                estatisticas.registrar_mudanca('rotas', antes, {**antes, **data})
         else:
             result = db.rotas.insert_one(data)
             self.id = str(result.inserted_id)
+            estatisticas.registrar_mudanca('rotas', None, data)
         return self
 
+    @classmethod
+    def find_cursor(cls, query: dict, batch_size: int = 1000):
+        """Cursor em ordem de _id, para exportações (os documentos não ficam todos em memória)."""
+        db = get_db()
+        return db.rotas.find(query, batch_size=batch_size).sort("_id", ASCENDING)
+
     @classmethod
     def find_by_id(cls, id: str):
         try: obj_id = ObjectId(id)
         except: return None
-        db = connect_db()
+        db = get_db()
         data = db.rotas.find_one({"_id": obj_id})
         if data: return cls(**data)
         return None
 
     @classmethod
     def find_by_doacao_id(cls, doacao_id: str):
-        db = connect_db()
+        db = get_db()
         data = db.rotas.find_one({"doacao_id": doacao_id})
         if data: return cls(**data)
         return None
 
+    @classmethod
+    def doacao_ids_com_rota(cls, doacao_ids: list):
+        """Subconjunto de doacao_ids que já possuem rota salva."""
+        db = get_db()
+        return set(db.rotas.distinct("doacao_id", {"doacao_id": {"$in": doacao_ids}}))
+
     @classmethod
     def find_all(cls, query: dict = {}):
-        db = connect_db()
+        db = get_db()
         rotas = list(db.rotas.find(query))
         return [cls(**r) for r in rotas]
 
+    @classmethod
+    def find_docs(cls, query: dict = {}):
+        """Documentos brutos (sem validação Pydantic), para as listagens."""
+        db = get_db()
+        return list(db.rotas.find(query))
+
     @classmethod
     def update(cls, id: str, data: dict):
-        db = connect_db()
+        db = get_db()
         
         # Limpeza de campos protegidos
-        for f in ['_id', 'id', 'doacao_id']:
+        for f in ['_id', 'id', 'doacao_id', 'versao']:
             data.pop(f, None)
         
         if data.get("status") == StatusRotaEnum.CONCLUIDA.value:
             data['data_conclusao'] = datetime.now()
 
-        result = db.rotas.update_one({"_id": ObjectId(id)}, {"$set": data})
-        return result.modified_count > 0
+        if not CAMPOS_RELEVANTES['rotas'] & data.keys():
+            result = db.rotas.update_one({"_id": ObjectId(id)}, {"$set": data, "$inc": {"versao": 1}})
+            return result.modified_count > 0
+
+        antes = db.rotas.find_one_and_update({"_id": ObjectId(id)}, {"$set": data, "$inc": {"versao": 1}})
+        if not antes: return False
+        estatisticas.registrar_mudanca('rotas', antes, {**antes, **data})
+        return any(antes.get(k) != v for k, v in data.items())
+
+    @classmethod
+    def update_condicional(cls, id: str, condicao: dict, data: dict, session=None, mudancas: list = None):
+        """
+        Aplica `data` só se a rota ainda atender a `condicao`, numa única operação
+        atômica. Retorna o documento atualizado, ou None se a condição não valer mais.
+        """
+        try: obj_id = ObjectId(id)
+        except Exception: return None
+        db = get_db()
+        data = {k: v for k, v in data.items() if k not in ('_id', 'id', 'doacao_id', 'versao')}
+        if data.get("status") == StatusRotaEnum.CONCLUIDA.value:
+            data['data_conclusao'] = datetime.now()
+        antes = db.rotas.find_one_and_update({**condicao, "_id": obj_id}, {"$set": data, "$inc": {"versao": 1}},
+                                               session=session)
+        if antes is None: return None
+        depois = {**antes, **data, "versao": antes.get("versao", 0) + 1}
+        if mudancas is not None:
+            # Dentro de transação: as estatísticas só são aplicadas após o commit
+            mudancas.append(('rotas', antes, depois))
+        else:
+            estatisticas.registrar_mudanca('rotas', antes, depois)
+        return depois
 
     @classmethod
     def delete(cls, id: str):
-        db = connect_db()
-        return db.rotas.delete_one({"_id": ObjectId(id)}).deleted_count > 0
\ No newline at end of file
+        db = get_db()
+        antes = db.rotas.find_one_and_delete({"_id": ObjectId(id)})
+        if not antes: return False
+        estatisticas.registrar_mudanca('rotas', antes, None)
+        return True
\ No newline at end of file
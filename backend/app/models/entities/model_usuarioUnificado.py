@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 
 from pydantic import BaseModel, EmailStr, Field, validator, BeforeValidator
-from typing import Optional, List, Union, Literal, Annotated, Any
+from typing import Optional, List, Union, Literal, Annotated, Any, ClassVar
 from enum import Enum
-from app.config.database import connect_db
+from app.config.database import get_db
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, GEOSPHERE, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.services.estatisticas import estatisticas
+from app.services.cache_usuarios import cache_usuarios, CAMPOS_LOGIN
+from app.services.senhas import gerar_hash
+from app.services.geo import ponto_geojson
 import re
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 
 # --- TIPO CUSTOMIZADO PARA O ID (PYDANTIC V2) ---
 PyObjectId = Annotated[str, BeforeValidator(str)]
@@ -58,6 +64,15 @@ class Usuario(BaseModel):
     role: RoleEnum
     ativo: bool = True
 
+    # Login/registro buscam por email; listagens e o dashboard filtram por role
+    COLLECTION: ClassVar[str] = 'usuarios'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unico"),
+        IndexModel([("role", ASCENDING)], name="role"),
+        # Consultas de proximidade (find_near); só doadores/receptores têm o campo
+        IndexModel([("localizacao", GEOSPHERE), ("role", ASCENDING)], name="localizacao_role"),
+    ]
+
     class Config:
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
@@ -66,34 +81,51 @@ class Config:
 
     # --- SEGURANÇA ---
     def set_password(self, plain_password):
-        self.senha = generate_password_hash(plain_password)
+        self.senha = gerar_hash(plain_password)
 
     def check_password(self, plain_password):
         return check_password_hash(self.senha, plain_password)
 
     # --- DB ---
     def save(self):
-        db = connect_db()
+        db = get_db()
         if ':' not in self.senha:
             self.set_password(self.senha)
 
         data = self.dict(by_alias=True, exclude_none=True)
         if data.get('_id') is None: data.pop('_id', None)
 
+        # Geocodificação: ponto GeoJSON a partir do CEP (tabela local, sem rede)
+        remover = {}
+        if 'endereco' in data:
+            self.localizacao = ponto_geojson(data['endereco'].get('cep'))
+            if self.localizacao: data['localizacao'] = self.localizacao
+            else:
+                data.pop('localizacao', None)
+                remover = {"localizacao": ""}
+
         existing = db.usuarios.find_one({"email": self.email})
         if existing and (self.id is None or str(existing['_id']) != str(self.id)):
             raise ValueError(f"Usuário com email {self.email} já existe.")
 
-        if self.id: 
-            db.usuarios.update_one({"_id": ObjectId(self.id)}, {"$set": data})
-        else: 
-            result = db.usuarios.insert_one(data)
-            self.id = str(result.inserted_id)
+        try:
+            if self.id: 
+                atualizacao = {"$set": data}
+                if remover: atualizacao["$unset"] = remover
+                db.usuarios.update_one({"_id": ObjectId(self.id)}, atualizacao)
+                cache_usuarios.invalidar(id=self.id, email=self.email)
+            else: 
+                result = db.usuarios.insert_one(data)
+                self.id = str(result.inserted_id)
+                estatisticas.registrar_mudanca('usuarios', None, data)
+        except DuplicateKeyError:
+            # Corrida entre dois registros simultâneos: o índice único decide
+            raise ValueError(f"Usuário com email {self.email} já existe.")
         return self
 
     @classmethod
     def connect_db(cls):
-        return connect_db()
+        return get_db()
 
     @classmethod
     def _get_model_by_role(cls, role: str):
@@ -107,45 +139,159 @@ def _get_model_by_role(cls, role: str):
 
     @classmethod
     def find_by_email(cls, email: str):
-        db = connect_db()
+        db = get_db()
         data = db.usuarios.find_one({"email": email})
         if not data: return None
         return cls._get_model_by_role(data.get("role"))(**data)
 
+    @classmethod
+    def find_login_by_email(cls, email: str):
+        """Projeção mínima usada no login ({_id, role, nome, senha, ativo}), com cache."""
+        projecao = cache_usuarios.get(email)
+        if projecao is not None:
+            return projecao
+        db = get_db()
+        projecao = db.usuarios.find_one({"email": email}, {campo: 1 for campo in CAMPOS_LOGIN})
+        if projecao:
+            cache_usuarios.set(email, projecao)
+        return projecao
+
+    @classmethod
+    def atualizar_hash_senha(cls, id: str, hash_antigo: str, hash_novo: str):
+        """Troca o hash só se a senha não mudou desde a leitura (usado no rehash do login)."""
+        db = get_db()
+        result = db.usuarios.update_one({"_id": ObjectId(id), "senha": hash_antigo}, {"$set": {"senha": hash_novo}})
+        cache_usuarios.invalidar(id=id)
+        return result.modified_count > 0
+
     @classmethod
     def find_by_id(cls, id: str):
         try: obj_id = ObjectId(id)
         except: return None
-        db = connect_db()
+        db = get_db()
         data = db.usuarios.find_one({"_id": obj_id})
         if not data: return None
         return cls._get_model_by_role(data.get("role"))(**data)
             
+    @classmethod
+    def find_by_ids(cls, ids: list):
+        """Busca vários usuários numa única consulta. Retorna dict {id: usuario}."""
+        obj_ids = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+        db = get_db()
+        return {
+            str(data["_id"]): cls._get_model_by_role(data.get("role"))(**data)
+            for data in db.usuarios.find({"_id": {"$in": obj_ids}})
+        }
+
+    @classmethod
+    def find_docs_by_ids(cls, ids: list, projection: dict = None):
+        """Documentos brutos de vários usuários (por padrão sem o hash da senha)."""
+        obj_ids = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+        db = get_db()
+        return list(db.usuarios.find({"_id": {"$in": obj_ids}}, projection or {"senha": 0}))
+
     @classmethod
     def find_all_by_role(cls, role: RoleEnum):
-        db = connect_db()
+        db = get_db()
         users_data = list(db.usuarios.find({"role": role.value}))
         model = cls._get_model_by_role(role.value)
         return [model(**data) for data in users_data]
 
+    @classmethod
+    def find_docs_by_role(cls, role: RoleEnum, projection: dict = None):
+        """Documentos brutos (sem o hash da senha e sem validação Pydantic)."""
+        db = get_db()
+        return list(db.usuarios.find({"role": role.value}, projection or {"senha": 0}))
+
+    @classmethod
+    def find_near(cls, ponto, raio_km: float, limite: int = 50, query: dict = None, projection: dict = None):
+        """
+        Usuários da role da classe (ex.: Receptor.find_near) a até `raio_km` do ponto,
+        do mais próximo para o mais distante, via $geoNear no servidor.
+        `ponto`: (latitude, longitude) ou GeoJSON. Retorna documentos brutos (por
+        padrão sem a senha) com o campo 'distancia_km'.
+        """
+        if not isinstance(ponto, dict):
+            lat, lon = ponto
+            ponto = {"type": "Point", "coordinates": [lon, lat]}
+        filtro = dict(query or {})
+        if getattr(cls, 'ROLE', None): filtro["role"] = cls.ROLE.value
+
+        db = get_db()
+        pipeline = [
+            {"$geoNear": {
+                "near": ponto,
+                "key": "localizacao",
+                "distanceField": "distancia_km",
+                "distanceMultiplier": 0.001,   # metros -> km
+                "maxDistance": raio_km * 1000,
+                "spherical": True,
+                "query": filtro,
+            }},
+            {"$limit": limite},
+            {"$project": projection or {"senha": 0}},
+        ]
+        return list(db.usuarios.aggregate(pipeline))
+
+    @classmethod
+    def geocodificar_pendentes(cls, lote: int = 1000):
+        """
+        Preenche 'localizacao' dos doadores/receptores gravados antes da geocodificação.
+        Retorna (atualizados, sem_cep_reconhecido).
+        """
+        db = get_db()
+        cursor = db.usuarios.find(
+            {"role": {"$in": [RoleEnum.DOADOR.value, RoleEnum.RECEPTOR.value]}, "localizacao": {"$exists": False}},
+            {"endereco.cep": 1}
+        )
+        operacoes, atualizados, ignorados = [], 0, 0
+        for doc in cursor:
+            ponto = ponto_geojson((doc.get('endereco') or {}).get('cep'))
+            if ponto is None:
+                ignorados += 1
+                continue
+            operacoes.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"localizacao": ponto}}))
+            if len(operacoes) >= lote:
+                atualizados += db.usuarios.bulk_write(operacoes, ordered=False).modified_count
+                operacoes = []
+        if operacoes:
+            atualizados += db.usuarios.bulk_write(operacoes, ordered=False).modified_count
+        return atualizados, ignorados
+
     @classmethod
     def update_user(cls, id: str, data: dict, role_check: RoleEnum = None):
-        db = connect_db()
+        db = get_db()
         for f in ['role', 'email', '_id', 'id']: data.pop(f, None)
         if 'senha' in data and data['senha']:
-            data['senha'] = generate_password_hash(data['senha'])
+            data['senha'] = gerar_hash(data['senha'])
         else: data.pop('senha', None)
         
+        atualizacao = {"$set": data}
+        # Endereço novo: recalcula o ponto (ou remove, se o CEP não for reconhecido)
+        if isinstance(data.get('endereco'), dict):
+            data.pop('localizacao', None)
+            ponto = ponto_geojson(data['endereco'].get('cep'))
+            if ponto: data['localizacao'] = ponto
+            else: atualizacao["$unset"] = {"localizacao": ""}
+        else:
+            data.pop('localizacao', None)
+
         query = {"_id": ObjectId(id)}
         if role_check: query["role"] = role_check.value
-        return db.usuarios.update_one(query, {"$set": data}).modified_count > 0
+        modificado = db.usuarios.update_one(query, atualizacao).modified_count > 0
+        cache_usuarios.invalidar(id=id)
+        return modificado
 
     @classmethod
     def delete_user(cls, id: str, role_check: RoleEnum = None):
-        db = connect_db()
+        db = get_db()
         query = {"_id": ObjectId(id)}
         if role_check: query["role"] = role_check.value
-        return db.usuarios.delete_one(query).deleted_count > 0
+        antes = db.usuarios.find_one_and_delete(query)
+        cache_usuarios.invalidar(id=id)
+        if not antes: return False
+        estatisticas.registrar_mudanca('usuarios', antes, None)
+        return True
 
 # --- SUBCLASSES SIMPLIFICADAS ---
 # Removemos o 'Literal' para evitar conflitos de validação com strings do Mongo
@@ -173,6 +319,9 @@ class Doador(Usuario):
     declaracao_anvisa: bool
     tipos_alimentos: List[str] = []
     frequencia_doacao: str
+    localizacao: Optional[dict] = None  # GeoJSON calculado pelo CEP no save
+
+    ROLE: ClassVar[RoleEnum] = RoleEnum.DOADOR
 
     @validator('cnpj')
     def validar_cnpj(cls, v):
@@ -190,6 +339,9 @@ class Receptor(Usuario):
     numero_beneficiarios: int
     capacidade_armazenamento: str
     tipo_armazenamento: List[str] = []
+    localizacao: Optional[dict] = None  # GeoJSON calculado pelo CEP no save
+
+    ROLE: ClassVar[RoleEnum] = RoleEnum.RECEPTOR
 
     @validator('cnpj')
     def validar_cnpj(cls, v):
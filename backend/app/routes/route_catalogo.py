@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, jsonify, request
+from app.controllers.entities import controller_catalogo
+from app.middleware.auth import aplicar_politica
+
+catalogo_routes = Blueprint('catalogo_routes', __name__)
+
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(catalogo_routes, por_endpoint={'get_totais': ['admin']})
+
+@catalogo_routes.route('/catalogo/alimentos', methods=['GET'])
+def get_alimentos():
+    """Alimentos do catálogo canônico (id, nome, unidade base)."""
+    alimentos, error = controller_catalogo.listar_alimentos()
+    if error:
+        return jsonify({"erro": error}), 500
+    return jsonify(alimentos), 200
+
+@catalogo_routes.route('/catalogo/normalizar', methods=['GET'])
+def normalizar():
+    """
+    Prévia da normalização: ?alimento=Saco de Arroz 5kg&quantidade=2&unidade=sacos
+    -> {"alimento_id": 1, "alimento": "Arroz", "quantidade": 10.0, "unidade": "kg"}
+    """
+    item, error = controller_catalogo.normalizar_item(request.args)
+    if error:
+        return jsonify({"erro": error}), 400
+    return jsonify(item), 200
+
+@catalogo_routes.route('/catalogo/totais', methods=['GET'])
+def get_totais():
+    """Quantidade doada por alimento e período (admin). Parâmetros: ?de=&ate=&granularidade=semana&status=..."""
+    totais, error = controller_catalogo.totais_por_alimento(request.args)
+    if error:
+        return jsonify({"erro": error}), 400
+    return jsonify(totais), 200
@@ -2,12 +2,14 @@
 
 from flask import Blueprint, jsonify
 from app.controllers.entities import controller_dashboard
-from app.middleware.auth import auth_required
+from app.middleware.auth import aplicar_politica
 
 dashboard_routes = Blueprint('dashboard_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(dashboard_routes, por_endpoint={'reconciliar_stats': ['admin']})
+
 @dashboard_routes.route('/stats', methods=['GET'])
-@auth_required 
 def get_stats():
     """
     Endpoint para buscar as estatísticas do dashboard.
@@ -19,4 +21,11 @@ def get_stats():
         return jsonify({"erro": error}), 500
     
     return jsonify(stats), 200
-    
\ No newline at end of file
+
+@dashboard_routes.route('/stats/reconciliar', methods=['POST'])
+def reconciliar_stats():
+    """Recalcula os contadores a partir das coleções (o job periódico faz o mesmo)."""
+    stats, error = controller_dashboard.reconciliar_stats()
+    if error:
+        return jsonify({"erro": error}), 500
+    return jsonify(stats), 200
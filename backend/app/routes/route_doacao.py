@@ -1,51 +1,110 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, get_jwt
+from flask_jwt_extended import get_jwt
 from app.controllers.entities import controller_doacao
-from app.middleware.auth import auth_required
+from app.middleware.auth import aplicar_politica, principal_atual
+from app.utils.leitura_stream import iterar_ndjson, iterar_json_array
+from app.utils.concorrencia import versao_esperada
 
 doacao_routes = Blueprint('doacao_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(doacao_routes, por_endpoint={'expirar': ['admin'], 'recomendadas': ['receptor']})
+
 @doacao_routes.route('/doacoes', methods=['POST'])
-@auth_required
 def create():
-    id_doador = get_jwt_identity()
+    id_doador = principal_atual().id
     data = request.get_json()
     doacao, error = controller_doacao.create_doacao(data, id_doador)
     if error:
         return jsonify({"erro": error}), 422
     return jsonify(doacao), 201
 
+@doacao_routes.route('/doacoes/bulk', methods=['POST'])
+def create_bulk():
+    """
+    Importa várias doações de uma vez. Aceita um array JSON (application/json)
+    ou uma linha JSON por item (application/x-ndjson). O corpo é lido em blocos.
+    Responde 201 se todas forem inseridas, 207 se só parte delas e 422 se nenhuma.
+    """
+    if principal_atual().role != 'doador':
+        return jsonify({"erro": "Apenas doadores podem importar doações."}), 403
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/jsonlines'):
+        itens = iterar_ndjson(request.stream)
+    else:
+        itens = iterar_json_array(request.stream)
+
+    relatorio, error = controller_doacao.importar_doacoes(itens, principal_atual().id)
+    if error:
+        return jsonify(relatorio), 500
+    if relatorio["inseridos"] == 0:
+        return jsonify(relatorio), 422
+    return jsonify(relatorio), 201 if not relatorio["erros"] else 207
+
 @doacao_routes.route('/doacoes', methods=['GET'])
-@auth_required
 def get_all():
+    """
+    Lista as doações. Parâmetros opcionais de paginação por cursor:
+    ?limit=20&cursor=<next_cursor>&fields=alimento,status
+    Doações vencidas ficam de fora; ?incluir_expiradas=true as mostra.
+    """
     claims = get_jwt() 
     status = request.args.get('status') 
-    doacoes, error = controller_doacao.get_all_doacoes(claims, status)
+    incluir_expiradas = request.args.get('incluir_expiradas', '').lower() in ('1', 'true', 'sim')
+    doacoes, error = controller_doacao.get_all_doacoes(
+        claims, status,
+        limit=request.args.get('limit'),
+        cursor=request.args.get('cursor'),
+        fields=request.args.get('fields'),
+        ocultar_expiradas=False if incluir_expiradas else None
+    )
     if error:
-        return jsonify({"erro": error}), 500
+        status_code = 400 if "inválido" in error else 500
+        return jsonify({"erro": error}), status_code
     return jsonify(doacoes), 200
 
+@doacao_routes.route('/doacoes/recomendadas', methods=['GET'])
+def recomendadas():
+    """
+    Doações pendentes ranqueadas para o receptor logado (distância, validade,
+    armazenamento e beneficiários). Parâmetros opcionais: ?k=20&raio_km=30
+    """
+    resultado, error = controller_doacao.recomendar_doacoes(
+        principal_atual().id, request.args.get('k'), request.args.get('raio_km'))
+    if error:
+        if "inválido" in error: status_code = 400
+        elif "não encontrado" in error: status_code = 404
+        elif "não reconhecido" in error: status_code = 422
+        else: status_code = 500
+        return jsonify({"erro": error}), status_code
+    return jsonify(resultado), 200
+
 @doacao_routes.route('/doacoes/<string:id>/aceitar', methods=['PUT'])
-@auth_required
 def aceitar(id):
-    """Receptor aceita uma doação pendente"""
-    id_receptor = get_jwt_identity() # Pega o ID do token de quem está clicando
-    claims = get_jwt()
+    """
+    Receptor aceita uma doação pendente. Opcional: {"versao": n} no corpo (ou
+    cabeçalho If-Match) para só aceitar se a doação não mudou desde a leitura.
+    Responde 409 se outro receptor aceitou antes.
+    """
+    id_receptor = principal_atual().id # Pega o ID do token de quem está clicando
     
-    if claims.get('role') != 'receptor':
+    if principal_atual().role != 'receptor':
         return jsonify({"erro": "Apenas receptores podem aceitar doações."}), 403
-        
-    response, error = controller_doacao.aceitar_doacao(id, id_receptor)
-    
+
+    versao, error = versao_esperada(request)
     if error:
         return jsonify({"erro": error}), 400
+
+    response, error, status_code = controller_doacao.aceitar_doacao(id, id_receptor, versao)
     
-    return jsonify(response), 200
+    if error:
+        return jsonify({"erro": error}), status_code
+    
+    return jsonify(response), status_code
 
 @doacao_routes.route('/doacoes/<string:id>', methods=['GET'])
-@auth_required
 def get_one(id):
     doacao, error = controller_doacao.get_doacao(id)
     if error:
@@ -53,7 +112,6 @@ def get_one(id):
     return jsonify(doacao), 200
 
 @doacao_routes.route('/doacoes/<string:id>', methods=['PUT'])
-@auth_required
 def update(id):
     data = request.get_json()
     response, error = controller_doacao.update_doacao(id, data)
@@ -62,7 +120,6 @@ def update(id):
     return jsonify(response), 200
 
 @doacao_routes.route('/doacoes/<string:id>', methods=['DELETE'])
-@auth_required
 def delete(id):
     response, error = controller_doacao.delete_doacao(id)
     if error:
@@ -70,7 +127,6 @@ def delete(id):
     return jsonify(response), 200
 
 @doacao_routes.route('/doacoes/<string:id>/atribuir', methods=['PUT'])
-@auth_required
 def atribuir(id):
     data = request.get_json()
     response, error = controller_doacao.atribuir_motorista(id, data)
@@ -78,4 +134,12 @@ def atribuir(id):
         status_code = 404 if "não encontrada" in error else 400
         return jsonify({"erro": error}), status_code
     
-    return jsonify(response), 200
\ No newline at end of file
+    return jsonify(response), 200
+
+@doacao_routes.route('/doacoes/expirar', methods=['POST'])
+def expirar():
+    """Marca como 'expirada' as doações vencidas (a varredura periódica faz o mesmo)"""
+    resumo, error = controller_doacao.expirar_doacoes()
+    if error:
+        return jsonify({"erro": error}), 500
+    return jsonify(resumo), 200
@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity
 from app.controllers.entities import controller_doador
-from app.middleware.auth import auth_required
+from app.middleware.auth import aplicar_politica, principal_atual
 
 doador_routes = Blueprint('doador_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(doador_routes, publicas=['create'])
+
 @doador_routes.route('/doadores', methods=['POST'])
 def create():
     data = request.get_json()
@@ -16,7 +18,6 @@ def create():
     return jsonify(doador), 201
 
 @doador_routes.route('/doadores', methods=['GET'])
-@auth_required
 def get_all():
     doadores, error = controller_doador.get_all_doadores()
     if error:
@@ -24,9 +25,8 @@ def get_all():
     return jsonify(doadores), 200
 
 @doador_routes.route('/doadores/<string:id>', methods=['GET'])
-@auth_required
 def get_one(id):
-    id_do_usuario_logado = get_jwt_identity()
+    id_do_usuario_logado = principal_atual().id
     if id_do_usuario_logado != id:
         return jsonify({"erro": "Acesso n�o autorizado para este recurso"}), 403
 
@@ -36,9 +36,8 @@ def get_one(id):
     return jsonify(doador), 200
 
 @doador_routes.route('/doadores/<string:id>', methods=['PUT'])
-@auth_required
 def update(id):
-    id_do_usuario_logado = get_jwt_identity()
+    id_do_usuario_logado = principal_atual().id
     if id_do_usuario_logado != id:
         return jsonify({"erro": "Acesso n�o autorizado para este recurso"}), 403
 
@@ -49,9 +48,8 @@ def update(id):
     return jsonify(response), 200
 
 @doador_routes.route('/doadores/<string:id>', methods=['DELETE'])
-@auth_required
 def delete(id):
-    id_do_usuario_logado = get_jwt_identity()
+    id_do_usuario_logado = principal_atual().id
     if id_do_usuario_logado != id:
         return jsonify({"erro": "Acesso n�o autorizado para este recurso"}), 403
 
@@ -1,23 +1,27 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, get_jwt
+from flask_jwt_extended import get_jwt
 from app.controllers.entities import controller_estoque
-from app.middleware.auth import auth_required, role_required
+from app.middleware.auth import aplicar_politica, principal_atual
 
 estoque_routes = Blueprint('estoque_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(estoque_routes, por_endpoint={
+    'add_item_manualmente': ['admin'],
+    'ajustar_item': ['admin'],
+})
+
 @estoque_routes.route('/receptores/<string:receptor_id>/estoque', methods=['GET'])
-@auth_required
 def get_estoque_por_receptor(receptor_id):
     """
     Endpoint para VISUALIZAR o estoque de um receptor.
     Acesso permitido para o próprio receptor ou para um admin.
     """
-    id_usuario_logado = get_jwt_identity()
-    claims = get_jwt()
+    id_usuario_logado = principal_atual().id
     
-    if claims.get("role") != 'admin' and id_usuario_logado != receptor_id:
+    if principal_atual().role != 'admin' and id_usuario_logado != receptor_id:
         return jsonify({"erro": "Acesso não autorizado"}), 403
 
     itens, error = controller_estoque.listar_estoque_por_receptor(receptor_id)
@@ -25,8 +29,51 @@ def get_estoque_por_receptor(receptor_id):
         return jsonify({"erro": error}), 500
     return jsonify(itens), 200
 
+@estoque_routes.route('/receptores/<string:receptor_id>/estoque/baixas', methods=['POST'])
+def dar_baixa_em_lote(receptor_id):
+    """
+    Saída de vários itens de uma vez (próprio receptor ou admin).
+    O JSON deve conter: {"itens": [{"item_id": "...", "quantidade": 2}, ...], "tudo_ou_nada": false}
+    Responde com o resultado de cada item; com tudo_ou_nada, 409 se algum falhar (nada é aplicado).
+    """
+    if principal_atual().role != 'admin' and principal_atual().id != receptor_id:
+        return jsonify({"erro": "Acesso não autorizado"}), 403
+
+    data = request.get_json(silent=True) or {}
+    response, error, status_code = controller_estoque.dar_baixa_em_lote(receptor_id, data, principal_atual().id)
+    if error:
+        return jsonify({"erro": error}), status_code
+    return jsonify(response), status_code
+
+@estoque_routes.route('/receptores/<string:receptor_id>/estoque/movimentos', methods=['GET'])
+def get_movimentos_estoque(receptor_id):
+    """
+    Histórico de entradas, saídas e ajustes do estoque (próprio receptor ou admin).
+    Parâmetros: ?alimento=...&tipo=entrada|saida|ajuste&limit=50&cursor=...
+    """
+    if principal_atual().role != 'admin' and principal_atual().id != receptor_id:
+        return jsonify({"erro": "Acesso não autorizado"}), 403
+
+    pagina, error = controller_estoque.listar_movimentos(receptor_id, request.args)
+    if error:
+        return jsonify({"erro": error}), 400
+    return jsonify(pagina), 200
+
+@estoque_routes.route('/receptores/<string:receptor_id>/estoque/consumo', methods=['GET'])
+def get_consumo_estoque(receptor_id):
+    """
+    Relatório de consumo por período (próprio receptor ou admin).
+    Parâmetros: ?de=AAAA-MM-DD&ate=AAAA-MM-DD&granularidade=dia|semana|mes&alimento=...
+    """
+    if principal_atual().role != 'admin' and principal_atual().id != receptor_id:
+        return jsonify({"erro": "Acesso não autorizado"}), 403
+
+    relatorio, error = controller_estoque.relatorio_consumo(receptor_id, request.args)
+    if error:
+        return jsonify({"erro": error}), 400
+    return jsonify(relatorio), 200
+
 @estoque_routes.route('/estoque/<string:item_id>', methods=['GET'])
-@auth_required
 def get_item(item_id):
     """
     Pega um item de estoque específico.
@@ -39,39 +86,34 @@ def get_item(item_id):
     return jsonify(item), 200
 
 @estoque_routes.route('/estoque', methods=['POST'])
-@auth_required
-@role_required('admin')
 def add_item_manualmente():
     """
     Endpoint para ADICIONAR um item manualmente (restrito a admins).
     """
     data = request.get_json()
-    item, error = controller_estoque.adicionar_item_ao_estoque(data)
+    item, error = controller_estoque.adicionar_item_ao_estoque(data, usuario_id=principal_atual().id)
     if error:
         return jsonify({"erro": error}), 400
     return jsonify(item), 201
 
 @estoque_routes.route('/estoque/<string:item_id>', methods=['PUT'])
-@auth_required
-@role_required('admin')
 def ajustar_item(item_id):
     """
     Endpoint para AJUSTAR a quantidade de um item (restrito a admins).
     """
     data = request.get_json()
-    response, error = controller_estoque.ajustar_quantidade_item(item_id, data)
+    response, error = controller_estoque.ajustar_quantidade_item(item_id, data, principal_atual().id)
     if error:
         return jsonify({"erro": error}), 400
     return jsonify(response), 200
 
 @estoque_routes.route('/estoque/<string:item_id>/baixa', methods=['PUT'])
-@auth_required 
 def dar_baixa_item(item_id):
     """
     Endpoint para RECEPTOR ou ADMIN registrar a SAÍDA de um item do estoque.
     O JSON deve conter: {"quantidade": valor_da_saida}
     """
-    id_usuario_logado = get_jwt_identity()
+    id_usuario_logado = principal_atual().id
     claims = get_jwt() 
     data = request.get_json()
     
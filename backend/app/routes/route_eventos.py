@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, Response
+from app.controllers.entities import controller_eventos
+from app.middleware.auth import aplicar_politica, principal_atual
+
+eventos_routes = Blueprint('eventos_routes', __name__)
+
+# Qualquer usuário autenticado; o EventSource do navegador manda o token em ?token=
+aplicar_politica(eventos_routes, token_na_query=['stream_eventos'])
+
+@eventos_routes.route('/eventos/stream', methods=['GET'])
+def stream_eventos():
+    """
+    Server-Sent Events com as mudanças de doações e rotas visíveis para o usuário:
+    motoristas recebem as doações recém-aceitas, receptores as novas pendentes,
+    e cada um o que envolve as próprias doações/rotas.
+    """
+    # O gerador recebe o Principal já resolvido e não usa o contexto da requisição,
+    # que pode ser liberado enquanto a conexão fica aberta
+    gerador = controller_eventos.stream_eventos(principal_atual())
+    return Response(gerador, mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx: não segurar o stream em buffer
+    })
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from datetime import datetime
+from app.controllers.entities import controller_exportacao
+from app.middleware.auth import aplicar_politica
+
+exportacao_routes = Blueprint('exportacao_routes', __name__)
+
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(exportacao_routes, roles=['admin'])
+
+@exportacao_routes.route('/exportar/<string:colecao>', methods=['GET'])
+def exportar(colecao):
+    """
+    Exporta doacoes, rotas, estoque ou movimentos_estoque (histórico do estoque) em streaming.
+    Parâmetros: ?formato=ndjson|csv&de=AAAA-MM-DD&ate=AAAA-MM-DD&status=a,b&receptor_id=...&batch_size=1000
+    """
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({"erro": "Parâmetro 'formato' inválido. Use ndjson ou csv."}), 400
+
+    preparado, error = controller_exportacao.preparar_exportacao(colecao, request.args)
+    if error:
+        status_code = 404 if "não pode ser exportada" in error else 400
+        return jsonify({"erro": error}), status_code
+
+    cursor, colunas, batch_size = preparado
+    if formato == 'csv':
+        corpo = controller_exportacao.gerar_csv(cursor, colunas, batch_size)
+        mimetype = 'text/csv'
+    else:
+        corpo = controller_exportacao.gerar_ndjson(cursor, batch_size)
+        mimetype = 'application/x-ndjson'
+
+    nome = f"{colecao}_{datetime.now():%Y%m%d_%H%M%S}.{formato}"
+    return Response(
+        stream_with_context(corpo),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{nome}"'}
+    )
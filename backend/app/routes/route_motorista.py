@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, get_jwt
 from app.controllers.entities import controller_motorista
-from app.middleware.auth import auth_required, role_required
+from app.middleware.auth import aplicar_politica, principal_atual
 
 motorista_routes = Blueprint('motorista_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(motorista_routes, por_endpoint={
+    'create': ['admin'],
+    'get_all': ['admin'],
+    'delete': ['admin'],
+})
+
 @motorista_routes.route('/motoristas', methods=['POST'])
-@auth_required
-@role_required('admin') # Apenas Admin pode criar motoristas
 def create():
     data = request.get_json()
     motorista, error = controller_motorista.create_motorista(data)
@@ -18,8 +22,6 @@ def create():
     return jsonify(motorista), 201
 
 @motorista_routes.route('/motoristas', methods=['GET'])
-@auth_required
-@role_required('admin') # Apenas Admin pode ver a lista completa
 def get_all():
     motoristas, error = controller_motorista.get_all_motoristas()
     if error:
@@ -27,13 +29,11 @@ def get_all():
     return jsonify(motoristas), 200
 
 @motorista_routes.route('/motoristas/<string:id>', methods=['GET'])
-@auth_required
 def get_one(id):
     """Busca um motorista. Admin pode ver qualquer um, Motorista só pode ver a si mesmo."""
-    id_usuario_logado = get_jwt_identity()
-    claims = get_jwt()
+    id_usuario_logado = principal_atual().id
     
-    if claims.get("role") != 'admin' and id_usuario_logado != id:
+    if principal_atual().role != 'admin' and id_usuario_logado != id:
         return jsonify({"erro": "Acesso não autorizado"}), 403
 
     motorista, error = controller_motorista.get_motorista(id)
@@ -42,13 +42,11 @@ def get_one(id):
     return jsonify(motorista), 200
 
 @motorista_routes.route('/motoristas/<string:id>', methods=['PUT'])
-@auth_required
 def update(id):
     """Atualiza um motorista. Admin pode atualizar qualquer um, Motorista só a si mesmo."""
-    id_usuario_logado = get_jwt_identity()
-    claims = get_jwt()
+    id_usuario_logado = principal_atual().id
     
-    if claims.get("role") != 'admin' and id_usuario_logado != id:
+    if principal_atual().role != 'admin' and id_usuario_logado != id:
         return jsonify({"erro": "Acesso não autorizado"}), 403
         
     data = request.get_json()
@@ -58,8 +56,6 @@ def update(id):
     return jsonify(response), 200
 
 @motorista_routes.route('/motoristas/<string:id>', methods=['DELETE'])
-@auth_required
-@role_required('admin') # Apenas Admin pode deletar motoristas
 def delete(id):
     response, error = controller_motorista.delete_motorista(id)
     if error:
@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, get_jwt
 from app.controllers.entities import controller_receptor
-from app.middleware.auth import auth_required, role_required
+from app.middleware.auth import aplicar_politica, principal_atual
 
 receptor_routes = Blueprint('receptor_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(receptor_routes, por_endpoint={
+    'create': ['admin'],
+    'get_all': ['admin'],
+    'delete': ['admin'],
+    'proximos': ['admin', 'doador', 'motorista'],
+})
+
 @receptor_routes.route('/receptores', methods=['POST'])
-@auth_required
-@role_required('admin')
 def create():
     data = request.get_json()
     receptor, error = controller_receptor.create_receptor(data)
@@ -18,21 +23,26 @@ def create():
     return jsonify(receptor), 201
 
 @receptor_routes.route('/receptores', methods=['GET'])
-@auth_required
-@role_required('admin')
 def get_all():
     receptores, error = controller_receptor.get_all_receptores()
     if error:
         return jsonify({"erro": error}), 500
     return jsonify(receptores), 200
 
+@receptor_routes.route('/receptores/proximos', methods=['GET'])
+def proximos():
+    """Receptores mais próximos: ?raio_km=10&limite=20 e ?lat=&lon= ou ?cep= (padrão: o endereço do usuário)"""
+    receptores, error = controller_receptor.get_receptores_proximos(principal_atual().id, request.args)
+    if error:
+        status_code = 400 if ("inválido" in error or "não reconhecido" in error) else 500
+        return jsonify({"erro": error}), status_code
+    return jsonify(receptores), 200
+
 @receptor_routes.route('/receptores/<string:id>', methods=['GET'])
-@auth_required
 def get_one(id):
-    id_usuario_logado = get_jwt_identity()
-    claims = get_jwt()
+    id_usuario_logado = principal_atual().id
 
-    if claims.get("role") != 'admin' and id_usuario_logado != id:
+    if principal_atual().role != 'admin' and id_usuario_logado != id:
         return jsonify({"erro": "Acesso n�o autorizado"}), 403
 
     receptor, error = controller_receptor.get_one_receptor(id)
@@ -41,12 +51,10 @@ def get_one(id):
     return jsonify(receptor), 200
 
 @receptor_routes.route('/receptores/<string:id>', methods=['PUT'])
-@auth_required
 def update(id):
-    id_usuario_logado = get_jwt_identity()
-    claims = get_jwt()
+    id_usuario_logado = principal_atual().id
 
-    if claims.get("role") != 'admin' and id_usuario_logado != id:
+    if principal_atual().role != 'admin' and id_usuario_logado != id:
         return jsonify({"erro": "Acesso n�o autorizado"}), 403
 
     data = request.get_json()
@@ -56,8 +64,6 @@ def update(id):
     return jsonify(response), 200
 
 @receptor_routes.route('/receptores/<string:id>', methods=['DELETE'])
-@auth_required
-@role_required('admin')
 def delete(id):
     response, error = controller_receptor.delete_receptor(id)
     if error:
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, jsonify, request
+from app.controllers.entities import controller_relatorios
+from app.middleware.auth import aplicar_politica, principal_atual
+
+relatorios_routes = Blueprint('relatorios_routes', __name__)
+
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(relatorios_routes, roles=['doador', 'receptor', 'admin'])
+
+@relatorios_routes.route('/relatorios', methods=['GET'])
+def get_relatorio():
+    """
+    Histórico de doações entregues por período, a partir dos resumos pré-agregados.
+    Doadores e receptores veem o próprio histórico; o admin escolhe com ?entidade=doador|receptor&id=...
+    Demais parâmetros: ?de=AAAA-MM-DD&ate=AAAA-MM-DD&granularidade=dia|semana|mes
+    """
+    principal = principal_atual()
+    if principal.role == 'admin':
+        entidade, entidade_id = request.args.get('entidade'), request.args.get('id')
+    else:
+        entidade, entidade_id = principal.role, principal.id
+
+    relatorio, error = controller_relatorios.relatorio_doacoes(entidade, entidade_id, request.args)
+    if error:
+        return jsonify({"erro": error}), 400
+    return jsonify(relatorio), 200
@@ -2,23 +2,68 @@
 
 from flask import Blueprint, jsonify, request
 from app.controllers.entities import controller_rota
-from app.middleware.auth import auth_required, roles_required, role_required
-from flask_jwt_extended import get_jwt_identity
+from app.middleware.auth import aplicar_politica, principal_atual
+from app.utils.concorrencia import versao_esperada
 
 rota_routes = Blueprint('rota_routes', __name__)
 
+# Autenticação/roles de todas as rotas deste blueprint
+aplicar_politica(rota_routes, roles=['admin', 'motorista'], por_endpoint={
+    'precalcular_rotas': ['admin'],
+    'get_cache_stats': ['admin'],
+    'planejar_rotas': ['admin'],
+    'get_all_rotas': ['admin', 'motorista', 'receptor'],  # Receptor também pode precisar ver status
+})
+
 @rota_routes.route('/rotas/calcular/<string:doacao_id>', methods=['GET'])
-@auth_required
-@roles_required(['admin', 'motorista']) 
 def calcular_rota_para_doacao(doacao_id):
-    dados_completos, error = controller_rota.calcular_e_salvar_rota(doacao_id)
-    status_code = 404 if error and "não encontrada" in error else 400 if error else 200
+    """
+    Retorna a rota (200) se já calculada; senão enfileira o cálculo e
+    retorna 202 com o job_id para consulta em /rotas/jobs/<job_id>.
+    """
+    dados, error, status_code = controller_rota.solicitar_calculo_rota(doacao_id)
+    if error: return jsonify({"erro": error}), status_code
+    return jsonify(dados), status_code
+
+@rota_routes.route('/rotas/precalcular', methods=['POST'])
+def precalcular_rotas():
+    """Enfileira as rotas de todas as doações aceitas que ainda não têm rota."""
+    response, error = controller_rota.precalcular_rotas_pendentes()
+    if error: return jsonify({"erro": error}), 500
+    return jsonify(response), 202
+
+@rota_routes.route('/rotas/jobs/<string:job_id>', methods=['GET'])
+def get_job_rota(job_id):
+    job, error = controller_rota.get_job_rota(job_id)
+    if error: return jsonify({"erro": error}), 404
+    return jsonify(job), 200
+
+@rota_routes.route('/rotas/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Contadores de acerto/erro do cache de rotas (por processo)."""
+    stats, error = controller_rota.get_cache_stats()
+    if error: return jsonify({"erro": error}), 500
+    return jsonify(stats), 200
+
+@rota_routes.route('/rotas/planejar', methods=['POST'])
+def planejar_rotas():
+    """
+    Monta rotas com várias paradas (coleta/entrega) para os motoristas disponíveis
+    a partir das doações aceitas. Envie "salvar": false para apenas simular.
+    """
+    response, error, status_code = controller_rota.planejar_rotas(request.get_json(silent=True))
     if error: return jsonify({"erro": error}), status_code
-    return jsonify(dados_completos), 200
+    return jsonify(response), status_code
+
+@rota_routes.route('/rotas/planos', methods=['GET'])
+def get_planos_rota():
+    """Admin vê todos os planos; motorista só os seus."""
+    motorista_id = principal_atual().id if principal_atual().role == 'motorista' else request.args.get('motorista_id')
+    planos, error = controller_rota.get_planos_rota(motorista_id, request.args.get('status'))
+    if error: return jsonify({"erro": error}), 500
+    return jsonify(planos), 200
 
 @rota_routes.route('/rotas', methods=['GET'])
-@auth_required
-@roles_required(['admin', 'motorista', 'receptor']) # Receptor também pode precisar ver status
 def get_all_rotas():
     status = request.args.get('status') 
     rotas, error = controller_rota.get_todas_rotas(status)
@@ -26,8 +71,6 @@ def get_all_rotas():
     return jsonify(rotas), 200
 
 @rota_routes.route('/rotas/<string:rota_id>', methods=['GET'])
-@auth_required
-@roles_required(['admin', 'motorista']) 
 def get_rota(rota_id):
     rota, error = controller_rota.get_rota_por_id(rota_id)
     if error: return jsonify({"erro": error}), 404
@@ -35,30 +78,37 @@ def get_rota(rota_id):
 
 # --- CORREÇÃO PRINCIPAL AQUI ---
 @rota_routes.route('/rotas/<string:rota_id>/atribuir', methods=['PUT'])
-@auth_required
-@roles_required(['admin', 'motorista']) # AGORA MOTORISTA PODE ACEITAR!
 def atribuir_rota(rota_id):
-    data = request.get_json()
+    """
+    Atribui a rota pendente a um motorista. Só um motorista vence quando vários
+    aceitam a mesma corrida ao mesmo tempo; os demais recebem 409.
+    Opcional: {"versao": n} (ou If-Match) com a versão da rota lida pelo cliente.
+    """
+    data = request.get_json(silent=True) or {}
     motorista_id = data.get('motorista_id')
     
     # Se não vier ID no JSON (caso do motorista aceitando a própria corrida),
     # tentamos pegar do token de quem está logado.
     if not motorista_id:
-        motorista_id = get_jwt_identity()
+        motorista_id = principal_atual().id
 
-    response, error = controller_rota.atribuir_motorista_rota(rota_id, motorista_id)
-    
+    versao, error = versao_esperada(request)
     if error: return jsonify({"erro": error}), 400
-    return jsonify(response), 200
+
+    response, error, status_code = controller_rota.atribuir_motorista_rota(rota_id, motorista_id, versao)
+    
+    if error: return jsonify({"erro": error}), status_code
+    return jsonify(response), status_code
 
 @rota_routes.route('/rotas/<string:rota_id>/status', methods=['PUT'])
-@auth_required
-@roles_required(['admin', 'motorista'])
 def atualizar_status_rota(rota_id):
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     novo_status = data.get('status')
     if not novo_status: return jsonify({"erro": "status é obrigatório"}), 400
         
-    response, error = controller_rota.marcar_rota_status(rota_id, novo_status)
+    versao, error = versao_esperada(request)
     if error: return jsonify({"erro": error}), 400
-    return jsonify(response), 200
\ No newline at end of file
+
+    response, error, status_code = controller_rota.marcar_rota_status(rota_id, novo_status, versao)
+    if error: return jsonify({"erro": error}), status_code
+    return jsonify(response), status_code
\ No newline at end of file
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de rotas calculadas, indexado pelo par (CEP origem, CEP destino).
+
+Dois níveis: um LRU em memória com TTL (por processo) e a coleção 'cache_rotas'
+no MongoDB, compartilhada entre processos e expirada por um índice TTL.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import ClassVar, List
+from pymongo import IndexModel, ASCENDING
+from app.config.database import get_db
+
+ROUTE_CACHE_TTL = int(os.getenv('ROUTE_CACHE_TTL', 7 * 24 * 3600))
+ROUTE_CACHE_MAX_ITEMS = int(os.getenv('ROUTE_CACHE_MAX_ITEMS', 1024))
+
+# Campos do resultado de rota que são guardados no cache
+CAMPOS_CACHE = ('distancia_texto', 'duracao_texto', 'resumo_rota', 'distancia_km', 'duracao_min', 'provedor')
+
+
+def normalizar_cep(cep: str) -> str:
+    return re.sub(r'\D', '', cep or '')
+
+
+def chave_rota(origem: str, destino: str) -> str:
+    return f"{normalizar_cep(origem)}|{normalizar_cep(destino)}"
+
+
+class CacheRotas:
+    COLLECTION: ClassVar[str] = 'cache_rotas'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("criado_em", ASCENDING)], expireAfterSeconds=ROUTE_CACHE_TTL, name="criado_em_ttl"),
+    ]
+
+    def __init__(self, ttl=ROUTE_CACHE_TTL, max_itens=ROUTE_CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memoria = 0
+        self.hits_mongo = 0
+        self.misses = 0
+
+    def _get_memoria(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            self.hits_memoria += 1
+            return valor
+
+    def _contar(self, contador):
+        # Os contadores são somados por várias threads de requisição: += fora do lock perde contagens
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def _set_memoria(self, chave, valor, ttl=None):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + (ttl or self.ttl), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def get(self, origem: str, destino: str):
+        """Retorna o dict com distância/duração/resumo ou None."""
+        chave = chave_rota(origem, destino)
+        valor = self._get_memoria(chave)
+        if valor is not None:
+            return dict(valor)
+
+        try:
+            doc = get_db()[self.COLLECTION].find_one({"_id": chave})
+        except Exception as e:
+            print(f"⚠️  Cache de rotas indisponível: {e}")
+            doc = None
+
+        if doc:
+            idade = (datetime.now() - doc['criado_em']).total_seconds()
+            if idade < self.ttl:
+                valor = {c: doc[c] for c in CAMPOS_CACHE if c in doc}
+                self._set_memoria(chave, valor, ttl=self.ttl - idade)
+                self._contar('hits_mongo')
+                return dict(valor)
+
+        self._contar('misses')
+        return None
+
+    def set(self, origem: str, destino: str, resultado: dict):
+        chave = chave_rota(origem, destino)
+        valor = {c: resultado[c] for c in CAMPOS_CACHE if c in resultado}
+        self._set_memoria(chave, valor)
+        try:
+            get_db()[self.COLLECTION].update_one(
+                {"_id": chave},
+                {"$set": {**valor, "criado_em": datetime.now()}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️  Não foi possível gravar a rota no cache: {e}")
+
+    def limpar_memoria(self):
+        with self._lock:
+            self._itens.clear()
+
+    def stats(self):
+        with self._lock:
+            itens, hits_memoria, hits_mongo, misses = len(self._itens), self.hits_memoria, self.hits_mongo, self.misses
+        total = hits_memoria + hits_mongo + misses
+        return {
+            "itens_memoria": itens,
+            "hits_memoria": hits_memoria,
+            "hits_mongo": hits_mongo,
+            "misses": misses,
+            "taxa_acerto": round((hits_memoria + hits_mongo) / total, 4) if total else 0.0
+        }
+
+
+# Instância única do processo
+cache_rotas = CacheRotas()
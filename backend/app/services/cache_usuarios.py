@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em memória (por processo) da projeção de login dos usuários:
+email -> {id, role, nome, senha (hash), ativo}.
+
+Os models invalidam a entrada ao alterar ou remover o usuário. Outros processos
+só enxergam a alteração quando a entrada expira (LOGIN_CACHE_TTL), por isso o
+TTL padrão é curto.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+LOGIN_CACHE_TTL = float(os.getenv('LOGIN_CACHE_TTL', 30))
+LOGIN_CACHE_MAX_ITEMS = int(os.getenv('LOGIN_CACHE_MAX_ITEMS', 4096))
+
+# Campos guardados no cache (os mesmos da projeção usada no login)
+CAMPOS_LOGIN = ('_id', 'role', 'nome', 'senha', 'ativo')
+
+
+class CacheUsuarios:
+    def __init__(self, ttl=LOGIN_CACHE_TTL, max_itens=LOGIN_CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()   # email -> (expira_em, projecao)
+        self._emails = {}             # id -> email, para invalidar por id
+        self._lock = threading.Lock()
+
+    def get(self, email: str):
+        with self._lock:
+            item = self._itens.get(email)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                self._remover(email)
+                return None
+            self._itens.move_to_end(email)
+            return dict(valor)
+
+    def set(self, email: str, projecao: dict):
+        with self._lock:
+            self._itens[email] = (time.monotonic() + self.ttl, dict(projecao))
+            self._itens.move_to_end(email)
+            self._emails[str(projecao['_id'])] = email
+            while len(self._itens) > self.max_itens:
+                antigo, (_, valor) = self._itens.popitem(last=False)
+                self._emails.pop(str(valor['_id']), None)
+
+    def _remover(self, email):
+        _, valor = self._itens.pop(email, (None, None))
+        if valor:
+            self._emails.pop(str(valor['_id']), None)
+
+    def invalidar(self, id: str = None, email: str = None):
+        with self._lock:
+            if id is not None:
+                email = self._emails.get(str(id), email)
+            if email is not None:
+                self._remover(email)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._emails.clear()
+
+
+cache_usuarios = CacheUsuarios()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Catálogo canônico de alimentos e unidades.
+
+Os nomes digitados livremente ("Saco de Arroz 5kg", "feijões", "Óleo de soja 900ml")
+são resolvidos, na gravação, para um alimento do catálogo (id inteiro, tabela
+data/catalogo_alimentos.csv) e uma quantidade na unidade base dele (kg, l ou un):
+
+    normalizar("Saco de Arroz 5kg", 2, "sacos")  ->  arroz (id 1), 10.0 kg
+
+- o texto é normalizado (minúsculas, sem acentos, plural simples -> singular);
+- embalagens e unidades no começo ("saco de", "kg de") são ignoradas e o nome
+  precisa COMEÇAR por um sinônimo do catálogo; uma trie de palavras encontra o
+  sinônimo mais longo ("farinha de milho" vence "farinha");
+- expressões de FORA_DO_CATALOGO ("leite de coco", "massa de bolo"...) não são
+  atribuídas ao alimento do começo delas;
+- a unidade informada é convertida pela tabela UNIDADES; se for uma embalagem
+  (saco, pacote, caixa...) e o texto trouxer o tamanho ("5kg", "12x1l"), a
+  quantidade vira o total nessa unidade.
+
+Na dúvida o alimento fica fora do catálogo: alimento_id None e o nome digitado.
+"""
+import csv
+import os
+import re
+import threading
+import unicodedata
+from typing import NamedTuple, Optional
+
+_TABELA_CATALOGO = os.path.join(os.path.dirname(__file__), 'data', 'catalogo_alimentos.csv')
+
+# Unidade digitada (normalizada) -> (unidade base, fator)
+UNIDADES = {
+    'kg': ('kg', 1.0), 'kgs': ('kg', 1.0), 'quilo': ('kg', 1.0), 'kilo': ('kg', 1.0), 'quilograma': ('kg', 1.0),
+    'g': ('kg', 0.001), 'gr': ('kg', 0.001), 'grs': ('kg', 0.001), 'grama': ('kg', 0.001),
+    'l': ('l', 1.0), 'lt': ('l', 1.0), 'lts': ('l', 1.0), 'litro': ('l', 1.0),
+    'ml': ('l', 0.001),
+    'un': ('un', 1.0), 'und': ('un', 1.0), 'unid': ('un', 1.0), 'unidade': ('un', 1.0),
+    'peca': ('un', 1.0), 'pc': ('un', 1.0),
+    'duzia': ('un', 12.0),
+}
+
+# Embalagens: contam como unidades, mas o tamanho no nome do alimento ("5kg") tem prioridade
+EMBALAGENS = {'pacote', 'pct', 'saco', 'caixa', 'cx', 'lata', 'garrafa', 'fardo', 'bandeja',
+              'pote', 'embalagem', 'vidro', 'sache', 'galao', 'frasco'}
+
+# Nomes que começam por um sinônimo do catálogo mas são outro alimento
+FORA_DO_CATALOGO = ('leite de coco', 'leite condensado', 'leite de soja', 'doce de leite',
+                    'massa de bolo', 'massa de pastel', 'massa de pizza', 'farinha lactea',
+                    'farinha de rosca', 'carne de soja', 'pao de mel')
+
+# Palavras ignoradas no começo do nome ("Saco de Arroz", "Kg de feijão")
+_CONECTIVOS = {'de', 'do', 'da', 'com', 'em'}
+
+_TAMANHO = re.compile(
+    r'(?:(\d+)\s*x\s*)?(\d+(?:[.,]\d+)?)\s*(kg|kgs|quilos?|g|gr|grs|gramas?|l|lt|lts|litros?|ml)\b')
+
+
+def normalizar_texto(texto) -> str:
+    """Minúsculas, sem acentos e com espaços simples."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip()
+
+
+def singular(palavra: str) -> str:
+    """Plural simples do português: feijoes -> feijao, paes -> pao, ovos -> ovo."""
+    if palavra.endswith(('oes', 'aes')) and len(palavra) >= 4:
+        return palavra[:-3] + 'ao'
+    if palavra.endswith('s') and len(palavra) > 3:
+        return palavra[:-1]
+    return palavra
+
+
+def _palavras(texto: str):
+    return [singular(p) for p in re.findall(r'[a-z]+', texto)]
+
+
+class AlimentoCatalogo(NamedTuple):
+    id: int
+    chave: str
+    nome: str
+    unidade_base: str
+    kg_por_unidade: Optional[float]
+
+
+class ItemNormalizado(NamedTuple):
+    alimento_id: Optional[int]
+    alimento: str
+    quantidade: float
+    unidade: str
+
+
+class CatalogoAlimentos:
+    def __init__(self, caminho=_TABELA_CATALOGO):
+        self.caminho = caminho
+        self._por_id = None
+        self._trie = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        if self._trie is not None:
+            return
+        with self._lock:
+            if self._trie is not None:
+                return
+            por_id, trie = {}, {}
+            with open(self.caminho, encoding='utf-8') as f:
+                for linha in csv.DictReader(f):
+                    alimento = AlimentoCatalogo(
+                        id=int(linha['id']),
+                        chave=linha['chave'],
+                        nome=linha['nome'],
+                        unidade_base=linha['unidade_base'],
+                        kg_por_unidade=float(linha['kg_por_unidade']) if linha['kg_por_unidade'] else None,
+                    )
+                    por_id[alimento.id] = alimento
+                    for sinonimo in linha['sinonimos'].split('|'):
+                        no = trie
+                        for palavra in _palavras(normalizar_texto(sinonimo)):
+                            no = no.setdefault(palavra, {})
+                        no[None] = alimento.id  # fim de uma expressão
+            for expressao in FORA_DO_CATALOGO:
+                no = trie
+                for palavra in _palavras(normalizar_texto(expressao)):
+                    no = no.setdefault(palavra, {})
+                no[None] = None  # casa, mas não é alimento do catálogo
+            self._por_id, self._trie = por_id, trie
+
+    def alimentos(self):
+        self._carregar()
+        return list(self._por_id.values())
+
+    def por_id(self, alimento_id) -> Optional[AlimentoCatalogo]:
+        self._carregar()
+        return self._por_id.get(alimento_id)
+
+    def identificar(self, texto: str) -> Optional[AlimentoCatalogo]:
+        """
+        Alimento cujo sinônimo mais longo inicia o nome (depois das embalagens e
+        unidades do começo). None se nenhum sinônimo iniciar o nome ou se o nome
+        for uma expressão de FORA_DO_CATALOGO: um alimento citado no meio do nome
+        ("bolo de cenoura") não é adivinhado.
+        """
+        self._carregar()
+        palavras = _palavras(_TAMANHO.sub(' ', normalizar_texto(texto)))
+        inicio = 0
+        while inicio < len(palavras) and (
+                palavras[inicio] in EMBALAGENS or palavras[inicio] in UNIDADES or palavras[inicio] in _CONECTIVOS):
+            inicio += 1
+        no, melhor = self._trie, None
+        for palavra in palavras[inicio:]:
+            no = no.get(palavra)
+            if no is None:
+                break
+            if None in no:
+                melhor = no[None]
+        return self._por_id[melhor] if melhor is not None else None
+
+    def normalizar(self, alimento: str, quantidade: float, unidade: str) -> ItemNormalizado:
+        """Alimento canônico e quantidade na unidade base (ver docstring do módulo)."""
+        quantidade = float(quantidade)
+        texto = normalizar_texto(alimento)
+        nome_unidade = singular(normalizar_texto(unidade))
+        unidade_base, fator = UNIDADES.get(nome_unidade, (nome_unidade, 1.0))
+
+        # Tamanho da embalagem no nome: "Saco de Arroz 5kg", "Leite 12x1l"
+        if nome_unidade in EMBALAGENS or unidade_base == 'un':
+            tamanho = _TAMANHO.search(texto)
+            if tamanho:
+                multiplicador = int(tamanho.group(1) or 1)
+                valor = float(tamanho.group(2).replace(',', '.'))
+                unidade_tamanho, fator_tamanho = UNIDADES[singular(tamanho.group(3))]
+                unidade_base, fator = unidade_tamanho, fator * multiplicador * valor * fator_tamanho
+            elif nome_unidade in EMBALAGENS:
+                unidade_base = 'un'
+        quantidade *= fator
+
+        encontrado = self.identificar(texto)
+        if encontrado is None:
+            return ItemNormalizado(None, ' '.join(str(alimento).split()), quantidade, unidade_base)
+
+        # Unidades <-> kg quando o catálogo tem o peso médio (ex.: ovos)
+        if encontrado.kg_por_unidade:
+            if unidade_base == 'un' and encontrado.unidade_base == 'kg':
+                quantidade, unidade_base = quantidade * encontrado.kg_por_unidade, 'kg'
+            elif unidade_base == 'kg' and encontrado.unidade_base == 'un':
+                quantidade, unidade_base = quantidade / encontrado.kg_por_unidade, 'un'
+        return ItemNormalizado(encontrado.id, encontrado.nome, round(quantidade, 6), unidade_base)
+
+    def kg_equivalente(self, alimento_id, quantidade: float, unidade: str) -> Optional[float]:
+        """Peso aproximado em kg (litros contam como kg); None se não der para estimar."""
+        if unidade in ('kg', 'l'):
+            return quantidade
+        encontrado = self.por_id(alimento_id) if alimento_id is not None else None
+        if unidade == 'un' and encontrado and encontrado.kg_por_unidade:
+            return quantidade * encontrado.kg_por_unidade
+        return None
+
+    def base_da_doacao(self, doacao: dict):
+        """
+        (alimento_id, quantidade, unidade) de uma doação na unidade base: os campos
+        gravados pelo catálogo ou, nas doações anteriores a ele, normalizados na hora.
+        """
+        if doacao.get('unidade_base') is not None:
+            return doacao.get('alimento_id'), doacao.get('quantidade_base') or 0, doacao['unidade_base']
+        item = self.normalizar(doacao.get('alimento', ''), doacao.get('quantidade') or 0,
+                               doacao.get('unidade') or 'un')
+        return item.alimento_id, item.quantidade, item.unidade
+
+
+catalogo = CatalogoAlimentos()
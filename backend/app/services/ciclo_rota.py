@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Máquina de estados do ciclo de vida rota/doação.
+
+Transições permitidas (StatusRotaEnum) e o efeito de cada uma na doação:
+
+    pendente     -> em_andamento   motorista aceita: doação 'aceita' -> 'a caminho'
+    pendente     -> cancelada      doação continua 'aceita', sem motorista
+    em_andamento -> concluida      doação 'a caminho' -> 'recebida', entra no estoque do receptor
+                                   e nos resumos de doador/receptor (model_resumoDoacao.py)
+    em_andamento -> pendente       motorista desiste: doação volta para 'aceita', sem motorista
+    em_andamento -> cancelada      idem
+
+Rota, doação, evento da transição e estoque são gravados numa única transação
+quando o servidor suporta (replica set/mongos). Em servidor standalone as escritas
+são feitas em sequência, com a rota (escrita condicional) primeiro e o estoque por
+último; se um passo falhar, as escritas anteriores são desfeitas.
+"""
+import traceback
+from datetime import datetime
+from app.config.database import executar_em_transacao
+from app.controllers.entities.controller_estoque import adicionar_item_ao_estoque
+from app.exceptions.custom_exceptions import ConflictError, NotFoundError, ValidationError
+from app.models.entities.model_doacao import Doacao
+from app.models.entities.model_resumoDoacao import ResumoDoacoes
+from app.models.entities.model_rota import Rota, StatusRotaEnum
+from app.services.estatisticas import estatisticas
+from app.services.eventos import eventos
+from app.utils.concorrencia import condicao_versao
+
+PENDENTE = StatusRotaEnum.PENDENTE.value
+EM_ANDAMENTO = StatusRotaEnum.EM_ANDAMENTO.value
+CONCLUIDA = StatusRotaEnum.CONCLUIDA.value
+CANCELADA = StatusRotaEnum.CANCELADA.value
+
+TRANSICOES = {
+    PENDENTE: {EM_ANDAMENTO, CANCELADA},
+    EM_ANDAMENTO: {CONCLUIDA, PENDENTE, CANCELADA},
+    CONCLUIDA: set(),
+    CANCELADA: set(),
+}
+
+# Etapa de cada status: uma transição pedida a partir de um status mais adiantado
+# que todas as suas origens significa que a rota já seguiu (409), não que o pedido
+# seja inválido em si (422)
+ETAPA = {PENDENTE: 0, EM_ANDAMENTO: 1, CONCLUIDA: 2, CANCELADA: 2}
+
+# Para cada status de destino: (status aceitos da doação, campos gravados na doação)
+EFEITOS_DOACAO = {
+    EM_ANDAMENTO: (['aceita'], lambda motorista_id: {"status": "a caminho", "motorista_id": motorista_id}),
+    CONCLUIDA: (['a caminho'], lambda motorista_id: {"status": "recebida", "data_recebimento": datetime.now()}),
+    PENDENTE: (['aceita', 'a caminho'], lambda motorista_id: {"status": "aceita", "motorista_id": None}),
+    CANCELADA: (['aceita', 'a caminho'], lambda motorista_id: {"status": "aceita", "motorista_id": None}),
+}
+
+
+def _valor(status):
+    return getattr(status, 'value', status)
+
+
+def _rota_ja_seguiu(status_atual, novo_status):
+    origens = [origem for origem, destinos in TRANSICOES.items() if novo_status in destinos]
+    return bool(origens) and ETAPA[status_atual] > max(ETAPA[o] for o in origens)
+
+
+def transicionar_rota(rota_id: str, novo_status: str, motorista_id: str = None, versao: int = None):
+    """
+    Aplica a transição da rota para `novo_status` e o efeito correspondente na doação.
+    Retorna o evento gerado. Lança NotFoundError (404), ValidationError (422, transição
+    inválida em si, ex.: pendente -> concluida) ou ConflictError (409, a rota já foi
+    aceita por outro motorista ou seguiu adiante, ou outra requisição mudou a rota/doação).
+    """
+    if novo_status not in TRANSICOES:
+        raise ValidationError(f"Status '{novo_status}' inválido.")
+    if novo_status == EM_ANDAMENTO and not motorista_id:
+        raise ValidationError("ID do motorista não identificado.")
+
+    atual = Rota.find_by_id(rota_id)
+    if not atual:
+        raise NotFoundError("Rota não encontrada")
+    status_atual = _valor(atual.status)
+    if novo_status == EM_ANDAMENTO and (
+            status_atual != PENDENTE or atual.motorista_id not in (None, motorista_id)):
+        raise ConflictError("Esta corrida já foi aceita por outro motorista.")
+    if novo_status not in TRANSICOES[status_atual]:
+        if _rota_ja_seguiu(status_atual, novo_status):
+            raise ConflictError(f"A rota já está '{status_atual}': outra requisição a alterou antes.")
+        raise ValidationError(f"Transição de '{status_atual}' para '{novo_status}' não permitida.")
+    if versao is not None and atual.versao != versao:
+        raise ConflictError(f"A rota foi alterada por outra requisição (versão atual: {atual.versao}).")
+
+    mudancas = []
+
+    def aplicar(session):
+        # with_transaction pode repetir a função: nada de estado fora da transação
+        mudancas.clear()
+        desfazer = []
+        try:
+            return _aplicar(session, desfazer)
+        except Exception:
+            if session is None:
+                _desfazer(desfazer)
+            raise
+
+    def _aplicar(session, desfazer):
+        condicao = {"status": status_atual}
+        if versao is not None: condicao["versao"] = condicao_versao(versao)
+        dados = {"status": novo_status}
+        if novo_status == EM_ANDAMENTO:
+            # Rota livre ou já reservada para este motorista
+            condicao["motorista_id"] = {"$in": [None, motorista_id]}
+            dados["motorista_id"] = motorista_id
+        elif novo_status == PENDENTE:
+            dados["motorista_id"] = None
+
+        rota = Rota.update_condicional(rota_id, condicao, dados, session=session, mudancas=mudancas)
+        if rota is None:
+            if novo_status == EM_ANDAMENTO:
+                raise ConflictError("Esta corrida já foi aceita por outro motorista.")
+            raise ConflictError("A rota foi alterada por outra requisição. Tente novamente.")
+        # As compensações não mexem nas estatísticas: as da transição nem chegaram a ser aplicadas
+        desfazer.append(lambda: Rota.update_condicional(rota_id, {"versao": rota["versao"]}, {
+            "status": status_atual, "motorista_id": atual.motorista_id, "data_conclusao": atual.data_conclusao},
+            mudancas=[]))
+
+        status_doacao, efeito = EFEITOS_DOACAO[novo_status]
+        doacao = Doacao.update_condicional(rota["doacao_id"], {"status": {"$in": status_doacao}},
+                                           efeito(motorista_id), session=session, mudancas=mudancas)
+        if doacao is None:
+            raise ConflictError(f"A doação desta rota não está em um status compatível ({', '.join(status_doacao)}).")
+        antes_doacao = next(antes for colecao, antes, _ in mudancas if colecao == 'doacoes')
+        desfazer.append(lambda: Doacao.update_condicional(doacao["_id"], {"versao": doacao["versao"]}, {
+            "status": antes_doacao.get("status"), "motorista_id": antes_doacao.get("motorista_id")},
+            mudancas=[]))
+
+        # O evento é gravado antes do estoque: é o único passo fácil de desfazer e, sendo o
+        # estoque o último, uma falha nele não deixa entrada de estoque para trás
+        evento = eventos.registrar(f"rota.{novo_status}", {
+            "rota_id": rota_id,
+            "doacao_id": rota["doacao_id"],
+            "de": status_atual,
+            "para": novo_status,
+            "motorista_id": rota.get("motorista_id") or atual.motorista_id,
+            "doador_id": doacao.get("doador_id"),
+            "receptor_id": doacao.get("receptor_id"),
+            "doacao_status": doacao["status"],
+            "versao": rota["versao"],
+        }, session=session)
+        desfazer.append(lambda: eventos.colecao.delete_one({"_id": evento["_id"]}))
+
+        if novo_status == CONCLUIDA and doacao.get("receptor_id"):
+            _, erro = adicionar_item_ao_estoque({
+                "receptor_id": doacao["receptor_id"],
+                "alimento": doacao["alimento"],
+                "quantidade": doacao["quantidade"],
+                "unidade": doacao["unidade"],
+            }, session=session, origem={"doacao_id": rota["doacao_id"], "rota_id": rota_id})
+            if erro:
+                raise RuntimeError(f"Erro ao atualizar o estoque do receptor: {erro}")
+        return evento
+
+    evento = executar_em_transacao(aplicar)
+
+    # Depois do commit: contadores do dashboard, resumos de doações e assinantes do evento
+    for colecao, antes, depois in mudancas:
+        estatisticas.registrar_mudanca(colecao, antes, depois)
+        if colecao == 'doacoes' and novo_status == CONCLUIDA:
+            ResumoDoacoes.registrar_entrega(depois)
+    eventos.publicar(evento)
+    return evento
+
+
+def _desfazer(desfazer):
+    """Compensação no modo standalone: desfaz as escritas já feitas, da última para a primeira."""
+    for acao in reversed(desfazer):
+        try:
+            acao()
+        except Exception as e:
+            print(f"❌ Falha ao desfazer passo da transição de rota: {e}")
+            traceback.print_exc()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Estatísticas do dashboard mantidas de forma incremental.
+
+Os models de Doacao, Rota e Usuario chamam `registrar_mudanca` a cada escrita com o
+estado anterior e o novo do documento; a diferença das contribuições vira um
+único `$inc` no documento 'geral' da coleção 'estatisticas'. O dashboard lê esse
+documento (com cache em memória de STATS_CACHE_TTL segundos) em vez de contar as
+coleções.
+
+Um job periódico (`reconciliar`) recalcula tudo por agregação e substitui os
+contadores, corrigindo desvios de escritas feitas fora dos models ou de falhas
+entre a escrita e o `$inc`.
+"""
+import os
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from typing import ClassVar
+from app.config.database import get_db
+from app.services.catalogo import catalogo
+
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', 5))
+STATS_RECONCILE_SECONDS = int(os.getenv('STATS_RECONCILE_SECONDS', 600))
+
+DOC_ID = 'geral'
+
+
+# --- Contribuição de cada documento para os contadores ---
+
+def _kg_doacao(doc):
+    # Mesmo peso dos resumos de /relatorios: unidade base do catálogo, litros e
+    # unidades com peso conhecido também contam
+    try:
+        return catalogo.kg_equivalente(*catalogo.base_da_doacao(doc)) or 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+def _contribuicao_doacao(doc):
+    c = Counter({"doacoes.total": 1, f"doacoes.por_status.{doc.get('status')}": 1})
+    # Quilos movimentados: doações já entregues ao receptor
+    if doc.get('status') == 'recebida' and doc.get('receptor_id'):
+        kg = _kg_doacao(doc)
+        if kg:
+            c[f"kg_por_receptor.{doc['receptor_id']}"] += kg
+    return c
+
+def _contribuicao_rota(doc):
+    return Counter({"rotas.total": 1, f"rotas.por_status.{doc.get('status')}": 1})
+
+def _contribuicao_usuario(doc):
+    return Counter({"usuarios.total": 1, f"usuarios.por_role.{doc.get('role')}": 1})
+
+CONTRIBUICOES = {
+    'doacoes': _contribuicao_doacao,
+    'rotas': _contribuicao_rota,
+    'usuarios': _contribuicao_usuario,
+}
+
+# Campos que, ao mudar, alteram algum contador (as escritas que não tocam
+# nesses campos não precisam ler o estado anterior)
+CAMPOS_RELEVANTES = {
+    'doacoes': {'status', 'receptor_id', 'alimento', 'quantidade', 'unidade', 'alimento_id', 'quantidade_base',
+                'unidade_base'},
+    'rotas': {'status'},
+    'usuarios': {'role'},
+}
+
+
+def _valor(v):
+    # Enums (str, Enum) viram o valor puro
+    return getattr(v, 'value', v)
+
+
+class Estatisticas:
+    COLLECTION: ClassVar[str] = 'estatisticas'
+
+    def __init__(self, ttl=STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = None
+        self._cache_em = 0.0
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    @property
+    def colecao(self):
+        return get_db()[self.COLLECTION]
+
+    # --- Escrita ---
+
+    def registrar_mudanca(self, colecao: str, antes: dict = None, depois: dict = None):
+        """
+        Aplica a diferença entre as contribuições de `antes` e `depois` (None para
+        inserção/remoção). Nunca propaga erro: a escrita principal já aconteceu e a
+        reconciliação corrige o contador.
+        """
+        try:
+            contribuicao = CONTRIBUICOES[colecao]
+            delta = Counter()
+            if depois:
+                delta.update(contribuicao({k: _valor(v) for k, v in depois.items()}))
+            if antes:
+                delta.subtract(contribuicao({k: _valor(v) for k, v in antes.items()}))
+            self._aplicar(delta)
+        except Exception as e:
+            print(f"⚠️  Falha ao atualizar estatísticas ({colecao}): {e}")
+
+    def registrar_insercoes(self, colecao: str, docs: list):
+        """Versão em lote de `registrar_mudanca` para inserções: um único $inc."""
+        try:
+            contribuicao = CONTRIBUICOES[colecao]
+            delta = Counter()
+            for doc in docs:
+                delta.update(contribuicao({k: _valor(v) for k, v in doc.items()}))
+            self._aplicar(delta)
+        except Exception as e:
+            print(f"⚠️  Falha ao atualizar estatísticas ({colecao}): {e}")
+
+    def registrar_contagem(self, delta: dict):
+        """Aplica incrementos já calculados (ex.: atualizações em massa)."""
+        try:
+            self._aplicar(Counter(delta))
+        except Exception as e:
+            print(f"⚠️  Falha ao atualizar estatísticas: {e}")
+
+    def _aplicar(self, delta):
+        inc = {k: v for k, v in delta.items() if v}
+        if not inc:
+            return
+        self.colecao.update_one(
+            {"_id": DOC_ID},
+            {"$inc": inc, "$set": {"atualizado_em": datetime.now()}},
+            upsert=True
+        )
+        self._cache = None
+
+    # --- Leitura ---
+
+    def obter(self):
+        """Documento de contadores (cacheado por `ttl` segundos)."""
+        agora = time.monotonic()
+        cache = self._cache
+        if cache is not None and agora - self._cache_em < self.ttl:
+            return cache
+
+        doc = self.colecao.find_one({"_id": DOC_ID})
+        if doc is None or doc.get("reconciliado_em") is None:
+            # Primeira execução: contadores ainda não foram inicializados
+            doc = self.reconciliar()
+        self._cache, self._cache_em = doc, agora
+        return doc
+
+    # --- Reconciliação ---
+
+    def reconciliar(self):
+        """Recalcula todos os contadores a partir das coleções e os substitui."""
+        inicio = time.monotonic()
+        db = get_db()
+        doc = {"_id": DOC_ID}
+
+        def por_campo(colecao, campo):
+            pipeline = [{"$group": {"_id": f"${campo}", "n": {"$sum": 1}}}]
+            return {str(r["_id"]): r["n"] for r in db[colecao].aggregate(pipeline)}
+
+        doacoes = por_campo('doacoes', 'status')
+        rotas = por_campo('rotas', 'status')
+        usuarios = por_campo('usuarios', 'role')
+        doc["doacoes"] = {"total": sum(doacoes.values()), "por_status": doacoes}
+        doc["rotas"] = {"total": sum(rotas.values()), "por_status": rotas}
+        doc["usuarios"] = {"total": sum(usuarios.values()), "por_role": usuarios}
+
+        # kg somados por (receptor, alimento, unidade base) no banco e convertidos aqui
+        kg_por_receptor = Counter()
+        recebidas = {"status": "recebida", "receptor_id": {"$ne": None}}
+        grupos = db.doacoes.aggregate([
+            {"$match": {**recebidas, "unidade_base": {"$ne": None}}},
+            {"$group": {"_id": {"receptor_id": "$receptor_id", "alimento_id": "$alimento_id",
+                                "unidade_base": "$unidade_base"},
+                        "quantidade_base": {"$sum": "$quantidade_base"}}}
+        ])
+        for r in grupos:
+            kg_por_receptor[r["_id"]["receptor_id"]] += _kg_doacao({**r["_id"], "quantidade_base": r["quantidade_base"]})
+        # Doações gravadas antes do catálogo: cada (alimento, unidade) é normalizado na hora
+        antigas = db.doacoes.aggregate([
+            {"$match": {**recebidas, "unidade_base": None}},
+            {"$group": {"_id": {"receptor_id": "$receptor_id", "alimento": "$alimento", "unidade": "$unidade"},
+                        "quantidade": {"$sum": "$quantidade"}}}
+        ])
+        for r in antigas:
+            kg_por_receptor[r["_id"]["receptor_id"]] += _kg_doacao({**r["_id"], "quantidade": r["quantidade"]})
+        doc["kg_por_receptor"] = {receptor: kg for receptor, kg in kg_por_receptor.items() if kg}
+
+        doc["atualizado_em"] = doc["reconciliado_em"] = datetime.now()
+        self.colecao.replace_one({"_id": DOC_ID}, doc, upsert=True)
+        self._cache = None
+        print(f"📊 Estatísticas reconciliadas em {time.monotonic() - inicio:.2f}s")
+        return doc
+
+    def iniciar_reconciliacao_periodica(self, intervalo=STATS_RECONCILE_SECONDS):
+        """Thread daemon que reconcilia a cada `intervalo` segundos (uma por processo)."""
+        if intervalo <= 0 or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+
+            def loop():
+                while True:
+                    time.sleep(intervalo)
+                    try:
+                        self.reconciliar()
+                    except Exception as e:
+                        print(f"❌ Erro ao reconciliar estatísticas: {e}")
+                        traceback.print_exc()
+
+            threading.Thread(target=loop, name="reconciliacao-estatisticas", daemon=True).start()
+            self._thread_pid = os.getpid()
+
+
+estatisticas = Estatisticas()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Eventos do ciclo de vida das rotas e doações.
+
+Cada transição gera um único evento, gravado na coleção 'eventos' na mesma
+unidade de trabalho da mudança de estado (outbox) e, depois do commit, entregue
+aos assinantes deste processo pelo barramento em memória. Fora de transações,
+`emitir` faz as duas coisas de uma vez.
+
+Todo evento traz 'doacao_status' e os ids de doador/receptor/motorista
+envolvidos, usados para filtrar o que cada usuário recebe em tempo real
+(services/tempo_real.py).
+
+Os eventos antigos são removidos pelo índice TTL (EVENTOS_TTL_DIAS).
+"""
+import os
+import threading
+import traceback
+from datetime import datetime
+from typing import ClassVar, List
+from pymongo import IndexModel, ASCENDING
+from app.config.database import get_db
+
+EVENTOS_TTL_DIAS = int(os.getenv('EVENTOS_TTL_DIAS', 30))
+
+
+class Eventos:
+    COLLECTION: ClassVar[str] = 'eventos'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel([("data", ASCENDING)], expireAfterSeconds=EVENTOS_TTL_DIAS * 86400, name="data_ttl"),
+        IndexModel([("rota_id", ASCENDING), ("data", ASCENDING)], name="rota_data"),
+    ]
+
+    def __init__(self):
+        self._assinantes = []
+        self._lock = threading.Lock()
+
+    @property
+    def colecao(self):
+        return get_db()[self.COLLECTION]
+
+    def registrar(self, tipo: str, dados: dict, session=None):
+        """Grava o evento (na transação de `session`, se houver) e o retorna."""
+        evento = {"tipo": tipo, "data": datetime.now(), **dados}
+        result = self.colecao.insert_one(evento, session=session)
+        evento["_id"] = result.inserted_id
+        return evento
+
+    def registrar_lote(self, tipo: str, lista: list):
+        """Grava vários eventos do mesmo tipo com um único insert_many."""
+        agora = datetime.now()
+        lote = [{"tipo": tipo, "data": agora, **dados} for dados in lista]
+        if lote:
+            self.colecao.insert_many(lote, ordered=False)
+        return lote
+
+    def emitir(self, tipo: str, dados: dict):
+        """Grava e publica. Falhas só são registradas no log: a escrita principal já aconteceu."""
+        try:
+            self.publicar(self.registrar(tipo, dados))
+        except Exception as e:
+            print(f"⚠️  Falha ao emitir evento {tipo}: {e}")
+
+    def emitir_lote(self, tipo: str, lista: list):
+        try:
+            for evento in self.registrar_lote(tipo, lista):
+                self.publicar(evento)
+        except Exception as e:
+            print(f"⚠️  Falha ao emitir eventos {tipo}: {e}")
+
+    # --- Barramento em memória ---
+
+    def assinar(self, callback):
+        """`callback(evento)` passa a receber os eventos publicados neste processo."""
+        with self._lock:
+            self._assinantes.append(callback)
+        return callback
+
+    def cancelar(self, callback):
+        with self._lock:
+            if callback in self._assinantes:
+                self._assinantes.remove(callback)
+
+    def publicar(self, evento: dict):
+        """Entrega o evento aos assinantes. Falhas de um assinante não afetam os demais."""
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for callback in assinantes:
+            try:
+                callback(evento)
+            except Exception as e:
+                print(f"⚠️  Assinante de eventos falhou: {e}")
+                traceback.print_exc()
+
+
+eventos = Eventos()
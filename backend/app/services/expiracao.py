@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Varredura de doações vencidas.
+
+As doações 'pendente'/'aceita' cujo último dia de validade já passou (a validade
+vale até o fim do dia, ver `limite_validade`) passam para 'expirada'
+com um update_many por status (índice status_validade), em vez de serem
+verificadas uma a uma. Roda numa thread a cada DOACAO_EXPIRACAO_SECONDS segundos
+(0 desliga) ou pela linha de comando (expirar_doacoes.py na raiz do projeto).
+
+Entre uma varredura e outra as listagens já escondem as vencidas
+(ver `Doacao.filtro_nao_expiradas`).
+"""
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from app.models.entities.model_doacao import Doacao
+
+DOACAO_EXPIRACAO_SECONDS = int(os.getenv('DOACAO_EXPIRACAO_SECONDS', 300))
+
+
+class VarreduraExpiracao:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        self.ultima = None
+
+    def executar(self, agora: datetime = None):
+        """
+        Marca as vencidas e retorna o resumo:
+        {"expiradas": n, "por_status": {...}, "duracao_ms": ..., "executada_em": ...}
+        """
+        agora = agora or datetime.now()
+        inicio = time.perf_counter()
+        por_status = Doacao.expirar_vencidas(agora)
+        resumo = {
+            "expiradas": sum(por_status.values()),
+            "por_status": por_status,
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "executada_em": agora,
+        }
+        self.ultima = resumo
+        print(f"🗑️  Varredura de validade: {resumo['expiradas']} doações expiradas em {resumo['duracao_ms']} ms")
+        return resumo
+
+    def iniciar(self, intervalo=DOACAO_EXPIRACAO_SECONDS):
+        """Thread daemon que varre a cada `intervalo` segundos (uma por processo)."""
+        if intervalo <= 0 or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+
+            def loop():
+                while True:
+                    try:
+                        self.executar()
+                    except Exception as e:
+                        print(f"❌ Erro na varredura de validade: {e}")
+                        traceback.print_exc()
+                    time.sleep(intervalo)
+
+            threading.Thread(target=loop, name="varredura-expiracao", daemon=True).start()
+            self._thread_pid = os.getpid()
+
+
+varredura_expiracao = VarreduraExpiracao()
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Fila de cálculo de rotas em segundo plano.
+
+Os jobs ficam na coleção 'jobs_rotas' (duráveis e visíveis para todos os processos)
+e os ids dos jobs criados neste processo também vão para uma fila local, que é o
+caminho rápido dos workers. Sem trabalho local, os workers buscam no Mongo jobs
+pendentes criados por outros processos.
+
+Há no máximo um job ativo (pendente/processando) por doacao_id: o campo 'ativo'
+só existe enquanto o job não termina e tem índice único parcial.
+
+O worker que reivindica um job recebe um arrendamento ('lease_ate') de
+ROUTE_JOB_STALE_SECONDS, renovado enquanto o cálculo roda. Se o worker morrer, o
+arrendamento vence e o job é retomado por qualquer worker, em qualquer processo;
+o resultado só é gravado pelo dono atual do job.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+from enum import Enum
+from datetime import datetime, timedelta
+from typing import ClassVar, List
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import IndexModel, ASCENDING, ReturnDocument
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from app.config.database import get_db
+
+ROUTE_WORKERS = int(os.getenv('ROUTE_WORKERS', 4))
+ROUTE_JOB_POLL_SECONDS = float(os.getenv('ROUTE_JOB_POLL_SECONDS', 2))
+ROUTE_JOB_STALE_SECONDS = int(os.getenv('ROUTE_JOB_STALE_SECONDS', 60))
+
+
+class StatusJobEnum(str, Enum):
+    PENDENTE = "pendente"
+    PROCESSANDO = "processando"
+    CONCLUIDO = "concluido"
+    ERRO = "erro"
+
+
+class FilaRotas:
+    COLLECTION: ClassVar[str] = 'jobs_rotas'
+    INDEXES: ClassVar[List[IndexModel]] = [
+        IndexModel(
+            [("doacao_id", ASCENDING)], unique=True,
+            partialFilterExpression={"ativo": {"$exists": True}}, name="doacao_ativo_unico"
+        ),
+        IndexModel([("status", ASCENDING), ("criado_em", ASCENDING)], name="status_criado_em"),
+    ]
+
+    def __init__(self, processar, workers=ROUTE_WORKERS):
+        """
+        `processar(doacao_id)` executa o cálculo e retorna (resultado, erro),
+        no mesmo formato das controllers.
+        """
+        self.processar = processar
+        self.workers = workers
+        self._fila = queue.Queue()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def colecao(self):
+        return get_db()[self.COLLECTION]
+
+    # --- Produtor ---
+
+    def enfileirar(self, doacao_id: str):
+        """
+        Cria (ou reaproveita) o job ativo da doação e retorna o documento do job.
+        Chamadas concorrentes para a mesma doação recebem o mesmo job.
+        """
+        agora = datetime.now()
+        filtro = {"doacao_id": doacao_id, "ativo": True}
+        novo = {
+            "status": StatusJobEnum.PENDENTE.value,
+            "criado_em": agora,
+            "token_criacao": ObjectId()
+        }
+        job = None
+        for _ in range(3):
+            try:
+                job = self.colecao.find_one_and_update(
+                    filtro, {"$setOnInsert": novo}, upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # Outra requisição criou o job entre o find e o insert.
+                # Se ele já terminou nesse intervalo, tenta de novo.
+                job = self.colecao.find_one(filtro)
+            if job:
+                break
+        if not job:
+            raise RuntimeError("Não foi possível enfileirar o cálculo da rota.")
+
+        if job.get("token_criacao") == novo["token_criacao"]:
+            self._iniciar_workers()
+            self._fila.put(job["_id"])
+        return job
+
+    def buscar(self, job_id: str):
+        try:
+            return self.colecao.find_one({"_id": ObjectId(job_id)})
+        except InvalidId:
+            return None
+
+    def aguardar(self, job_ids, timeout=None, intervalo=1.0):
+        """
+        Bloqueia até que todos os jobs terminem (ou o timeout estoure).
+        Retorna a lista dos documentos dos jobs.
+        """
+        inicio = time.monotonic()
+        ids = [ObjectId(j) if not isinstance(j, ObjectId) else j for j in job_ids]
+        while True:
+            jobs = list(self.colecao.find({"_id": {"$in": ids}}))
+            ativos = [j for j in jobs if j["status"] in (StatusJobEnum.PENDENTE.value, StatusJobEnum.PROCESSANDO.value)]
+            if not ativos or (timeout is not None and time.monotonic() - inicio > timeout):
+                return jobs
+            time.sleep(intervalo)
+
+    # --- Workers ---
+
+    def _iniciar_workers(self):
+        # Threads não sobrevivem a um fork: reinicia o pool quando o pid muda
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._fila = queue.Queue()
+            self._threads = []
+            for i in range(self.workers):
+                t = threading.Thread(target=self._loop, name=f"fila-rotas-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._pid = os.getpid()
+
+    def iniciar(self):
+        """Sobe os workers (os jobs presos em 'processando' são retomados por eles quando o arrendamento vence)."""
+        self._iniciar_workers()
+
+    def _reivindicar(self, job_id=None):
+        """
+        Marca como 'processando', de forma atômica, um job pendente ou cujo
+        arrendamento venceu (worker morto), e o torna dono do job.
+        """
+        agora = datetime.now()
+        filtro = {"$or": [
+            {"status": StatusJobEnum.PENDENTE.value},
+            {"status": StatusJobEnum.PROCESSANDO.value, "lease_ate": {"$lt": agora}},
+            # Jobs de antes do arrendamento
+            {"status": StatusJobEnum.PROCESSANDO.value, "lease_ate": {"$exists": False},
+             "iniciado_em": {"$lt": agora - timedelta(seconds=ROUTE_JOB_STALE_SECONDS)}},
+        ]}
+        if job_id is not None:
+            filtro["_id"] = job_id
+        return self.colecao.find_one_and_update(
+            filtro,
+            {"$set": {
+                "status": StatusJobEnum.PROCESSANDO.value,
+                "iniciado_em": agora,
+                "lease_ate": agora + timedelta(seconds=ROUTE_JOB_STALE_SECONDS),
+                "dono": ObjectId(),
+            }},
+            sort=[("criado_em", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _renovar(self, job, parar: threading.Event):
+        """Estende o arrendamento do job até `parar` ser sinalizado."""
+        while not parar.wait(ROUTE_JOB_STALE_SECONDS / 3):
+            try:
+                self.colecao.update_one(
+                    {"_id": job["_id"], "dono": job["dono"]},
+                    {"$set": {"lease_ate": datetime.now() + timedelta(seconds=ROUTE_JOB_STALE_SECONDS)}}
+                )
+            except Exception as e:
+                print(f"⚠️  Falha ao renovar o job de rota {job['_id']}: {e}")
+
+    def _loop(self):
+        while True:
+            try:
+                try:
+                    job_id = self._fila.get(timeout=ROUTE_JOB_POLL_SECONDS)
+                    job = self._reivindicar(job_id)
+                except queue.Empty:
+                    job = self._reivindicar()
+                if job:
+                    self._executar(job)
+            except ConnectionFailure as e:
+                # MongoDB fora do ar: tenta de novo no próximo ciclo
+                print(f"⚠️  Fila de rotas sem conexão com o MongoDB: {e}")
+                time.sleep(ROUTE_JOB_POLL_SECONDS)
+            except Exception as e:
+                print(f"❌ Erro no worker da fila de rotas: {e}")
+                traceback.print_exc()
+
+    def _executar(self, job):
+        parar = threading.Event()
+        threading.Thread(target=self._renovar, args=(job, parar), name=f"lease-{job['_id']}", daemon=True).start()
+        try:
+            resultado, erro = self.processar(job["doacao_id"])
+        except Exception as e:
+            resultado, erro = None, str(e)
+        finally:
+            parar.set()
+
+        campos = {"finalizado_em": datetime.now()}
+        if erro:
+            campos.update({"status": StatusJobEnum.ERRO.value, "erro": erro})
+        else:
+            campos.update({"status": StatusJobEnum.CONCLUIDO.value, "resultado": resultado})
+        # Só o dono atual grava: se o job foi retomado por outro worker, este resultado é descartado
+        self.colecao.update_one({"_id": job["_id"], "dono": job["dono"]},
+                                {"$set": campos, "$unset": {"ativo": "", "lease_ate": ""}})
+
+
+def job_para_json(job):
+    """Formato público do job (sem campos internos)."""
+    dados = {
+        "job_id": str(job["_id"]),
+        "doacao_id": job["doacao_id"],
+        "status": job["status"]
+    }
+    if job.get("resultado") is not None:
+        dados["resultado"] = job["resultado"]
+    if job.get("erro"):
+        dados["erro"] = job["erro"]
+    return dados
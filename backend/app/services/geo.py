@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Geolocalização aproximada por CEP, sem acesso à rede.
+
+Os CEPs são resolvidos pelo prefixo mais longo encontrado na tabela
+data/cep_prefixos.csv (centroides regionais). O restante dos dígitos gera um
+deslocamento determinístico de até ~2 km, para que CEPs diferentes da mesma
+região não caiam exatamente no mesmo ponto.
+
+Doadores e receptores guardam o ponto resolvido em 'localizacao' (GeoJSON), com
+índice 2dsphere, para as consultas de proximidade rodarem no próprio MongoDB.
+"""
+import csv
+import os
+import re
+import numpy as np
+
+RAIO_TERRA_KM = 6371.0088
+ESPALHAMENTO_GRAUS = 0.02
+
+_TABELA_CEP = os.path.join(os.path.dirname(__file__), 'data', 'cep_prefixos.csv')
+_prefixos = None
+
+
+def _carregar_prefixos():
+    global _prefixos
+    if _prefixos is None:
+        tabela = {}
+        with open(_TABELA_CEP, encoding='utf-8') as f:
+            for linha in csv.DictReader(f):
+                tabela[linha['prefixo']] = (float(linha['latitude']), float(linha['longitude']), linha['regiao'])
+        _prefixos = tabela
+    return _prefixos
+
+
+def resolver_cep(cep: str):
+    """
+    Retorna (latitude, longitude, regiao) aproximados para o CEP, ou None
+    se o CEP não tiver 8 dígitos ou o prefixo não estiver na tabela.
+    """
+    digitos = re.sub(r'\D', '', cep or '')
+    if len(digitos) != 8:
+        return None
+
+    tabela = _carregar_prefixos()
+    for tamanho in range(5, 0, -1):
+        encontrado = tabela.get(digitos[:tamanho])
+        if encontrado:
+            lat, lon, regiao = encontrado
+            resto = int(digitos[tamanho:])
+            lat += ((resto % 97) / 96 - 0.5) * ESPALHAMENTO_GRAUS
+            lon += (((resto // 97) % 89) / 88 - 0.5) * ESPALHAMENTO_GRAUS
+            return lat, lon, regiao
+    return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Distância em linha reta (km). Aceita escalares ou arrays NumPy,
+    calculando lotes inteiros de uma só vez.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a))
+
+
+def matriz_haversine_km(latitudes, longitudes):
+    """Matriz NxN de distâncias em linha reta entre todos os pontos."""
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    return haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def ponto_geojson(cep: str):
+    """Ponto GeoJSON ({"type": "Point", "coordinates": [lon, lat]}) do CEP, ou None."""
+    resolvido = resolver_cep(cep)
+    if resolvido is None:
+        return None
+    lat, lon, _ = resolvido
+    return {"type": "Point", "coordinates": [round(lon, 6), round(lat, 6)]}
+
+
+def coordenadas_do_usuario(doc: dict):
+    """
+    (latitude, longitude) de um documento de usuário: o ponto gravado em
+    'localizacao' ou, se ainda não houver, o CEP do endereço. None se nenhum servir.
+    """
+    ponto = doc.get('localizacao')
+    if ponto and ponto.get('coordinates'):
+        lon, lat = ponto['coordinates']
+        return lat, lon
+    resolvido = resolver_cep((doc.get('endereco') or {}).get('cep'))
+    return resolvido[:2] if resolvido else None
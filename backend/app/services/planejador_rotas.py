@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Planejamento de rotas com múltiplas paradas (coleta no doador, entrega no receptor).
+
+Cada pedido é uma doação com um ponto de coleta e um de entrega; a coleta deve
+sempre vir antes da entrega na rota do mesmo motorista.
+
+Etapas:
+1. Divisão dos pedidos entre motoristas: k-means sobre (coleta, entrega) com
+   limite de pedidos por motorista; o que passar da capacidade total fica sem motorista.
+2. Construção de cada rota pelo vizinho mais próximo, respeitando a precedência.
+3. Melhoria local com 2-opt e or-opt (segmentos de 1 a 3 paradas), avaliando
+   todas as posições de uma vez com NumPy sobre a matriz de distâncias.
+
+As distâncias vêm do modelo local (haversine x fator de sinuosidade), sem rede.
+A referência de economia (distancia_base_km) é a soma das viagens individuais
+coleta -> entrega de cada doação, como se cada uma fosse uma rota separada.
+"""
+import numpy as np
+from app.services.geo import matriz_haversine_km
+from app.services.provedores_rota import FATOR_SINUOSIDADE
+
+MAX_PASSADAS = 50
+EPS = 1e-9
+
+
+def matriz_distancias(latitudes, longitudes):
+    """Distâncias estimadas por vias (km) entre todos os pontos."""
+    return matriz_haversine_km(latitudes, longitudes) * FATOR_SINUOSIDADE
+
+
+# --- 1. Divisão entre motoristas ---
+
+def _atribuir_com_capacidade(X, centros, capacidade):
+    """Atribui cada ponto ao centro mais próximo que ainda tenha vaga."""
+    dist = ((X[:, None, :] - centros[None, :, :]) ** 2).sum(axis=2)
+    ordem = np.argsort(dist, axis=None)
+    rotulos = np.full(len(X), -1)
+    ocupacao = np.zeros(len(centros), dtype=int)
+    for idx in ordem:
+        ponto, centro = divmod(int(idx), len(centros))
+        if rotulos[ponto] == -1 and ocupacao[centro] < capacidade:
+            rotulos[ponto] = centro
+            ocupacao[centro] += 1
+    return rotulos
+
+
+def agrupar_pedidos(coletas, entregas, k, capacidade, iteracoes=10, seed=0):
+    """Rótulo de grupo (0..k-1) de cada pedido; -1 para os que excedem a capacidade total."""
+    X = np.hstack([coletas, entregas])
+    if k <= 1:
+        return _atribuir_com_capacidade(X, X.mean(axis=0, keepdims=True), capacidade)
+
+    # Inicialização k-means++ determinística
+    rng = np.random.default_rng(seed)
+    centros = [X[rng.integers(len(X))]]
+    for _ in range(1, k):
+        d2 = np.min([((X - c) ** 2).sum(axis=1) for c in centros], axis=0)
+        probs = d2 / d2.sum() if d2.sum() > 0 else None
+        centros.append(X[rng.choice(len(X), p=probs)])
+    centros = np.array(centros)
+
+    rotulos = _atribuir_com_capacidade(X, centros, capacidade)
+    for _ in range(iteracoes):
+        novos_centros = np.array([
+            X[rotulos == g].mean(axis=0) if np.any(rotulos == g) else centros[g]
+            for g in range(k)
+        ])
+        novos_rotulos = _atribuir_com_capacidade(X, novos_centros, capacidade)
+        centros = novos_centros
+        if np.array_equal(novos_rotulos, rotulos):
+            break
+        rotulos = novos_rotulos
+    return rotulos
+
+
+# --- 2 e 3. Rota de um motorista ---
+#
+# Nós: 0 é um depósito fictício com distância zero para todos (transforma o
+# caminho aberto em ciclo); para o pedido i, a coleta é o nó 2i+1 e a entrega 2i+2.
+
+class _Rota:
+    def __init__(self, D):
+        self.D = D
+        n = len(D) - 1
+        self.n = n
+        nos = np.arange(n + 1)
+        self.eh_entrega = (nos > 0) & (nos % 2 == 0)
+        self.par = np.where(nos == 0, 0, np.where(self.eh_entrega, nos - 1, nos + 1))
+
+    def custo(self, tour):
+        return float(self.D[tour, np.roll(tour, -1)].sum())
+
+    def vizinho_mais_proximo(self):
+        D, n = self.D, self.n
+        visitado = np.zeros(n + 1, dtype=bool)
+        visitado[0] = True
+        # Começa pela coleta mais afastada do centro das entregas
+        coletas = np.arange(1, n + 1, 2)
+        entregas = coletas + 1
+        inicio = coletas[np.argmax(D[np.ix_(coletas, entregas)].mean(axis=1))]
+        tour = [0, inicio]
+        visitado[inicio] = True
+        atual = inicio
+        for _ in range(n - 1):
+            viavel = ~visitado & (~self.eh_entrega | visitado[self.par])
+            candidatos = np.flatnonzero(viavel)
+            atual = candidatos[np.argmin(D[atual, candidatos])]
+            visitado[atual] = True
+            tour.append(atual)
+        return np.array(tour)
+
+    def dois_opt(self, tour):
+        """Inverte o trecho [i+1, j] quando encurta a rota e não coloca entrega antes da coleta."""
+        D, m = self.D, self.n + 1
+        melhorou = False
+        pos = np.empty(m, dtype=int)
+        for i in range(m - 2):
+            pos[tour] = np.arange(m)
+            a, b = tour[i], tour[i + 1]
+            js = np.arange(i + 2, m)
+            c, e = tour[js], tour[(js + 1) % m]
+            delta = D[a, c] + D[b, e] - D[a, b] - D[c, e]
+
+            # Trecho inválido se contém um par coleta/entrega completo
+            trecho = tour[i + 1:]
+            conflito = self.eh_entrega[trecho] & (pos[self.par[trecho]] >= i + 1)
+            invalido = np.cumsum(conflito)[1:] > 0
+            delta[invalido] = np.inf
+
+            melhor = int(np.argmin(delta))
+            if delta[melhor] < -EPS:
+                j = js[melhor]
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                melhorou = True
+        return tour, melhorou
+
+    def or_opt(self, tour):
+        """Move trechos de 1 a 3 paradas para a melhor posição válida."""
+        D, m = self.D, self.n + 1
+        melhorou = False
+        pos = np.empty(m, dtype=int)
+        for tamanho in (1, 2, 3):
+            i = 1
+            while i + tamanho <= m:
+                pos[tour] = np.arange(m)
+                trecho = tour[i:i + tamanho]
+                s1, sL = trecho[0], trecho[-1]
+                a, b = tour[i - 1], tour[(i + tamanho) % m]
+                ganho = D[a, s1] + D[sL, b] - D[a, b]
+
+                # Limites de precedência para a nova posição (inserir após k)
+                pos_pares = pos[self.par[trecho]]
+                fora = (pos_pares < i) | (pos_pares >= i + tamanho)
+                coletas_antes = pos_pares[self.eh_entrega[trecho] & fora]
+                entregas_depois = pos_pares[~self.eh_entrega[trecho] & fora]
+                lo = coletas_antes.max() if len(coletas_antes) else 0
+                hi = entregas_depois.min() if len(entregas_depois) else m
+
+                ks = np.arange(lo, hi)
+                ks = ks[(ks < i - 1) | (ks >= i + tamanho)]
+                if len(ks):
+                    c, e = tour[ks], tour[(ks + 1) % m]
+                    delta = D[c, s1] + D[sL, e] - D[c, e] - ganho
+                    melhor = int(np.argmin(delta))
+                    if delta[melhor] < -EPS:
+                        k = ks[melhor]
+                        resto = np.concatenate([tour[:i], tour[i + tamanho:]])
+                        destino = k + 1 if k < i else k + 1 - tamanho
+                        tour = np.concatenate([resto[:destino], trecho, resto[destino:]])
+                        melhorou = True
+                        continue
+                i += 1
+        return tour, melhorou
+
+    def otimizar(self, tour):
+        for _ in range(MAX_PASSADAS):
+            tour, m1 = self.dois_opt(tour)
+            tour, m2 = self.or_opt(tour)
+            if not (m1 or m2):
+                break
+        return tour
+
+
+def _rota_encadeada(n_pedidos):
+    """Tour inicial na ordem recebida: coleta_1, entrega_1, coleta_2, ..."""
+    return np.concatenate([[0], np.arange(1, 2 * n_pedidos + 1)])
+
+
+def planejar_grupo(coletas, entregas):
+    """
+    Planeja a rota de um motorista. Retorna (sequencia, distancia_km, distancia_base_km)
+    onde sequencia é a lista de (indice_pedido, 'coleta'|'entrega') e distancia_base_km
+    a soma das viagens individuais coleta -> entrega (uma rota por doação).
+    """
+    n_pedidos = len(coletas)
+    pontos = np.empty((2 * n_pedidos, 2))
+    pontos[0::2] = coletas
+    pontos[1::2] = entregas
+
+    D = np.zeros((2 * n_pedidos + 1, 2 * n_pedidos + 1))
+    D[1:, 1:] = matriz_distancias(pontos[:, 0], pontos[:, 1])
+    rota = _Rota(D)
+
+    coletas_nos = np.arange(1, 2 * n_pedidos + 1, 2)
+    custo_base = float(D[coletas_nos, coletas_nos + 1].sum())
+
+    # Melhora tanto a construção gulosa quanto o encadeamento na ordem recebida e fica com a melhor
+    candidatas = [rota.otimizar(rota.vizinho_mais_proximo()), rota.otimizar(_rota_encadeada(n_pedidos))]
+    tour = min(candidatas, key=rota.custo)
+
+    sequencia = [(int((no - 1) // 2), 'entrega' if no % 2 == 0 else 'coleta') for no in tour[1:]]
+    return sequencia, rota.custo(tour), custo_base
+
+
+def planejar(coletas, entregas, n_motoristas, max_pedidos_por_motorista):
+    """
+    coletas/entregas: arrays Nx2 (lat, lon) por pedido.
+    Retorna (rotas, sem_motorista): rotas são dicts com 'pedidos', 'sequencia',
+    'distancia_km', 'distancia_base_km' e 'trechos_km'; sem_motorista são os índices
+    dos pedidos que não couberam (nenhum motorista recebe mais que
+    max_pedidos_por_motorista).
+    """
+    coletas = np.asarray(coletas, dtype=float)
+    entregas = np.asarray(entregas, dtype=float)
+    n = len(coletas)
+    if n == 0 or n_motoristas < 1:
+        return [], list(range(n))
+
+    k = min(n_motoristas, int(np.ceil(n / max_pedidos_por_motorista)))
+    rotulos = agrupar_pedidos(coletas, entregas, k, max_pedidos_por_motorista)
+
+    rotas = []
+    for g in range(k):
+        pedidos = np.flatnonzero(rotulos == g)
+        if len(pedidos) == 0:
+            continue
+        sequencia, distancia, base = planejar_grupo(coletas[pedidos], entregas[pedidos])
+        sequencia = [(int(pedidos[p]), tipo) for p, tipo in sequencia]
+
+        pontos = np.array([coletas[p] if tipo == 'coleta' else entregas[p] for p, tipo in sequencia])
+        trechos = np.zeros(len(pontos))
+        if len(pontos) > 1:
+            D = matriz_distancias(pontos[:, 0], pontos[:, 1])
+            trechos[1:] = D[np.arange(len(pontos) - 1), np.arange(1, len(pontos))]
+
+        rotas.append({
+            "pedidos": [int(p) for p in pedidos],
+            "sequencia": sequencia,
+            "distancia_km": distancia,
+            "distancia_base_km": base,
+            "trechos_km": trechos.tolist()
+        })
+    return rotas, [int(p) for p in np.flatnonzero(rotulos == -1)]
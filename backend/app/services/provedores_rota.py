@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Provedores de cálculo de rota (distância, duração e resumo) entre dois CEPs.
+
+- ProvedorGoogle: Directions API (requer API_KEY), resultados guardados no cache de rotas.
+- ProvedorLocal: estimativa sem rede, a partir da tabela de prefixos de CEP
+  (distância haversine x fator de sinuosidade + modelo de velocidade).
+
+ROUTE_PROVIDER escolhe a cadeia: 'auto' (Google se houver chave, com o local como
+fallback), 'google' (só o Google, sem fallback: sem chave ou com a API fora, a rota
+não é calculada) ou 'local'.
+"""
+import os
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from app.services.cache_rotas import cache_rotas
+from app.services.geo import resolver_cep, haversine_km
+
+ROUTE_API_TIMEOUT = float(os.getenv('ROUTE_API_TIMEOUT', 5))
+ROUTE_HTTP_POOL_SIZE = int(os.getenv('ROUTE_HTTP_POOL_SIZE', 8))
+
+# Modelo de velocidade do provedor local
+FATOR_SINUOSIDADE = 1.3        # distância por vias / distância em linha reta
+TEMPO_FIXO_MIN = 3.0           # partida, estacionamento, carga
+FAIXAS_VELOCIDADE = (          # (até X km por vias, velocidade média em km/h)
+    (10.0, 22.0),              # trânsito urbano
+    (50.0, 40.0),              # região metropolitana
+    (np.inf, 70.0),            # rodovia
+)
+
+
+def formatar_distancia(km: float) -> str:
+    if km < 1:
+        return f"{int(round(km * 1000))} m"
+    return f"{km:.1f} km".replace('.', ',')
+
+
+def formatar_duracao(minutos: float) -> str:
+    minutos = int(round(minutos))
+    if minutos < 60:
+        return f"{minutos} min"
+    return f"{minutos // 60} h {minutos % 60} min"
+
+
+def duracao_estimada_min(distancia_km):
+    """Modelo de velocidade por faixa de distância (aceita escalar ou array NumPy)."""
+    distancia = np.asarray(distancia_km, dtype=float)
+    limites = [limite for limite, _ in FAIXAS_VELOCIDADE]
+    velocidades = np.array([v for _, v in FAIXAS_VELOCIDADE])
+    faixa = np.searchsorted(limites, distancia)
+    return TEMPO_FIXO_MIN + distancia / velocidades[faixa] * 60
+
+
+class ProvedorRota:
+    """Interface dos provedores. `calcular` retorna dict ou None (falha/indisponível)."""
+    nome = 'base'
+    remoto = False
+
+    def calcular(self, origem_cep: str, destino_cep: str):
+        raise NotImplementedError
+
+    def calcular_lote(self, pares):
+        """Calcula uma lista de pares (origem_cep, destino_cep)."""
+        return [self.calcular(origem, destino) for origem, destino in pares]
+
+
+class ProvedorGoogle(ProvedorRota):
+    nome = 'google'
+    remoto = True
+
+    def __init__(self, api_key: str, session=None, timeout=ROUTE_API_TIMEOUT):
+        self.api_key = api_key
+        self.http = session or requests
+        self.timeout = timeout
+
+    def calcular(self, origem_cep, destino_cep):
+        print(f"🔄 Tentando conectar Google Maps com chave: {self.api_key[:5]}...") # Mostra inicio da chave
+        try:
+            url = f"https://maps.googleapis.com/maps/api/directions/json?origin={origem_cep}&destination={destino_cep}&key={self.api_key}&language=pt-BR"
+
+            resp = self.http.get(url, timeout=self.timeout)
+            print(f"📡 Status HTTP Google: {resp.status_code}") # 200 = Conectou
+
+            if resp.status_code == 200:
+                data = resp.json()
+                print(f"📦 Resposta Google: {data['status']}") # OK, REQUEST_DENIED, etc.
+
+                if data['status'] == 'OK':
+                    leg = data['routes'][0]['legs'][0]
+                    print("✅ Rota calculada com sucesso pela API!")
+                    return {
+                        'distancia_texto': leg['distance']['text'],
+                        'duracao_texto': leg['duration']['text'],
+                        'resumo_rota': data['routes'][0]['summary'],
+                        'distancia_km': round(leg['distance']['value'] / 1000, 3),
+                        'duracao_min': round(leg['duration']['value'] / 60, 1),
+                        'provedor': self.nome
+                    }
+                # AQUI VAI APARECER O MOTIVO DO ERRO
+                print(f"❌ Erro na API do Google: {data.get('error_message', 'Sem mensagem')}")
+            else:
+                print(f"❌ Erro de Conexão: {resp.text}")
+
+        except Exception as api_err:
+            print(f"❌ Exceção ao conectar Google: {api_err}")
+        return None
+
+
+class ProvedorLocal(ProvedorRota):
+    nome = 'local'
+
+    def estimar(self, latitudes_origem, longitudes_origem, latitudes_destino, longitudes_destino):
+        """
+        Versão vetorizada do modelo: recebe arrays de coordenadas e retorna
+        (distancia_km, duracao_min) como arrays NumPy.
+        """
+        linha_reta = haversine_km(
+            np.asarray(latitudes_origem, dtype=float), np.asarray(longitudes_origem, dtype=float),
+            np.asarray(latitudes_destino, dtype=float), np.asarray(longitudes_destino, dtype=float)
+        )
+        distancia = linha_reta * FATOR_SINUOSIDADE
+        return distancia, duracao_estimada_min(distancia)
+
+    def calcular_lote(self, pares):
+        resolvidos = [(resolver_cep(o), resolver_cep(d)) for o, d in pares]
+        validos = [i for i, (o, d) in enumerate(resolvidos) if o and d]
+        resultados = [None] * len(pares)
+        if not validos:
+            return resultados
+
+        origem = np.array([resolvidos[i][0][:2] for i in validos])
+        destino = np.array([resolvidos[i][1][:2] for i in validos])
+        distancias, duracoes = self.estimar(origem[:, 0], origem[:, 1], destino[:, 0], destino[:, 1])
+
+        for i, km, minutos in zip(validos, distancias, duracoes):
+            regiao_origem, regiao_destino = resolvidos[i][0][2], resolvidos[i][1][2]
+            resumo = regiao_origem if regiao_origem == regiao_destino else f"{regiao_origem} → {regiao_destino}"
+            resultados[i] = {
+                'distancia_texto': f"{formatar_distancia(km)} (Estimado)",
+                'duracao_texto': f"{formatar_duracao(minutos)} (Estimado)",
+                'resumo_rota': resumo,
+                'distancia_km': round(float(km), 3),
+                'duracao_min': round(float(minutos), 1),
+                'provedor': self.nome
+            }
+        return resultados
+
+    def calcular(self, origem_cep, destino_cep):
+        return self.calcular_lote([(origem_cep, destino_cep)])[0]
+
+
+_sessao = None
+_sessao_pid = None
+
+
+def sessao_http():
+    """
+    Session HTTP compartilhada pelo processo: reaproveita conexões keep-alive com
+    a API do Google entre os workers da fila (pool limitado a ROUTE_HTTP_POOL_SIZE).
+    """
+    global _sessao, _sessao_pid
+    if _sessao is None or _sessao_pid != os.getpid():
+        sessao = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ROUTE_HTTP_POOL_SIZE)
+        sessao.mount('https://', adapter)
+        _sessao, _sessao_pid = sessao, os.getpid()
+    return _sessao
+
+
+def get_provedores(session=None):
+    """Cadeia de provedores na ordem em que devem ser tentados."""
+    modo = os.getenv('ROUTE_PROVIDER', 'auto')
+    api_key = os.getenv('API_KEY')
+    local = ProvedorLocal()
+
+    if modo == 'local':
+        return [local]
+    if modo == 'google':
+        if not api_key:
+            print("⚠️  ROUTE_PROVIDER=google sem API_KEY: nenhuma rota será calculada.")
+            return []
+        return [ProvedorGoogle(api_key, session=session or sessao_http())]
+    if not api_key:
+        return [local]
+    return [ProvedorGoogle(api_key, session=session or sessao_http()), local]
+
+
+def calcular_trajeto(origem_cep: str, destino_cep: str, provedores=None):
+    """
+    Calcula o trajeto com o primeiro provedor que responder. Resultados de
+    provedores remotos passam pelo cache de rotas. Retorna dict ou None.
+    """
+    for provedor in get_provedores() if provedores is None else provedores:
+        if provedor.remoto:
+            resultado = cache_rotas.get(origem_cep, destino_cep)
+            if resultado:
+                print(f"⚡ Rota {origem_cep} -> {destino_cep} servida pelo cache.")
+                return resultado
+
+        resultado = provedor.calcular(origem_cep, destino_cep)
+        if resultado:
+            if provedor.remoto:
+                cache_rotas.set(origem_cep, destino_cep, resultado)
+            return resultado
+    return None
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Recomendação de doações pendentes para cada receptor.
+
+Cada doação recebe uma nota de 0 a 1 para o receptor, combinando:
+- proximidade: distância em linha reta entre o doador e o receptor (até `raio_km`);
+- urgência: quanto menos dias de validade restam, maior a prioridade;
+- quantidade: quão próxima a quantidade está da necessidade estimada pelo número
+  de beneficiários;
+e multiplicada pela compatibilidade de armazenamento (doações refrigeradas ou
+congeladas só vão para quem declarou geladeira/freezer).
+
+As características das doações são calculadas uma única vez em arrays NumPy
+(`MotorRecomendacao`), e um índice de grade (`IndiceEspacial`) entrega só as
+doações das células ao alcance do raio, então cada receptor pontua algumas
+centenas/milhares de candidatas em vez de todas as pendentes.
+
+O motor é recarregado do banco no máximo a cada RECOMENDACAO_CACHE_TTL segundos.
+"""
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+import numpy as np
+from app.models.entities.model_doacao import Doacao, limite_validade
+from app.models.entities.model_usuarioUnificado import Usuario
+from app.services.geo import haversine_km, coordenadas_do_usuario, RAIO_TERRA_KM
+
+RECOMENDACAO_CACHE_TTL = float(os.getenv('RECOMENDACAO_CACHE_TTL', 60))
+
+KM_POR_GRAU = math.pi * RAIO_TERRA_KM / 180
+CELULA_KM = 10.0
+RAIO_PADRAO_KM = 30.0
+
+PESO_PROXIMIDADE = 0.5
+PESO_URGENCIA = 0.3
+PESO_QUANTIDADE = 0.2
+MEIA_VIDA_DIAS = 7.0            # urgência cai à metade com 7 dias de validade restantes
+KG_POR_BENEFICIARIO = 0.5       # necessidade estimada por doação
+FATOR_ARMAZENAMENTO_DESCONHECIDO = 0.5
+
+# Requisitos de armazenamento (bits)
+SECO, REFRIGERADO, CONGELADO = 1, 2, 4
+
+_PALAVRAS_CONGELADO = ('congelad', 'sorvete', 'polpa')
+_PALAVRAS_REFRIGERADO = ('leite', 'iogurte', 'queijo', 'manteiga', 'carne', 'frango', 'peixe', 'ovos',
+                         'presunto', 'fruta', 'verdura', 'legume', 'hortali', 'salada', 'marmita', 'refeic')
+_PALAVRAS_ARMAZENAMENTO = (
+    (CONGELADO, ('freezer', 'congelador', 'camara fria')),
+    (REFRIGERADO, ('geladeira', 'refrigera', 'camara fria', 'expositor')),
+    (SECO, ('despensa', 'prateleira', 'estoque', 'seco', 'armario', 'deposito', 'almoxarifado')),
+)
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return re.sub(r'\s+', ' ', ''.join(c for c in texto if not unicodedata.combining(c)))
+
+
+def requisito_armazenamento(alimento: str) -> int:
+    """Como a doação precisa ser guardada, inferido do nome do alimento."""
+    nome = _normalizar(alimento)
+    if any(p in nome for p in _PALAVRAS_CONGELADO):
+        return CONGELADO
+    if any(p in nome for p in _PALAVRAS_REFRIGERADO):
+        return REFRIGERADO
+    return SECO
+
+
+def armazenamento_receptor(tipos, capacidade: str = '') -> int:
+    """
+    Bits de armazenamento declarados pelo receptor (tipo_armazenamento e o texto
+    livre de capacidade_armazenamento). 0 = não informado.
+    """
+    texto = _normalizar(' '.join(list(tipos or []) + [capacidade or '']))
+    bits = 0
+    for bit, palavras in _PALAVRAS_ARMAZENAMENTO:
+        if any(p in texto for p in palavras):
+            bits |= bit
+    # Quem guarda refrigerado/congelado também guarda seco
+    return bits | SECO if bits else 0
+
+
+class IndiceEspacial:
+    """Índice de grade: células de ~CELULA_KM x CELULA_KM com os índices dos pontos."""
+
+    def __init__(self, latitudes, longitudes, celula_km=CELULA_KM):
+        self.passo = celula_km / KM_POR_GRAU
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        linhas = np.floor(self.latitudes / self.passo).astype(np.int64)
+        colunas = np.floor(self.longitudes / self.passo).astype(np.int64)
+
+        # Agrupa os índices por célula com uma única ordenação
+        ordem = np.lexsort((colunas, linhas))
+        chaves = np.stack([linhas[ordem], colunas[ordem]], axis=1)
+        quebras = np.flatnonzero(np.any(np.diff(chaves, axis=0) != 0, axis=1)) + 1
+        self.celulas = {
+            (int(grupo_chaves[0][0]), int(grupo_chaves[0][1])): grupo
+            for grupo_chaves, grupo in zip(np.split(chaves, quebras), np.split(ordem, quebras))
+            if len(grupo)
+        }
+
+    def candidatos(self, lat, lon, raio_km):
+        """Índices dos pontos nas células que podem estar a até `raio_km` de (lat, lon)."""
+        d_lin = int(math.ceil(raio_km / KM_POR_GRAU / self.passo))
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        d_col = int(math.ceil(raio_km / (KM_POR_GRAU * cos_lat) / self.passo))
+        linha, coluna = int(math.floor(lat / self.passo)), int(math.floor(lon / self.passo))
+
+        grupos = [
+            self.celulas[(i, j)]
+            for i in range(linha - d_lin, linha + d_lin + 1)
+            for j in range(coluna - d_col, coluna + d_col + 1)
+            if (i, j) in self.celulas
+        ]
+        if not grupos:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(grupos)
+
+
+def _quantidade_kg(doacao) -> float:
+    """Quantidade em kg/l (a convertida pelo catálogo, quando houver); NaN se não for peso/volume."""
+    if doacao.get('unidade_base') is not None:
+        quantidade, unidade = doacao.get('quantidade_base'), doacao['unidade_base']
+    else:
+        quantidade, unidade = doacao.get('quantidade'), _normalizar(doacao.get('unidade'))
+    return float(quantidade or 0) if unidade in ('kg', 'l') else np.nan
+
+
+class MotorRecomendacao:
+    """
+    Características pré-calculadas das doações pendentes.
+
+    `doacoes`: lista de dicts com _id, alimento, quantidade, unidade, validade e
+    as coordenadas do doador em 'latitude'/'longitude' (doações sem coordenadas
+    são descartadas).
+    """
+
+    def __init__(self, doacoes, agora: datetime = None, celula_km=CELULA_KM):
+        self.criado_em = agora or datetime.now()
+        doacoes = [d for d in doacoes if d.get('latitude') is not None and d.get('longitude') is not None]
+        self.ids = [str(d['_id']) for d in doacoes]
+        self.latitudes = np.array([d['latitude'] for d in doacoes], dtype=float)
+        self.longitudes = np.array([d['longitude'] for d in doacoes], dtype=float)
+        self.dias_restantes = np.array(
+            # A validade vale até o fim do dia (ver limite_validade)
+            [(d['validade'] + timedelta(days=1) - self.criado_em).total_seconds() / 86400 for d in doacoes],
+            dtype=float)
+        self.quantidade_kg = np.array([_quantidade_kg(d) for d in doacoes], dtype=float)
+        self.requisitos = np.array([requisito_armazenamento(d.get('alimento')) for d in doacoes], dtype=np.int64)
+        self.urgencia = np.power(0.5, np.clip(self.dias_restantes, 0, None) / MEIA_VIDA_DIAS)
+        self.indice = IndiceEspacial(self.latitudes, self.longitudes, celula_km)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def recomendar(self, latitude, longitude, beneficiarios=0, armazenamento=0, k=20, raio_km=RAIO_PADRAO_KM):
+        """
+        Top-k para um receptor: lista de (id_doacao, nota, distancia_km), da maior
+        para a menor nota.
+        """
+        candidatos = self.indice.candidatos(latitude, longitude, raio_km)
+        if not len(candidatos) or k <= 0:
+            return []
+
+        distancias = haversine_km(latitude, longitude, self.latitudes[candidatos], self.longitudes[candidatos])
+        proximidade = 1 - distancias / raio_km
+
+        necessidade = max(beneficiarios, 1) * KG_POR_BENEFICIARIO
+        qtd = self.quantidade_kg[candidatos]
+        adequacao = np.where(np.isnan(qtd), 0.5, np.minimum(qtd, necessidade) / np.maximum(qtd, necessidade))
+
+        if armazenamento:
+            compativel = np.where((self.requisitos[candidatos] & armazenamento) != 0, 1.0, 0.0)
+        else:
+            # Não informado: secos entram normalmente, os demais com nota reduzida
+            compativel = np.where(self.requisitos[candidatos] == SECO, 1.0, FATOR_ARMAZENAMENTO_DESCONHECIDO)
+
+        notas = compativel * (PESO_PROXIMIDADE * proximidade
+                              + PESO_URGENCIA * self.urgencia[candidatos]
+                              + PESO_QUANTIDADE * adequacao)
+        validas = (distancias <= raio_km) & (self.dias_restantes[candidatos] > 0) & (notas > 0)
+        posicoes = np.flatnonzero(validas)
+        if len(posicoes) > k:
+            posicoes = posicoes[np.argpartition(-notas[posicoes], k - 1)[:k]]
+        posicoes = posicoes[np.argsort(-notas[posicoes], kind='stable')]
+
+        return [(self.ids[candidatos[p]], round(float(notas[p]), 4), round(float(distancias[p]), 3))
+                for p in posicoes]
+
+
+def caracteristicas_receptor(receptor: dict):
+    """(latitude, longitude, beneficiarios, armazenamento) do documento do receptor, ou None sem localização."""
+    ponto = coordenadas_do_usuario(receptor)
+    if ponto is None:
+        return None
+    return (ponto[0], ponto[1], int(receptor.get('numero_beneficiarios') or 0),
+            armazenamento_receptor(receptor.get('tipo_armazenamento'), receptor.get('capacidade_armazenamento')))
+
+
+def carregar_motor(agora: datetime = None):
+    """Monta o motor com as doações pendentes e ainda válidas, localizadas pelo endereço do doador."""
+    agora = agora or datetime.now()
+    doacoes = Doacao.find_docs(
+        {"status": "pendente", "validade": {"$gte": limite_validade(agora)}},
+        {"doador_id": 1, "alimento": 1, "quantidade": 1, "unidade": 1, "validade": 1,
+         "quantidade_base": 1, "unidade_base": 1}
+    )
+    doadores = Usuario.find_docs_by_ids(list({d['doador_id'] for d in doacoes}), {"localizacao": 1, "endereco.cep": 1})
+    pontos = {str(u['_id']): coordenadas_do_usuario(u) for u in doadores}
+
+    for d in doacoes:
+        ponto = pontos.get(d['doador_id'])
+        if ponto:
+            d['latitude'], d['longitude'] = ponto[0], ponto[1]
+    return MotorRecomendacao(doacoes, agora)
+
+
+class CacheMotor:
+    """Mantém um motor por processo, reconstruído quando passa do TTL."""
+
+    def __init__(self, ttl=RECOMENDACAO_CACHE_TTL):
+        self.ttl = ttl
+        self._motor = None
+        self._criado_em = 0.0
+        self._lock = threading.Lock()
+
+    def obter(self):
+        if self._motor is None or time.monotonic() - self._criado_em > self.ttl:
+            with self._lock:
+                if self._motor is None or time.monotonic() - self._criado_em > self.ttl:
+                    self._motor = carregar_motor()
+                    self._criado_em = time.monotonic()
+        return self._motor
+
+    def invalidar(self):
+        self._motor = None
+
+
+cache_motor = CacheMotor()
+
+
+def recomendar_lote(motor, receptores, k=20, raio_km=RAIO_PADRAO_KM):
+    """Recomendações de vários receptores de uma vez: {receptor_id: [(id, nota, km), ...]}."""
+    resultado = {}
+    for receptor in receptores:
+        caracteristicas = caracteristicas_receptor(receptor)
+        if caracteristicas is None:
+            resultado[str(receptor['_id'])] = []
+            continue
+        lat, lon, beneficiarios, armazenamento = caracteristicas
+        resultado[str(receptor['_id'])] = motor.recomendar(lat, lon, beneficiarios, armazenamento, k, raio_km)
+    return resultado
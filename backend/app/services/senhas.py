@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Hash e verificação de senhas.
+
+A verificação (scrypt/pbkdf2) é CPU intensiva: roda num pool de processos limitado
+a PASSWORD_POOL_WORKERS, para não travar as threads que atendem requisições nem
+disputar o GIL. No máximo PASSWORD_POOL_MAX_PENDING verificações ficam em
+andamento/na fila; acima disso o login é recusado na hora (SenhaPoolOcupado),
+o que mantém a latência previsível durante picos.
+
+PASSWORD_HASH_METHOD define o algoritmo/parâmetros de novos hashes (formato do
+werkzeug, ex.: 'scrypt' ou 'pbkdf2:sha256:600000'). Hashes gravados com
+parâmetros diferentes são refeitos no próximo login bem-sucedido.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_POOL_WORKERS = int(os.getenv('PASSWORD_POOL_WORKERS', os.cpu_count() or 2))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv('PASSWORD_POOL_MAX_PENDING', 64))
+PASSWORD_VERIFY_TIMEOUT = float(os.getenv('PASSWORD_VERIFY_TIMEOUT', 5))
+
+
+class SenhaPoolOcupado(Exception):
+    """Muitas verificações de senha em andamento."""
+    pass
+
+
+def gerar_hash(senha: str, metodo: str = None) -> str:
+    return generate_password_hash(senha, method=metodo or PASSWORD_HASH_METHOD)
+
+
+@lru_cache(maxsize=None)
+def _parametros_atuais(metodo: str) -> str:
+    # 'scrypt' é gravado como 'scrypt:32768:8:1': compara com o prefixo real
+    return generate_password_hash('', method=metodo).split('$', 1)[0]
+
+
+def precisa_rehash(hash_senha: str) -> bool:
+    """True se o hash foi gerado com algoritmo/parâmetros diferentes dos configurados."""
+    return hash_senha.split('$', 1)[0] != _parametros_atuais(PASSWORD_HASH_METHOD)
+
+
+class VerificadorSenhas:
+    def __init__(self, workers=PASSWORD_POOL_WORKERS, max_pendentes=PASSWORD_POOL_MAX_PENDING,
+                 timeout=PASSWORD_VERIFY_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(max_pendentes)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Pools de processos não sobrevivem a um fork: recria quando o pid muda
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _executar(self, funcao, *args):
+        """
+        Executa `funcao` no pool. Sem vaga, lança SenhaPoolOcupado na hora (sem esperar
+        na fila); o `timeout` vale só para a espera da resposta. Com PASSWORD_POOL_WORKERS=0
+        executa na própria thread.
+
+        A vaga só é devolvida quando a tarefa termina (ou é cancelada antes de
+        começar), não quando a espera estoura: senão um pico de verificações lentas
+        enfileiraria trabalho no pool além de max_pendentes.
+        """
+        if self.workers <= 0:
+            return funcao(*args)
+
+        if not self._vagas.acquire(blocking=False):
+            raise SenhaPoolOcupado("Muitas tentativas de login simultâneas. Tente novamente.")
+        try:
+            futuro = self._get_pool().submit(funcao, *args)
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturesTimeout:
+            futuro.cancel()
+            raise SenhaPoolOcupado("Tempo esgotado ao verificar a senha. Tente novamente.")
+        except BrokenProcessPool:
+            # Worker morto: recria o pool na próxima chamada e resolve aqui mesmo
+            self._pool = None
+            return funcao(*args)
+
+    def verificar(self, hash_senha: str, senha: str) -> bool:
+        return self._executar(check_password_hash, hash_senha, senha)
+
+    def gerar_hash(self, senha: str) -> str:
+        # O método vai explícito: o processo do pool pode ter outra configuração
+        return self._executar(gerar_hash, senha, PASSWORD_HASH_METHOD)
+
+
+verificador_senhas = VerificadorSenhas()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Distribuição em tempo real (Server-Sent Events) dos eventos de doações e rotas.
+
+Fonte dos eventos:
+- 'change_stream': com replica set/mongos, uma thread por processo acompanha as
+  inserções na coleção 'eventos' (outbox) com um change stream, então cada
+  processo recebe também os eventos gravados pelos outros;
+- 'memoria': em servidor standalone (ou SSE_FONTE=memoria), os eventos chegam
+  pelo barramento em memória de services/eventos.py — só os deste processo.
+
+Cada conexão tem uma fila limitada (SSE_FILA_MAX). Um cliente lento demais perde
+os eventos acumulados e recebe um único evento 'sincronizar', pedindo que recarregue
+as listas pela API.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+from app.config.database import get_client, get_db, suporta_transacoes
+from app.services.eventos import eventos, Eventos
+
+SSE_FONTE = os.getenv('SSE_FONTE', 'auto').lower()
+SSE_FILA_MAX = int(os.getenv('SSE_FILA_MAX', 1000))
+
+SINCRONIZAR = {"tipo": "sincronizar"}
+
+
+def visivel_para(evento: dict, principal) -> bool:
+    """
+    Filtro por papel:
+    - admin: tudo;
+    - motorista: doações que ficaram 'aceita' (trabalho novo) e o que envolve o próprio motorista;
+    - receptor: doações novas ('pendente') e o que envolve o próprio receptor;
+    - doador: o que envolve as próprias doações.
+    """
+    role = principal.role
+    if role == 'admin':
+        return True
+    if role == 'motorista':
+        return evento.get("doacao_status") == 'aceita' or evento.get("motorista_id") == principal.id
+    if role == 'receptor':
+        return evento.get("doacao_status") == 'pendente' or evento.get("receptor_id") == principal.id
+    if role == 'doador':
+        return evento.get("doador_id") == principal.id
+    return False
+
+
+class Assinatura:
+    """Conexão SSE de um usuário."""
+
+    def __init__(self, principal, max_itens=SSE_FILA_MAX):
+        self.principal = principal
+        self.fila = queue.Queue(maxsize=max_itens)
+
+    def entregar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            # Cliente atrasado: descarta o acumulado e pede uma recarga completa
+            try:
+                while True:
+                    self.fila.get_nowait()
+            except queue.Empty:
+                pass
+            self.fila.put_nowait(SINCRONIZAR)
+
+    def proximo(self, timeout):
+        """Próximo evento, ou None se nada chegar em `timeout` segundos."""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class CanalTempoReal:
+    def __init__(self, fonte=SSE_FONTE):
+        self.fonte_configurada = fonte
+        self.fonte = None
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def iniciar(self):
+        """
+        Liga a fonte de eventos (uma vez por processo). No modo 'auto' com o MongoDB
+        inacessível a escolha fica para depois: `conectar` chama iniciar de novo.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.fonte_configurada == 'auto':
+                try:
+                    get_client().admin.command('ping')
+                except Exception as e:
+                    print(f"⚠️  MongoDB indisponível: a fonte dos eventos em tempo real será escolhida depois ({e}).")
+                    return
+            usar_change_stream = self.fonte_configurada == 'change_stream' or (
+                self.fonte_configurada == 'auto' and suporta_transacoes())
+            if usar_change_stream:
+                self.fonte = 'change_stream'
+                threading.Thread(target=self._acompanhar_change_stream, name="sse-change-stream", daemon=True).start()
+            else:
+                self.fonte = 'memoria'
+                eventos.assinar(self.distribuir)
+            self._pid = os.getpid()
+            print(f"📡 Eventos em tempo real via {self.fonte}")
+
+    def _acompanhar_change_stream(self):
+        token = None
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                with get_db()[Eventos.COLLECTION].watch(pipeline, resume_after=token) as stream:
+                    for mudanca in stream:
+                        token = stream.resume_token
+                        self.distribuir(mudanca["fullDocument"])
+            except Exception as e:
+                print(f"⚠️  Change stream de eventos interrompido: {e}. Reconectando...")
+                traceback.print_exc()
+                time.sleep(2)
+
+    def conectar(self, principal) -> Assinatura:
+        self.iniciar()
+        assinatura = Assinatura(principal)
+        with self._lock:
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def desconectar(self, assinatura: Assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def distribuir(self, evento: dict):
+        with self._lock:
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            if visivel_para(evento, assinatura.principal):
+                assinatura.entregar(evento)
+
+    def __len__(self):
+        return len(self._assinaturas)
+
+
+canal_tempo_real = CanalTempoReal()
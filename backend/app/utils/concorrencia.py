@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Concorrência otimista: doações e rotas têm um campo 'versao' incrementado a cada
+escrita. O cliente pode enviar a versão que leu para que a operação só seja
+aplicada se o documento não tiver mudado nesse meio tempo.
+"""
+
+
+def versao_esperada(request):
+    """
+    Versão informada na requisição: campo 'versao' do corpo JSON ou cabeçalho
+    If-Match. Retorna (versao ou None, erro).
+    """
+    data = request.get_json(silent=True) or {}
+    versao = data.get('versao', request.headers.get('If-Match', '').strip('"') or None)
+    if versao is None:
+        return None, None
+    try:
+        return int(versao), None
+    except (TypeError, ValueError):
+        return None, "Campo 'versao' inválido."
+
+
+def condicao_versao(versao: int):
+    """
+    Filtro do campo 'versao' para a escrita condicional. Documentos gravados antes
+    do campo existir não o têm, mas a API os mostra como versão 0: nesse caso
+    a condição aceita 0 ou campo ausente.
+    """
+    return {"$in": [0, None]} if versao == 0 else versao
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura incremental de corpos de requisição grandes (array JSON ou NDJSON).
+
+Os geradores leem o stream em blocos e devolvem um item por vez, como
+(numero_da_linha, objeto, erro): `erro` é uma string quando o item não pôde ser
+decodificado. Assim o corpo nunca fica inteiro em memória.
+"""
+import codecs
+import json
+import re
+
+TAMANHO_BLOCO = 64 * 1024
+LINHA_MAX = TAMANHO_BLOCO * 16  # NDJSON: linhas maiores são recusadas
+ELEMENTO_MAX = LINHA_MAX  # array JSON: idem para cada elemento
+
+_decoder = json.JSONDecoder()
+_ESPACOS = ' \t\r\n'
+_ESTRUTURA = re.compile(r'["\[\]{}]')
+_FIM_STRING = re.compile(r'["\\]')
+_FIM_ESCALAR = re.compile(r'[\s,\]]')
+
+
+def iterar_ndjson(stream):
+    """
+    Um objeto JSON por linha; linhas em branco são ignoradas. Linhas com mais de
+    LINHA_MAX bytes viram um erro (o restante delas é descartado, sem ser interpretado).
+    """
+    numero = 0
+    while True:
+        linha = stream.readline(LINHA_MAX + 1)
+        if not linha:
+            return
+        numero += 1
+        if len(linha) > LINHA_MAX:
+            # Consome o resto da linha longa para continuar na próxima
+            fim_de_linha = b'\n' if isinstance(linha, bytes) else '\n'
+            while linha and not linha.endswith(fim_de_linha):
+                linha = stream.readline(LINHA_MAX)
+            yield numero, None, f"Linha maior que o limite de {LINHA_MAX} bytes."
+            continue
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield numero, json.loads(linha), None
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {getattr(e, 'msg', e)}"
+
+
+def iterar_json_array(stream):
+    """
+    Elementos de um array JSON no nível mais externo. `numero` é a posição do
+    elemento no array (começando em 1). Um erro de sintaxe, ou um elemento com
+    mais de ELEMENTO_MAX caracteres, encerra a leitura, já que não é possível
+    localizar com segurança o próximo elemento.
+    """
+    buffer = ''
+    pos = 0
+    fim_stream = False
+    inicio = True
+    numero = 0
+    # Varredura do elemento atual: até onde (a partir de `pos`) já foi lido, a
+    # profundidade de {}/[] e se parou dentro de uma string
+    varrido, profundidade, em_string = 0, 0, False
+    # Decodificador incremental: um caractere multibyte cortado entre dois blocos
+    # fica guardado até o bloco seguinte, em vez de virar U+FFFD
+    utf8 = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def ler():
+        nonlocal buffer, pos, fim_stream
+        bloco = stream.read(TAMANHO_BLOCO)
+        if not bloco:
+            fim_stream = True
+            bloco = utf8.decode(b'', final=True)
+        elif isinstance(bloco, bytes):
+            bloco = utf8.decode(bloco)
+        buffer = buffer[pos:] + bloco
+        pos = 0
+
+    def proximo_caractere():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _ESPACOS:
+                pos += 1
+            if pos < len(buffer) or fim_stream:
+                return buffer[pos] if pos < len(buffer) else ''
+            ler()
+
+    def fim_do_elemento():
+        """
+        Índice logo após o elemento que começa em `pos`, ou None se ele ainda não
+        chegou inteiro. Continua de onde a chamada anterior parou, então cada bloco
+        é varrido uma vez só; o json só decodifica o elemento quando ele está completo.
+        """
+        nonlocal varrido, profundidade, em_string
+        i = pos + varrido
+        if buffer[pos] not in '{["':
+            # Número, true, false ou null: termina no primeiro separador
+            m = _FIM_ESCALAR.search(buffer, i)
+            if m:
+                return m.start()
+            varrido = len(buffer) - pos
+            return len(buffer) if fim_stream else None
+        while True:
+            if em_string:
+                m = _FIM_STRING.search(buffer, i)
+                if not m:
+                    i = len(buffer)
+                    break
+                if m.group() == '\\':
+                    if m.end() == len(buffer):
+                        # Escape cortado no fim do bloco: recomeça na barra
+                        i = m.start()
+                        break
+                    i = m.end() + 1
+                    continue
+                em_string = False
+                i = m.end()
+                if profundidade == 0:
+                    return i
+            else:
+                m = _ESTRUTURA.search(buffer, i)
+                if not m:
+                    i = len(buffer)
+                    break
+                c, i = m.group(), m.end()
+                if c == '"':
+                    em_string = True
+                elif c in '[{':
+                    profundidade += 1
+                else:
+                    profundidade -= 1
+                    if profundidade == 0:
+                        return i
+        varrido = i - pos
+        return None
+
+    while True:
+        c = proximo_caractere()
+        if inicio:
+            if c != '[':
+                yield 0, None, "O corpo deve ser um array JSON."
+                return
+            pos += 1
+            inicio = False
+            if proximo_caractere() == ']':
+                return
+            continue
+
+        if numero > 0:
+            if c == ']':
+                return
+            if c != ',':
+                yield numero + 1, None, "JSON inválido: esperado ',' ou ']'."
+                return
+            pos += 1
+            proximo_caractere()
+
+        # Decodifica o próximo elemento, lendo mais blocos se ele estiver incompleto
+        numero += 1
+        varrido, profundidade, em_string = 0, 0, False
+        while True:
+            fim = fim_do_elemento() if pos < len(buffer) else None
+            if fim is not None:
+                break
+            if fim_stream:
+                yield numero, None, "JSON inválido: array incompleto."
+                return
+            if len(buffer) - pos > ELEMENTO_MAX:
+                yield numero, None, f"Elemento maior que o limite de {ELEMENTO_MAX} caracteres."
+                return
+            ler()
+        try:
+            obj, pos = _decoder.raw_decode(buffer, pos)
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {getattr(e, 'msg', e)}."
+            return
+        yield numero, obj, None
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Paginação por cursor (keyset) para listagens ordenadas por (data, _id) decrescente.
+O cursor é opaco para o cliente: base64 de {"d": data_iso, "i": object_id}.
+"""
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+def parse_limit(valor, padrao=LIMITE_PADRAO, maximo=LIMITE_MAXIMO):
+    """Converte o parâmetro 'limit' da URL, limitado a [1, maximo]."""
+    if valor in (None, ''):
+        return padrao
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("Parâmetro 'limit' inválido.")
+    if limite < 1:
+        raise ValueError("Parâmetro 'limit' inválido.")
+    return min(limite, maximo)
+
+
+def encode_cursor(data: datetime, _id) -> str:
+    payload = json.dumps({"d": data.isoformat(), "i": str(_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Retorna a tupla (datetime, ObjectId) codificada no cursor."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return datetime.fromisoformat(payload['d']), ObjectId(payload['i'])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("Cursor inválido.")
+
+
+def keyset_filter(campo: str, data: datetime, _id: ObjectId) -> dict:
+    """Filtro dos itens que vêm depois de (data, _id) na ordem decrescente."""
+    return {'$or': [
+        {campo: {'$lt': data}},
+        {campo: data, '_id': {'$lt': _id}}
+    ]}
+
+
+def parse_fields(fields, permitidos, obrigatorios=('_id',)):
+    """
+    Converte 'fields=a,b,c' em uma projeção do Mongo.
+    Campos fora da lista de permitidos são rejeitados; None significa documento inteiro.
+    """
+    if not fields:
+        return None
+    pedidos = [f.strip() for f in fields.split(',') if f.strip()]
+    invalidos = [f for f in pedidos if f not in permitidos]
+    if invalidos:
+        raise ValueError(f"Campos inválidos em 'fields': {', '.join(invalidos)}.")
+    projecao = {f: 1 for f in pedidos}
+    for f in obrigatorios:
+        projecao[f] = 1
+    return projecao
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Serialização direta de documentos do MongoDB para JSON.
+
+As listagens não passam mais por Pydantic (documento -> model -> model_dump -> JSON):
+o documento bruto só tem o `_id` renomeado para `id` e os campos opcionais
+ausentes preenchidos com o padrão do model; ObjectId e datetime são tratados
+pelo encoder. A validação com os models continua nas escritas.
+
+Se o pacote opcional `orjson` estiver instalado ele é usado como backend;
+senão, o `json` da biblioteca padrão. Datas saem em ISO 8601, igual ao
+`model_dump(mode='json')`.
+"""
+import json
+from datetime import date, datetime
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(mode='json')
+    # Enums (str, Enum) e afins
+    valor = getattr(obj, 'value', None)
+    if valor is not None:
+        return valor
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+def dumps_bytes(dados, ordenar=True) -> bytes:
+    """JSON em bytes (UTF-8)."""
+    if orjson is not None:
+        opcoes = orjson.OPT_SORT_KEYS if ordenar else 0
+        try:
+            return orjson.dumps(dados, default=_default, option=opcoes)
+        except TypeError:
+            # Ex.: chaves não-string ou inteiros fora de 64 bits: cai no json padrão
+            pass
+    return json.dumps(dados, default=_default, ensure_ascii=False, sort_keys=ordenar,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provider do Flask (jsonify) com suporte a ObjectId/datetime e backend orjson."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj, ordenar=self.sort_keys).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        dados = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(dados, ordenar=self.sort_keys), mimetype=self.mimetype)
+
+
+def padroes_do_model(model, excluir=()):
+    """
+    Valores padrão dos campos opcionais do model ({campo: padrão}), para que o
+    documento bruto tenha as mesmas chaves que o model_dump teria.
+    """
+    padroes = {}
+    for nome, campo in model.model_fields.items():
+        if nome in excluir or nome == 'id' or campo.is_required() or campo.default_factory is not None:
+            continue
+        padroes[nome] = getattr(campo.default, 'value', campo.default)
+    return padroes
+
+
+def documento_para_json(doc: dict, padroes: dict = None, excluir=()):
+    """Documento do Mongo no formato das respostas da API ('_id' -> 'id')."""
+    item = dict(padroes) if padroes else {}
+    for campo, valor in doc.items():
+        if campo == '_id':
+            item['id'] = str(valor)
+        elif campo not in excluir:
+            item[campo] = valor
+    return item
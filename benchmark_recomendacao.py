@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import random
+from datetime import datetime, timedelta
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from bson import ObjectId
+from app.services.geo import resolver_cep, _carregar_prefixos
+from app.services.recomendacoes import MotorRecomendacao, recomendar_lote
+
+N_DOACOES = int(os.getenv('BENCH_DOACOES', 50000))
+N_RECEPTORES = int(os.getenv('BENCH_RECEPTORES', 2000))
+K = int(os.getenv('BENCH_K', 20))
+
+ALIMENTOS = ["Arroz", "Feijão Carioca", "Leite", "Marmitas Congeladas", "Frutas", "Macarrão", "Pão"]
+ARMAZENAMENTOS = ["Grande", "2 freezers, 3 prateleiras", "Geladeira e despensa", ""]
+
+def cep_aleatorio(rng, prefixos):
+    prefixo = rng.choice(prefixos)
+    return (prefixo + ''.join(rng.choice('0123456789') for _ in range(8)))[:8]
+
+def gerar_dados(rng):
+    """Doações (já com as coordenadas do doador) e receptores, no formato dos documentos do Mongo."""
+    prefixos = list(_carregar_prefixos())
+    agora = datetime.now()
+    doacoes = []
+    for _ in range(N_DOACOES):
+        lat, lon, _ = resolver_cep(cep_aleatorio(rng, prefixos))
+        doacoes.append({
+            "_id": ObjectId(), "alimento": rng.choice(ALIMENTOS), "quantidade": float(rng.randint(1, 50)),
+            "unidade": rng.choice(["kg", "kg", "unidades", "l"]), "validade": agora + timedelta(days=rng.randint(1, 60)),
+            "latitude": lat, "longitude": lon,
+        })
+    receptores = [{
+        "_id": ObjectId(), "endereco": {"cep": cep_aleatorio(rng, prefixos)},
+        "numero_beneficiarios": rng.randint(10, 500), "capacidade_armazenamento": rng.choice(ARMAZENAMENTOS),
+    } for _ in range(N_RECEPTORES)]
+    return doacoes, receptores
+
+def benchmark():
+    doacoes, receptores = gerar_dados(random.Random(42))
+    print(f"\n⏱️  Recomendação: {N_DOACOES} doações pendentes x {N_RECEPTORES} receptores (top-{K})")
+
+    inicio = time.perf_counter()
+    motor = MotorRecomendacao(doacoes)
+    t_motor = time.perf_counter() - inicio
+    print(f"   Características + índice espacial  {t_motor:6.2f} s")
+
+    inicio = time.perf_counter()
+    resultado = recomendar_lote(motor, receptores, k=K)
+    t_lote = time.perf_counter() - inicio
+    print(f"   Ranking de todos os receptores      {t_lote:6.2f} s  ({t_lote / N_RECEPTORES * 1000:.2f} ms/receptor)")
+
+    com_itens = sum(1 for itens in resultado.values() if itens)
+    print(f"\n✅ {com_itens} receptores com recomendações.")
+
+if __name__ == "__main__":
+    benchmark()
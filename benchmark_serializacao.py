@@ -0,0 +1,70 @@
+import sys
+import os
+import json
+import time
+from datetime import datetime, timedelta
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from bson import ObjectId
+from app.models.entities.model_doacao import Doacao
+from app.utils import serializacao
+from app.utils.serializacao import documento_para_json, padroes_do_model, dumps_bytes
+
+N = int(os.getenv('BENCH_N', 10000))
+
+def gerar_documentos(n):
+    """Documentos no formato em que o PyMongo os devolve."""
+    agora = datetime.now().replace(microsecond=123000)
+    doador = str(ObjectId())
+    return [{
+        "_id": ObjectId(),
+        "doador_id": doador,
+        "alimento": f"Alimento {i}",
+        "quantidade": float(i % 50 + 1),
+        "unidade": "kg",
+        "validade": agora + timedelta(days=30),
+        "status": "pendente",
+        "data_criacao": agora - timedelta(minutes=i),
+    } for i in range(n)]
+
+def medir(funcao, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        corpo = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, corpo
+
+def benchmark():
+    docs = gerar_documentos(N)
+    padroes = padroes_do_model(Doacao)
+
+    def via_pydantic():
+        # Caminho antigo: model -> model_dump(mode='json') -> json padrão (jsonify)
+        itens = [Doacao(**d).model_dump(mode='json') for d in docs]
+        return json.dumps(itens, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+    def direto():
+        return dumps_bytes([documento_para_json(d, padroes) for d in docs])
+
+    print(f"\n⏱️  Serialização de {N} doações (melhor de 3)")
+    t_antigo, corpo_antigo = medir(via_pydantic)
+    print(f"   Pydantic + json        {t_antigo * 1000:8.1f} ms")
+
+    backend = serializacao.orjson
+    if backend is not None:
+        t_orjson, corpo_novo = medir(direto)
+        print(f"   Direto + orjson        {t_orjson * 1000:8.1f} ms  ({t_antigo / t_orjson:.1f}x)")
+
+    serializacao.orjson = None
+    t_json, corpo_json = medir(direto)
+    serializacao.orjson = backend
+    print(f"   Direto + json          {t_json * 1000:8.1f} ms  ({t_antigo / t_json:.1f}x)")
+
+    iguais = json.loads(corpo_antigo) == json.loads(corpo_json)
+    print(f"\n{'✅' if iguais else '❌'} Mesmo conteúdo nos dois caminhos: {iguais}")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,25 @@
+import sys
+import os
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.config.database import connect_db
+from app.services.expiracao import varredura_expiracao
+
+def expirar():
+    print("\n🔌 Conectando ao MongoDB...")
+    try:
+        connect_db()
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    print("\n⏰ Marcando doações vencidas como 'expirada'...")
+    resumo = varredura_expiracao.executar()
+    for status, n in resumo['por_status'].items():
+        print(f"   {status}: {n}")
+    print(f"\n✅ {resumo['expiradas']} doações expiradas em {resumo['duracao_ms']} ms.")
+
+if __name__ == "__main__":
+    expirar()
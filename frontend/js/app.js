@@ -4,6 +4,7 @@ class RotaDoBemApp {
         this.token = localStorage.getItem('rota_token');
         this.role = localStorage.getItem('rota_role');
         this.currentPage = 'doacoes'; 
+        this.pageSize = 20;
         this.init();
     }
 
@@ -65,6 +66,7 @@ class RotaDoBemApp {
         this.setupNavigation();
         this.setupLogout();
         this.loadPage(this.currentPage);
+        this.setupTempoReal();
 
         if (this.role === 'doador') {
             const btnNova = document.getElementById('btn-nova-doacao');
@@ -114,12 +116,32 @@ class RotaDoBemApp {
 
     loadPage(page) {
         console.log("Carregando:", page);
+        this.currentPage = page;
         if (page === 'doacoes') this.loadDoacoes();
         if (page === 'rotas') this.loadRotas();
         if (page === 'finalizadas') this.loadFinalizadas();
         if (page === 'historico') this.loadHistorico();
     }
 
+    // Atualizações em tempo real (SSE). EventSource não envia cabeçalhos: o token vai na query.
+    setupTempoReal() {
+        if (!window.EventSource) return;
+        const fonte = new EventSource(`${this.apiUrl}/eventos/stream?token=${encodeURIComponent(this.token)}`);
+        let agendado = null;
+        const recarregar = () => {
+            clearTimeout(agendado);
+            // Agrupa rajadas de eventos numa única recarga
+            agendado = setTimeout(() => {
+                if (['doacoes', 'rotas', 'finalizadas', 'historico'].includes(this.currentPage)) {
+                    this.loadPage(this.currentPage);
+                }
+            }, 500);
+        };
+        ['doacao.pendente', 'doacao.aceita', 'rota.em_andamento', 'rota.concluida', 'rota.pendente',
+         'rota.cancelada', 'sincronizar'].forEach(tipo => fonte.addEventListener(tipo, recarregar));
+        window.addEventListener('beforeunload', () => fonte.close());
+    }
+
     setupLogout() {
         const logoutBtn = document.getElementById('logout-btn');
         if (logoutBtn) {
@@ -141,16 +163,42 @@ class RotaDoBemApp {
         
         try {
             // Se for receptor, vê pendentes. Doador vê as suas ativas.
-            let query = '';
-            if (this.role === 'receptor') query = '?status=pendente';
-
-            const doacoes = await this.apiFetch(`${this.apiUrl}/doacoes${query}`);
-            this.renderDoacoes(doacoes, container);
+            // A lista é paginada por cursor: só a primeira página é buscada aqui.
+            let query = `?limit=${this.pageSize}`;
+            if (this.role === 'receptor') query += '&status=pendente';
+
+            const pagina = await this.apiFetch(`${this.apiUrl}/doacoes${query}`);
+            this.doacoesQuery = query;
+            this.renderDoacoes(pagina.itens, container);
+            this.renderCarregarMais(pagina.next_cursor, container);
         } catch (err) {
             container.innerHTML = `<div style="color: red; text-align: center; grid-column: 1/-1;">Erro: ${err.message}</div>`;
         }
     }
 
+    async loadMaisDoacoes(cursor) {
+        const container = document.getElementById('doacoes-list');
+        if(!container) return;
+        const btn = document.getElementById('btn-carregar-mais');
+        if (btn) btn.remove();
+
+        try {
+            const pagina = await this.apiFetch(`${this.apiUrl}/doacoes${this.doacoesQuery}&cursor=${encodeURIComponent(cursor)}`);
+            container.insertAdjacentHTML('beforeend', pagina.itens.map(d => this.createCardHTML(d)).join(''));
+            this.renderCarregarMais(pagina.next_cursor, container);
+        } catch (err) {
+            alert(`Erro: ${err.message}`);
+        }
+    }
+
+    renderCarregarMais(cursor, container) {
+        if (!cursor) return;
+        container.insertAdjacentHTML('beforeend', `
+            <div id="btn-carregar-mais" style="grid-column: 1/-1; text-align: center;">
+                <button class="btn-outline" onclick="app.loadMaisDoacoes('${cursor}')">Carregar mais</button>
+            </div>`);
+    }
+
     async loadHistorico() {
         const container = document.getElementById('historico-list');
         if(!container) return;
@@ -251,7 +299,7 @@ class RotaDoBemApp {
             if (this.role === 'motorista' && (d.status === 'aceita' || d.status === 'a caminho')) {
                 try {
                     // Chama o endpoint que calcula (ou pega do cache) a rota
-                    const rota = await this.apiFetch(`${this.apiUrl}/rotas/calcular/${id}`);
+                    const rota = await this.obterRota(id);
                     
                     if (rota && rota.distancia_texto) {
                         rotaId = rota._id || rota.id;
@@ -351,6 +399,20 @@ class RotaDoBemApp {
         }
     }
 
+    // Se a rota ainda não existe o backend responde 202 com um job; consulta até concluir.
+    async obterRota(doacaoId, tentativas = 20) {
+        let resp = await this.apiFetch(`${this.apiUrl}/rotas/calcular/${doacaoId}`);
+        if (!resp || !resp.job_id) return resp;
+
+        for (let i = 0; i < tentativas; i++) {
+            if (resp.status === 'concluido') return resp.resultado;
+            if (resp.status === 'erro') throw new Error(resp.erro || 'Falha ao calcular rota');
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            resp = await this.apiFetch(`${this.apiUrl}/rotas/jobs/${resp.job_id}`);
+        }
+        throw new Error('Cálculo da rota demorou demais. Tente novamente.');
+    }
+
     async acceptDonation(id) {
         if (!confirm("Aceitar esta doação?")) return;
         try {
@@ -0,0 +1,28 @@
+import sys
+import os
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.config.database import connect_db
+from app.config.indexes import ensure_indexes
+from app.models.entities.model_usuarioUnificado import Usuario
+
+def geocodificar():
+    print("\n🔌 Conectando ao MongoDB...")
+    try:
+        connect_db()
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    ensure_indexes()
+    print("\n📍 Calculando a localização de doadores e receptores sem ponto gravado...")
+    atualizados, ignorados = Usuario.geocodificar_pendentes()
+    print(f"   {atualizados} usuários geocodificados.")
+    if ignorados:
+        print(f"   ⚠️  {ignorados} com CEP fora da tabela de prefixos.")
+    print("\n✅ Concluído.")
+
+if __name__ == "__main__":
+    geocodificar()
@@ -0,0 +1,32 @@
+import sys
+import os
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.config.database import connect_db
+from app.config.indexes import ensure_indexes
+from app.controllers.entities.controller_estoque import mesclar_itens_duplicados
+
+def mesclar():
+    print("\n🔌 Conectando ao MongoDB...")
+    try:
+        connect_db()
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    # Rode com a aplicação parada: baixas simultâneas nos itens removidos se perderiam
+    print("\n📦 Mesclando itens de estoque duplicados (receptor, alimento, unidade)...")
+    resumo = mesclar_itens_duplicados()
+    print(f"   {resumo['grupos']} grupos, {resumo['itens_removidos']} itens removidos.")
+
+    print("\n📇 Criando índices pendentes (inclusive o único do estoque)...")
+    criados, erros = ensure_indexes()
+    if erros:
+        print(f"\n⚠️  {len(erros)} índices não puderam ser criados.")
+    else:
+        print("\n✅ Estoque sem duplicados.")
+
+if __name__ == "__main__":
+    mesclar()
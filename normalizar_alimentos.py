@@ -0,0 +1,26 @@
+import sys
+import os
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.config.database import connect_db
+from app.controllers.entities.controller_catalogo import normalizar_registros_existentes
+
+def normalizar():
+    print("\n🔌 Conectando ao MongoDB...")
+    try:
+        connect_db()
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    print("\n🥫 Aplicando o catálogo de alimentos às doações e ao estoque existentes...")
+    resumo = normalizar_registros_existentes()
+    print(f"   Doações atualizadas: {resumo['doacoes']}")
+    print(f"   Itens de estoque atualizados: {resumo['estoque_atualizados']}")
+    print(f"   Itens de estoque movidos para a chave canônica: {resumo['estoque_mesclados']}")
+    print("\n✅ Concluído.")
+
+if __name__ == "__main__":
+    normalizar()
@@ -0,0 +1,39 @@
+import sys
+import os
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.config.database import connect_db
+from app.controllers.entities.controller_rota import fila_rotas, precalcular_rotas_pendentes
+
+def precalcular():
+    print("\n🔌 Conectando ao MongoDB...")
+    try:
+        connect_db()
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    print("\n🗺️  Enfileirando rotas das doações aceitas sem rota...")
+    fila_rotas.iniciar()
+    resultado, erro = precalcular_rotas_pendentes()
+    if erro:
+        print(f"❌ {erro}")
+        return
+
+    print(f"   {resultado['doacoes_sem_rota']} doações sem rota.")
+    if not resultado['jobs']:
+        print("\n✅ Nada a calcular.")
+        return
+
+    jobs = fila_rotas.aguardar(resultado['jobs'])
+    concluidos = [j for j in jobs if j['status'] == 'concluido']
+    falhas = [j for j in jobs if j['status'] == 'erro']
+
+    for j in falhas:
+        print(f"   ❌ Doação {j['doacao_id']}: {j.get('erro')}")
+    print(f"\n🚀 Rotas calculadas: {len(concluidos)} | Falhas: {len(falhas)}")
+
+if __name__ == "__main__":
+    precalcular()
@@ -0,0 +1,25 @@
+import sys
+import os
+
+# Adiciona a pasta 'backend' ao caminho do Python
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.config.database import connect_db
+from app.controllers.entities.controller_relatorios import reconstruir_resumos
+
+def reconstruir():
+    print("\n🔌 Conectando ao MongoDB...")
+    try:
+        connect_db()
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    print("\n📈 Reconstruindo os resumos de doações por doador e receptor...")
+    resumo = reconstruir_resumos()
+    print(f"   Doações entregues lidas: {resumo['doacoes']}")
+    print(f"   Resumos gravados: {resumo['baldes']}")
+    print("\n✅ Concluído.")
+
+if __name__ == "__main__":
+    reconstruir()